@@ -1,10 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django import forms
-from .models import CustomUser, Product, Order, OrderItem
+from .models import ArchivedOrder, ArchivedOrderItem, ArchivedPayment, CustomUser, Product, Order, OrderItem
+from .media_store import picker_choices
+from .rollups import rebuild_days
+from .totals import suppress_amount_updates
 from django.db.models.signals import post_save, post_delete
-import os
-from django.conf import settings
 
 
 class CustomUserAdmin(UserAdmin):
@@ -83,12 +84,11 @@ class OrderAdmin(admin.ModelAdmin):
         return qs.select_related('status').prefetch_related('order_items__product')
        
     def save_related(self, request, form, formsets, change):
-        super().save_related(request, form, formsets, change)
-        # After saving all inlines, update the amount
-        order = form.instance
-        total = sum(item.subtotal for item in order.order_items.all())
-        order.amount = total
-        order.save()
+        # Los inlines no ajustan el total uno por uno; se recalcula una vez al final
+        with suppress_amount_updates():
+            super().save_related(request, form, formsets, change)
+        form.instance.update_amount()
+        rebuild_days([form.instance.order_date])
 
 class ProductAdminForm(forms.ModelForm):
     existing_image = forms.ChoiceField(
@@ -103,15 +103,8 @@ class ProductAdminForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Buscar imágenes existentes en la carpeta
-        images_path = os.path.join(settings.MEDIA_ROOT, 'products')
-        if os.path.exists(images_path):
-            images = [
-                (f'products/{img}', img)
-                for img in os.listdir(images_path)
-                if os.path.isfile(os.path.join(images_path, img))
-            ]
-            self.fields['existing_image'].choices = [('', '---')] + images
+        # Imágenes ya guardadas, desde el índice de media (sin recorrer la carpeta)
+        self.fields['existing_image'].choices = [('', '---')] + picker_choices()
 
     def clean(self):
         cleaned_data = super().clean()
@@ -130,8 +123,44 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'price', 'stock')
     search_fields = ('name',)
 
+
+
+class ReadOnlyAdminMixin:
+    """El historial archivado solo se consulta: sin altas, cambios ni bajas."""
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class ArchivedOrderItemInline(ReadOnlyAdminMixin, admin.TabularInline):
+    model = ArchivedOrderItem
+    fields = ('product_name', 'price', 'quantity', 'subtotal', 'sugerency')
+    extra = 0
+
+
+class ArchivedPaymentInline(ReadOnlyAdminMixin, admin.TabularInline):
+    model = ArchivedPayment
+    fields = ('idPaymentMethod', 'idPaymentStatus', 'amount', 'payment_date', 'token')
+    extra = 0
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'customer_name', 'order_date', 'status', 'amount', 'archived_at')
+    list_filter = ('status', 'order_date')
+    search_fields = ('customer_name', 'id')
+    list_select_related = ('status',)
+    inlines = [ArchivedOrderItemInline, ArchivedPaymentInline]
+
+
 admin.site.register(CustomUser, CustomUserAdmin)
-# Product y Order ya están registrados con @admin.register
+# Product, Order y ArchivedOrder ya están registrados con @admin.register
 
 
 
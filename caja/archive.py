@@ -0,0 +1,108 @@
+"""
+Archivo del historial de pedidos.
+
+La cocina, la caja y el admin trabajan sobre lo abierto y lo reciente, pero
+Order, OrderItem y Payment acumulan todo el historial. `archive_orders` mueve
+los pedidos cerrados (Entregado o Cancelado) con order_date anterior a hace
+ORDER_ARCHIVE_AFTER_DAYS días, con sus items y pagos, a ArchivedOrder,
+ArchivedOrderItem y ArchivedPayment. Va por lotes: cada lote copia y borra en
+una transacción corta, así que el resto de las escrituras no espera el lock
+más que eso.
+
+Las filas calientes se borran directo, sin señales: archivar no es cancelar ni
+borrar, así que totales y resúmenes diarios quedan igual (caja.rollups también
+cuenta el archivo cuando reconstruye). El historial se sigue viendo, solo
+lectura, en el admin y en las exportaciones (caja.exports une las dos fuentes).
+
+Se corre con `manage.py archive_orders`, por ejemplo una vez por noche.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import DateTimeField, F, Value
+from django.utils import timezone
+
+from .lookups import StateName, states
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, ArchivedPayment, Order, OrderItem, Payment, StockReservation,
+)
+
+ARCHIVE_AFTER_DAYS = getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 90)
+BATCH_SIZE = getattr(settings, 'ORDER_ARCHIVE_BATCH_SIZE', 500)
+CLOSED_STATES = (StateName.ENTREGADO, StateName.CANCELADO)
+
+ORDER_FIELDS = (
+    'id', 'amount', 'status_id', 'IP', 'initialTime', 'endTime', 'order_date', 'customer_name', 'tableNumber',
+)
+ITEM_FIELDS = ('id', 'order_id', 'product_id', 'sugerency', 'quantity', 'subtotal', 'price')
+PAYMENT_FIELDS = (
+    'id', 'idOrder_id', 'idPaymentMethod_id', 'amount', 'idPaymentStatus_id', 'payment_date', 'motive', 'token',
+)
+
+
+def archive_cutoff(days=ARCHIVE_AFTER_DAYS, today=None):
+    """Primer día que queda en las tablas calientes."""
+    return (today or timezone.localdate()) - timedelta(days=days)
+
+
+def archivable_orders(before):
+    return Order.objects.filter(status_id__in=[states.id_of(name) for name in CLOSED_STATES], order_date__lt=before)
+
+
+def _raw_delete(queryset):
+    # DELETE directo: sin cargar instancias ni disparar las señales de totales y resúmenes
+    return queryset._raw_delete(queryset.db)
+
+
+def _copy(model, queryset):
+    """
+    INSERT INTO <tabla de `model`> SELECT ... con el SQL del queryset (values() con
+    las columnas en el orden de la tabla destino): las filas no pasan por Python.
+    """
+    qn = connection.ops.quote_name
+    names = queryset.query.values_select + tuple(queryset.query.annotation_select)
+    columns = ', '.join(qn(model._meta.get_field(name).column) for name in names)
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {qn(model._meta.db_table)} ({columns}) {sql}", params)
+        return cursor.rowcount
+
+
+def archive_batch(before, batch_size=BATCH_SIZE):
+    """Archiva hasta `batch_size` pedidos en una transacción. Devuelve lo movido por tabla."""
+    with transaction.atomic():
+        ids = list(archivable_orders(before).order_by().values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return {'orders': 0, 'items': 0, 'payments': 0}
+        moved = {
+            'orders': _copy(ArchivedOrder, Order.objects.filter(id__in=ids).values(
+                *ORDER_FIELDS, archived_at=Value(timezone.now(), output_field=DateTimeField()),
+            )),
+            'items': _copy(ArchivedOrderItem, OrderItem.objects.filter(order_id__in=ids).values(
+                *ITEM_FIELDS, product_name=F('product__name'),
+            )),
+            'payments': _copy(ArchivedPayment, Payment.objects.filter(idOrder_id__in=ids).values(*PAYMENT_FIELDS)),
+        }
+        _raw_delete(StockReservation.objects.filter(order_id__in=ids))
+        _raw_delete(Payment.objects.filter(idOrder_id__in=ids))
+        _raw_delete(OrderItem.objects.filter(order_id__in=ids))
+        _raw_delete(Order.objects.filter(id__in=ids))
+    return moved
+
+
+def archive_orders(before=None, batch_size=BATCH_SIZE, max_batches=None, progress=None):
+    """Archiva por lotes todo lo archivable (o hasta `max_batches` lotes). Devuelve los totales."""
+    before = before or archive_cutoff()
+    totals = {'orders': 0, 'items': 0, 'payments': 0}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(before, batch_size)
+        if not moved['orders']:
+            break
+        batches += 1
+        for key, count in moved.items():
+            totals[key] += count
+        if progress:
+            progress(totals)
+    return totals
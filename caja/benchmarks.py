@@ -0,0 +1,169 @@
+"""
+Benchmarks de las vistas con consultas pesadas, medidas de punta a punta.
+
+Cada entrada devuelve la URL a pedir; `run_benchmarks` la pide con el Client
+de Django (middleware, vista, consultas y plantilla reales) como un usuario
+con todos los roles, y registra por corrida el tiempo total, el tiempo en la
+base (QueryRecorder) y la cantidad de consultas. Así se ven juntas la
+consulta que crece con el volumen y la plantilla que la muestra.
+
+Lo corre `manage.py benchmark_queries`, normalmente sobre los datos de
+caja.scale_data a distintas escalas.
+"""
+import statistics
+import time
+
+from django.contrib import admin
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+
+from .catalog import bump_catalog_version
+from .instrumentation import QueryRecorder
+from .lookups import StateName, states
+from .models import CustomUser, Order
+
+BENCHMARKS = {}
+
+BENCHMARK_USER = 'benchmark'
+
+
+def benchmark(name, prepare=None):
+    """Registra una URL a medir; `prepare` corre antes de cada pedido, fuera de la medición."""
+    def register(builder):
+        builder.prepare = prepare
+        BENCHMARKS[name] = builder
+        return builder
+    return register
+
+
+def benchmark_user():
+    """Superusuario con rol de administrador y en el grupo de cocina, para pasar todos los controles."""
+    user, _ = CustomUser.objects.get_or_create(
+        username=BENCHMARK_USER, defaults={'role': 'Super Usuario', 'is_staff': True, 'is_superuser': True},
+    )
+    user.groups.add(Group.objects.get_or_create(name='Cocineros')[0])
+    return user
+
+
+def _context(client):
+    latest = Order.objects.aggregate(day=Max('order_date'))['day']
+    first_page = client.get('/caja/api/orders/').json()
+    per_page = admin.site._registry[Order].list_per_page
+    return {
+        'day': latest.isoformat() if latest else '',
+        'cursor': first_page.get('next_cursor') or '',
+        'delivered': states.id_of(StateName.ENTREGADO),
+        'last_admin_page': max(1, -(-Order.objects.count() // per_page)),
+    }
+
+
+@benchmark('caja.orders_list')
+def orders_list(context):
+    return '/caja/api/orders/'
+
+
+@benchmark('caja.orders_list.next_page')
+def orders_list_next_page(context):
+    return f"/caja/api/orders/?cursor={context['cursor']}"
+
+
+@benchmark('caja.orders_list.by_date')
+def orders_list_by_date(context):
+    return f"/caja/api/orders/?date={context['day']}"
+
+
+@benchmark('caja.orders_list.by_status')
+def orders_list_by_status(context):
+    return f"/caja/api/orders/?status={context['delivered']}"
+
+
+@benchmark('cocina.dashboard')
+def kitchen_dashboard(context):
+    return '/cocina/'
+
+
+# Primer pedido después de un cambio de catálogo: arma el menú desde la base
+@benchmark('cliente.menu', prepare=bump_catalog_version)
+def menu(context):
+    return '/1/menu/'
+
+
+@benchmark('cliente.menu.cached')
+def menu_cached(context):
+    return '/1/menu/'
+
+
+@benchmark('admin.order_changelist')
+def admin_orders(context):
+    return '/admin/caja/order/'
+
+
+@benchmark('admin.order_changelist.search')
+def admin_orders_search(context):
+    return '/admin/caja/order/?q=Ana'
+
+
+@benchmark('admin.order_changelist.by_status')
+def admin_orders_by_status(context):
+    return f"/admin/caja/order/?status__id__exact={context['delivered']}"
+
+
+@benchmark('admin.order_changelist.deep_page')
+def admin_orders_deep_page(context):
+    # Última página: el OFFSET más caro del paginador del admin
+    return f"/admin/caja/order/?p={context['last_admin_page']}"
+
+
+@benchmark('admin.product_changelist')
+def admin_products(context):
+    return '/admin/caja/product/'
+
+
+def _summary(values):
+    return {
+        'min': round(min(values), 2),
+        'p50': round(statistics.median(values), 2),
+        'mean': round(statistics.fmean(values), 2),
+        'max': round(max(values), 2),
+    }
+
+
+def run_benchmarks(names=None, repeat=5, warmup=1):
+    """
+    Corre cada benchmark `warmup` veces sin medir y `repeat` veces midiendo.
+    Devuelve {nombre: {'path', 'status', 'runs', 'total_ms', 'db_ms', 'queries', 'bytes'}}.
+    """
+    client = Client(HTTP_HOST='localhost')
+    client.force_login(benchmark_user())
+    context = _context(client)
+    results = {}
+    for name, builder in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        path = builder(context)
+        total_ms, db_ms, queries = [], [], []
+        for run in range(warmup + repeat):
+            if builder.prepare:
+                builder.prepare()
+            recorder = QueryRecorder()
+            start = time.perf_counter()
+            with connection.execute_wrapper(recorder):
+                response = client.get(path)
+            elapsed = time.perf_counter() - start
+            if run < warmup:
+                continue
+            total_ms.append(elapsed * 1000)
+            db_ms.append(recorder.duration * 1000)
+            queries.append(recorder.count)
+        results[name] = {
+            'path': path,
+            'status': response.status_code,
+            'runs': repeat,
+            'total_ms': _summary(total_ms),
+            'db_ms': _summary(db_ms),
+            'queries': max(queries),
+            'bytes': len(response.content),
+        }
+    return results
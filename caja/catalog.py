@@ -0,0 +1,139 @@
+"""
+Versión del catálogo y snapshot del menú para las vistas de clientes.
+
+Cualquier alta, cambio o baja de Product, Category o Promotion incrementa la
+versión del catálogo (ver caja.signals). Todo lo que se cachea a partir del
+catálogo lleva la versión en la clave, así que nunca hace falta borrar
+entradas: las viejas quedan huérfanas y expiran solas.
+"""
+import random
+import time
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Product
+
+CATALOG_VERSION_KEY = 'catalog:version'
+MENU_CACHE_TIMEOUT = 60 * 60 * 24
+
+FEATURED_COUNT = 8
+# Peso relativo en el sorteo de destacados de un producto con promoción vigente
+PROMOTION_WEIGHT = 3
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Arranca desde el reloj para no reutilizar versiones si el cache se vació
+        version = int(time.time() * 1000)
+        if not cache.add(CATALOG_VERSION_KEY, version, timeout=None):
+            version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        return get_catalog_version()
+
+
+def image_fields(producto):
+    """URL de la imagen y srcset de sus variantes (WebP y JPEG) para las plantillas."""
+    # Import diferido: caja.images importa este módulo para invalidar la versión
+    from .images import fallback_url, srcset
+
+    if not producto.image:
+        return {'image_url': '', 'image_srcset_webp': '', 'image_srcset_jpeg': ''}
+    variants = producto.image_variants
+    return {
+        'image_url': fallback_url(variants) or producto.image.url,
+        'image_srcset_webp': srcset(variants, 'webp'),
+        'image_srcset_jpeg': srcset(variants, 'jpeg'),
+    }
+
+
+def _build_menu():
+    """Categorías con productos disponibles, en una sola consulta agrupada por categoría."""
+    productos = (
+        Product.objects.filter(active=True, stock__gt=0, idCategoria__isnull=False)
+        .select_related('idCategoria')
+        .only('id', 'name', 'description', 'price', 'image', 'image_variants', 'idCategoria__id', 'idCategoria__name')
+        .order_by('idCategoria_id', 'id')
+    )
+    menu = []
+    for producto in productos:
+        categoria = producto.idCategoria
+        if not menu or menu[-1][0]['id'] != categoria.id:
+            menu.append(({'id': categoria.id, 'name': categoria.name}, []))
+        menu[-1][1].append({
+            'id': producto.id,
+            'name': producto.name,
+            'description': producto.description,
+            'price': producto.price,
+            **image_fields(producto),
+        })
+    return menu
+
+
+def get_menu_snapshot():
+    """Devuelve (versión, menú) usando el snapshot cacheado de la versión actual."""
+    version = get_catalog_version()
+    key = f'catalog:menu:{version}'
+    menu = cache.get(key)
+    if menu is None:
+        menu = _build_menu()
+        cache.set(key, menu, MENU_CACHE_TIMEOUT)
+    return version, menu
+
+
+def _build_featured_pool(today):
+    """Productos activos con imagen y su peso para el sorteo de destacados."""
+    promocion_vigente = Q(idPromotion__start_date__lte=today, idPromotion__end_date__gte=today)
+    productos = (
+        Product.objects.filter(active=True)
+        .exclude(image='').exclude(image__isnull=True)
+        .annotate(en_promocion=promocion_vigente)
+        .only('id', 'name', 'image', 'image_variants')
+        .order_by('id')
+    )
+    return [
+        {
+            'id': producto.id,
+            'name': producto.name,
+            **image_fields(producto),
+            'weight': PROMOTION_WEIGHT if producto.en_promocion else 1,
+        }
+        for producto in productos
+    ]
+
+
+def get_featured_pool():
+    """Devuelve (versión, pool) del cache; se reconstruye cuando cambia el catálogo o el día."""
+    version = get_catalog_version()
+    today = timezone.localdate()
+    key = f'catalog:featured:{version}:{today.isoformat()}'
+    pool = cache.get(key)
+    if pool is None:
+        pool = _build_featured_pool(today)
+        cache.set(key, pool, MENU_CACHE_TIMEOUT)
+    return version, pool
+
+
+def sample_featured(pool, count=FEATURED_COUNT, seed=None, weighted=True):
+    """
+    Elige `count` productos del pool sin repetir. Con la misma semilla el resultado
+    es el mismo, lo que permite cachear la página por mesa.
+    """
+    rng = random.Random(seed)
+    if len(pool) <= count:
+        sample = list(pool)
+        rng.shuffle(sample)
+        return sample
+    if not weighted or all(item['weight'] == 1 for item in pool):
+        return rng.sample(pool, count)
+    # Muestreo ponderado sin reemplazo (Efraimidis-Spirakis): clave u^(1/peso)
+    keyed = sorted(pool, key=lambda item: rng.random() ** (1.0 / item['weight']), reverse=True)
+    return keyed[:count]
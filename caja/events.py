@@ -0,0 +1,142 @@
+"""
+Stream de eventos de pedidos (Server-Sent Events) para cocina y caja.
+
+Las escrituras de Order publican eventos en un broker en memoria del proceso;
+los dashboards se suscriben a /caja/api/events/ y reciben solo los cambios.
+El broker guarda los últimos eventos para reanudar con Last-Event-ID.
+
+El endpoint necesita servirse por ASGI (main.asgi:application): bajo WSGI
+no hay forma de mantener la conexión abierta sin ocupar un worker.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .lookups import states
+
+HEARTBEAT_SECONDS = 15
+BUFFER_SIZE = 500
+
+ORDER_CREATED = 'order-created'
+STATUS_CHANGED = 'status-changed'
+
+
+class EventBroker:
+    """Broker pub/sub en proceso con buffer circular para reanudar suscripciones."""
+
+    def __init__(self, buffer_size=BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+
+    @property
+    def last_id(self):
+        with self._lock:
+            return self._buffer[-1]['id'] if self._buffer else 0
+
+    def publish(self, event_type, data):
+        with self._lock:
+            event = {'id': next(self._ids), 'event': event_type, 'data': data}
+            self._buffer.append(event)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            loop, queue = subscriber
+            # Los publicadores corren en hilos sync; la cola vive en el loop del suscriptor
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # El loop del suscriptor ya se cerró sin desuscribirse
+                self.unsubscribe(subscriber)
+        return event
+
+    def subscribe(self, last_event_id=None):
+        """
+        Registra un suscriptor en el loop actual.
+        Devuelve (cola, eventos_pendientes, requiere_reset).
+        """
+        queue = asyncio.Queue()
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            backlog = []
+            reset = False
+            if last_event_id is not None:
+                oldest = self._buffer[0]['id'] if self._buffer else None
+                newest = self._buffer[-1]['id'] if self._buffer else 0
+                if last_event_id > newest or (oldest is not None and last_event_id < oldest - 1):
+                    # El cliente viene de otro proceso o se perdió eventos que ya no están en el buffer
+                    reset = True
+                else:
+                    backlog = [event for event in self._buffer if event['id'] > last_event_id]
+        return subscriber, backlog, reset
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+
+broker = EventBroker()
+
+
+def order_event_data(order):
+    return {
+        "id": order.id,
+        "customer_name": order.customer_name,
+        "table": str(order.tableNumber),
+        "date": str(order.order_date),
+        "status_id": order.status_id,
+        "status": states.get_by_id(order.status_id).name,
+        "total": float(order.amount),
+    }
+
+
+def format_sse(event):
+    payload = json.dumps(event['data'], ensure_ascii=False)
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {payload}\n\n"
+
+
+def _parse_last_event_id(request):
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+async def _event_stream(last_event_id):
+    subscriber, backlog, reset = broker.subscribe(last_event_id)
+    queue = subscriber[1]
+    try:
+        yield "retry: 3000\n\n"
+        if reset:
+            yield format_sse({'id': broker.last_id, 'event': 'reset', 'data': {}})
+        for event in backlog:
+            yield format_sse(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+async def order_events_stream(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'No autenticado'}, status=401)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'El stream de eventos requiere servir la app por ASGI'}, status=501)
+
+    response = StreamingHttpResponse(_event_stream(_parse_last_event_id(request)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,242 @@
+"""
+Exportación de pedidos con sus items y pagos, en CSV o NDJSON, sin cargar el
+historial en memoria.
+
+Los pedidos se leen con .iterator(chunk_size) en orden (order_date, id) y, por
+cada lote, los items y pagos del lote se traen en una consulta cada uno: tres
+consultas por lote sin importar cuántos pedidos tenga el rango. Los pedidos
+archivados (caja.archive) se leen igual de sus tablas y se intercalan en el
+mismo orden. La salida se arma en bloques de ~64KB y, si se pide, se comprime
+en gzip a medida que se genera. La usan la vista /caja/api/export/orders/ y
+`manage.py export_orders`.
+
+Formatos:
+    ndjson  un pedido por línea, con "items" y "payments" anidados
+    csv     una fila por item con los datos del pedido repetidos (y una fila
+            sin producto para los pedidos sin items); paid_total suma los
+            pagos aprobados
+
+Los importes van como texto con dos decimales ("2500.00") para no perder
+precisión en la planilla.
+"""
+import csv
+import heapq
+import io
+import json
+import zlib
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .lookups import PaymentStatusName, payment_methods, payment_statuses, states
+from .models import ArchivedOrder, ArchivedOrderItem, ArchivedPayment, Order, OrderItem, Payment
+
+CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 500)
+FLUSH_BYTES = 64 * 1024
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+CSV_COLUMNS = (
+    'order_id', 'date', 'time', 'customer_name', 'table', 'status', 'order_total', 'paid_total', 'payment_methods',
+    'product_id', 'product_name', 'quantity', 'price', 'subtotal', 'sugerency',
+)
+
+
+def export_queryset(since=None, until=None, state_id=None, archived=False):
+    """Pedidos a exportar (los archivados con `archived`) como values(), en el orden del índice (order_date, id)."""
+    queryset = (ArchivedOrder if archived else Order).objects.values(
+        'id', 'order_date', 'initialTime', 'customer_name', 'tableNumber', 'status_id', 'amount'
+    )
+    if since is not None:
+        queryset = queryset.filter(order_date__gte=since)
+    if until is not None:
+        queryset = queryset.filter(order_date__lte=until)
+    if state_id is not None:
+        queryset = queryset.filter(status_id=state_id)
+    return queryset.order_by('order_date', 'id')
+
+
+def _with_details(batch, archived=False):
+    ids = [row['id'] for row in batch]
+    item_model, payment_model = (ArchivedOrderItem, ArchivedPayment) if archived else (OrderItem, Payment)
+    # El archivo guarda el nombre del producto; en las tablas calientes sale del join
+    product_name = F('product_name') if archived else F('product__name')
+    items = defaultdict(list)
+    for item in item_model.objects.filter(order_id__in=ids).order_by('order_id', 'id').values(
+        'order_id', 'product_id', 'quantity', 'price', 'subtotal', 'sugerency', name=product_name
+    ):
+        items[item['order_id']].append(item)
+    payments = defaultdict(list)
+    for payment in payment_model.objects.filter(idOrder_id__in=ids).order_by('idOrder_id', 'id').values(
+        'id', 'idOrder_id', 'idPaymentMethod_id', 'idPaymentStatus_id', 'amount', 'payment_date'
+    ):
+        payments[payment['idOrder_id']].append(payment)
+    for row in batch:
+        row['items'] = items.get(row['id'], [])
+        row['payments'] = payments.get(row['id'], [])
+        yield row
+
+
+def iter_orders(queryset, chunk_size=CHUNK_SIZE):
+    """Pedidos con 'items' y 'payments', de a lotes de `chunk_size`."""
+    archived = queryset.model is ArchivedOrder
+    batch = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            yield from _with_details(batch, archived)
+            batch = []
+    if batch:
+        yield from _with_details(batch, archived)
+
+
+def iter_all_orders(since=None, until=None, state_id=None, chunk_size=CHUNK_SIZE):
+    """Pedidos calientes y archivados del rango, intercalados por (order_date, id)."""
+    return heapq.merge(
+        iter_orders(export_queryset(since, until, state_id), chunk_size),
+        iter_orders(export_queryset(since, until, state_id, archived=True), chunk_size),
+        key=lambda row: (row['order_date'], row['id']),
+    )
+
+
+def _money(value):
+    return f'{value:.2f}'
+
+
+def _local_iso(value):
+    return timezone.localtime(value).isoformat(timespec='seconds') if value else ''
+
+
+def ndjson_record(row):
+    return {
+        'id': row['id'],
+        'date': row['order_date'].isoformat(),
+        'time': _local_iso(row['initialTime']),
+        'customer_name': row['customer_name'] or '',
+        'table': int(row['tableNumber']),
+        'status': states.get_by_id(row['status_id']).name,
+        'total': _money(row['amount']),
+        'items': [
+            {
+                'product_id': item['product_id'],
+                'product_name': item['name'],
+                'quantity': item['quantity'],
+                'price': _money(item['price']),
+                'subtotal': _money(item['subtotal']),
+                'sugerency': item['sugerency'] or '',
+            }
+            for item in row['items']
+        ],
+        'payments': [
+            {
+                'id': payment['id'],
+                'method': payment_methods.get_by_id(payment['idPaymentMethod_id']).name,
+                'status': payment_statuses.get_by_id(payment['idPaymentStatus_id']).name,
+                'amount': _money(payment['amount']),
+                'date': _local_iso(payment['payment_date']),
+            }
+            for payment in row['payments']
+        ],
+    }
+
+
+def csv_rows(row):
+    approved = payment_statuses.id_of(PaymentStatusName.APROBADO)
+    paid = [payment for payment in row['payments'] if payment['idPaymentStatus_id'] == approved]
+    methods = sorted({payment_methods.get_by_id(payment['idPaymentMethod_id']).name for payment in paid})
+    order_columns = [
+        row['id'],
+        row['order_date'].isoformat(),
+        _local_iso(row['initialTime']),
+        row['customer_name'] or '',
+        int(row['tableNumber']),
+        states.get_by_id(row['status_id']).name,
+        _money(row['amount']),
+        _money(sum((payment['amount'] for payment in paid), 0)),
+        '; '.join(methods),
+    ]
+    if not row['items']:
+        yield order_columns + [''] * 6
+    for item in row['items']:
+        yield order_columns + [
+            item['product_id'],
+            item['name'],
+            item['quantity'],
+            _money(item['price']),
+            _money(item['subtotal']),
+            item['sugerency'] or '',
+        ]
+
+
+def _text_lines(orders, fmt):
+    if fmt == 'ndjson':
+        for row in orders:
+            yield json.dumps(ndjson_record(row), ensure_ascii=False) + '\n'
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM para que Excel abra el archivo como UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue()
+    for row in orders:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(csv_rows(row))
+        yield buffer.getvalue()
+
+
+def export_chunks(orders, fmt, compress=False):
+    """Bloques de bytes de ~FLUSH_BYTES con la exportación; gzip al vuelo con `compress`."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    pending = []
+    size = 0
+    for text in _text_lines(orders, fmt):
+        data = text.encode('utf-8')
+        pending.append(data)
+        size += len(data)
+        if size < FLUSH_BYTES:
+            continue
+        chunk = b''.join(pending)
+        pending, size = [], 0
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    chunk = b''.join(pending)
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+async def _async_chunks(chunks):
+    # Bajo ASGI Django consumiría un iterador sync entero en memoria antes de enviarlo;
+    # así cada bloque se genera en el hilo sync (con su conexión) a medida que se envía.
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close, thread_sensitive=True)()
+
+
+def streaming_response(request, chunks, content_type, filename):
+    """StreamingHttpResponse que no acumula la salida ni con WSGI ni con ASGI."""
+    if isinstance(request, ASGIRequest):
+        chunks = _async_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,144 @@
+"""
+Servidor HTTP falso que imita los endpoints de Mercado Pago que usa la caja.
+
+Sirve para tests y benchmarks locales sin salir a internet:
+
+    python manage.py run_fake_gateway --port 8765 --latency-ms 40
+    MERCADO_PAGO_API_BASE_URL = 'http://127.0.0.1:8765'
+
+Responde a POST /checkout/preferences, GET /checkout/preferences/<id> y
+GET /v1/payments/<id>. La latencia y las fallas (503) se configuran en vivo
+sobre la instancia de FakeGateway.
+"""
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAYMENT_PATH = re.compile(r'^/v1/payments/(?P<id>[^/?]+)')
+PREFERENCE_PATH = re.compile(r'^/checkout/preferences(?:/(?P<id>[^/?]+))?/?(?:\?.*)?$')
+
+
+class FakeGateway:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        # Cantidad de próximas respuestas que serán 503, independiente de error_rate
+        self.fail_next = 0
+        self.payments = {}
+        self.preferences = {}
+        self.requests = 0
+        self.connections = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def add_payment(self, payment_id, status='approved', external_reference=None, **extra):
+        self.payments[str(payment_id)] = {
+            'id': payment_id, 'status': status, 'external_reference': external_reference, **extra,
+        }
+
+    def _should_fail(self):
+        with self._lock:
+            self.requests += 1
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return True
+        return self.error_rate and random.random() < self.error_rate
+
+    def handle(self, method, path, body):
+        """Devuelve (status, cuerpo) para la petición."""
+        if self.latency:
+            time.sleep(self.latency)
+        if self._should_fail():
+            return 503, {'message': 'service unavailable'}
+
+        match = PAYMENT_PATH.match(path)
+        if method == 'GET' and match:
+            payment = self.payments.get(match['id'])
+            if payment is None:
+                return 404, {'message': 'Payment not found', 'status': 404}
+            return 200, payment
+
+        match = PREFERENCE_PATH.match(path)
+        if match and method == 'POST' and not match['id']:
+            preference_id = f'fake-pref-{next(self._ids)}'
+            preference = {
+                **body,
+                'id': preference_id,
+                'init_point': f'{self.base_url}/checkout/v1/redirect?pref_id={preference_id}',
+            }
+            self.preferences[preference_id] = preference
+            return 201, preference
+        if match and method == 'GET' and match['id']:
+            preference = self.preferences.get(match['id'])
+            return (200, preference) if preference else (404, {'message': 'Preference not found'})
+
+        return 404, {'message': f'{method} {path} no existe en el gateway falso'}
+
+    def _handler_class(self):
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+            # Encabezados y cuerpo salen en escrituras separadas; sin esto Nagle demora cada respuesta
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with gateway._lock:
+                    gateway.connections += 1
+
+            def _respond(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    body = {}
+                status, payload = gateway.handle(method, self.path, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def do_POST(self):
+                self._respond('POST')
+
+            def do_PUT(self):
+                self._respond('PUT')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,257 @@
+"""
+Cliente compartido para la API de Mercado Pago.
+
+El SDK oficial abre una sesión HTTP nueva (y un handshake TLS) en cada llamada
+y no permite controlar timeouts por operación. Este módulo arma un único SDK
+por proceso sobre un HttpClient propio que:
+
+- reutiliza conexiones keep-alive con un pool de requests.Session,
+- aplica timeouts (conexión, lectura) según la operación,
+- corta las llamadas con un circuit breaker cuando la pasarela se degrada
+  (cerrado -> abierto -> semiabierto con una llamada de prueba),
+- registra latencias y errores por operación en `metrics`.
+
+Con MERCADO_PAGO_API_BASE_URL se apunta el cliente a otra URL, por ejemplo al
+servidor falso de caja.fake_gateway para tests y benchmarks.
+"""
+import re
+import threading
+import time
+from collections import deque
+
+import mercadopago
+import requests
+from django.conf import settings
+from mercadopago.http import HttpClient
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+MP_API_BASE_URL = 'https://api.mercadopago.com'
+
+# (timeout de conexión, timeout de lectura) en segundos por operación
+DEFAULT_TIMEOUTS = {
+    'preference.create': (3.05, 10),
+    'payment.get': (3.05, 5),
+    'default': (3.05, 10),
+}
+
+# Operación según método y ruta de la URL que arma el SDK
+OPERATIONS = [
+    ('POST', re.compile(r'^/checkout/preferences/?$'), 'preference.create'),
+    ('GET', re.compile(r'^/checkout/preferences/[^/]+$'), 'preference.get'),
+    ('GET', re.compile(r'^/v1/payments/[^/]+$'), 'payment.get'),
+]
+
+# Respuestas que indican que la pasarela está degradada (los 4xx son errores nuestros)
+FAILURE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class GatewayUnavailable(RuntimeError):
+    """El circuito está abierto: no se llama a Mercado Pago hasta que pase el período de espera."""
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """Lanza GatewayUnavailable si la llamada no debe salir."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN:
+                remaining = self.reset_timeout - (self._clock() - self._opened_at)
+                if remaining > 0:
+                    raise GatewayUnavailable(f"Mercado Pago no disponible, reintentar en {remaining:.0f}s")
+                self._state = self.HALF_OPEN
+            # Semiabierto: pasa una sola llamada de prueba a la vez
+            if self._trial_in_flight:
+                raise GatewayUnavailable("Mercado Pago no disponible, hay una llamada de prueba en curso")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+    def reset(self):
+        self.record_success()
+
+
+class GatewayMetrics:
+    """Contadores y latencias recientes por operación, en memoria del proceso."""
+
+    def __init__(self, sample_size=1000):
+        self._lock = threading.Lock()
+        self._sample_size = sample_size
+        self._ops = {}
+
+    def record(self, operation, elapsed, outcome):
+        with self._lock:
+            op = self._ops.get(operation)
+            if op is None:
+                op = self._ops[operation] = {'latencies': deque(maxlen=self._sample_size), 'outcomes': {}}
+            op['latencies'].append(elapsed)
+            op['outcomes'][outcome] = op['outcomes'].get(outcome, 0) + 1
+
+    def snapshot(self):
+        """{operación: {'count', 'outcomes', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'}}"""
+        with self._lock:
+            ops = {name: (sorted(op['latencies']), dict(op['outcomes'])) for name, op in self._ops.items()}
+        result = {}
+        for name, (latencies, outcomes) in ops.items():
+            summary = {'count': sum(outcomes.values()), 'outcomes': outcomes}
+            if latencies:
+                for label, q in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+                    summary[label] = round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2)
+                summary['max_ms'] = round(latencies[-1] * 1000, 2)
+            result[name] = summary
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._ops.clear()
+
+
+def operation_for(method, path):
+    for op_method, pattern, name in OPERATIONS:
+        if method == op_method and pattern.match(path):
+            return name
+    return f'{method.lower()} {path}'
+
+
+class PooledHttpClient(HttpClient):
+    """HttpClient del SDK con sesión persistente, timeouts por operación, breaker y métricas."""
+
+    def __init__(self, base_url=None, timeouts=None, breaker=None, metrics=None,
+                 pool_size=10, max_retries=1):
+        self.base_url = (base_url or MP_API_BASE_URL).rstrip('/')
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = metrics or GatewayMetrics()
+        self.session = requests.Session()
+        # Solo se reintentan lecturas idempotentes; crear una preferencia dos veces duplica el checkout
+        retry = Retry(total=max_retries, connect=max_retries, backoff_factor=0.2,
+                      status_forcelist=[502, 503, 504], allowed_methods=['GET'], raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _split(self, url):
+        path = url[len(MP_API_BASE_URL):] if url.startswith(MP_API_BASE_URL) else url
+        return self.base_url + path, path.split('?', 1)[0]
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        url, path = self._split(url)
+        operation = operation_for(method, path)
+        # El SDK manda su connection_timeout genérico (60s); se usa el de la operación
+        kwargs['timeout'] = self.timeouts.get(operation, self.timeouts['default'])
+
+        self.breaker.before_call()
+        start = time.perf_counter()
+        try:
+            api_result = self.session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            self.metrics.record(operation, time.perf_counter() - start, type(e).__name__)
+            raise
+        elapsed = time.perf_counter() - start
+
+        if api_result.status_code in FAILURE_STATUSES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        self.metrics.record(operation, elapsed, str(api_result.status_code))
+
+        response = {"status": api_result.status_code, "response": None}
+        if api_result.status_code != 204 and api_result.content:
+            try:
+                response["response"] = api_result.json()
+            except ValueError:
+                response["response"] = None
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+_lock = threading.Lock()
+_client = None
+_sdk = None
+
+
+def build_client():
+    return PooledHttpClient(
+        base_url=getattr(settings, 'MERCADO_PAGO_API_BASE_URL', None),
+        timeouts=getattr(settings, 'MERCADO_PAGO_TIMEOUTS', None),
+        breaker=CircuitBreaker(
+            failure_threshold=getattr(settings, 'MERCADO_PAGO_BREAKER_THRESHOLD', 5),
+            reset_timeout=getattr(settings, 'MERCADO_PAGO_BREAKER_RESET_SECONDS', 30),
+        ),
+        pool_size=getattr(settings, 'MERCADO_PAGO_POOL_SIZE', 10),
+        max_retries=getattr(settings, 'MERCADO_PAGO_MAX_RETRIES', 1),
+    )
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = build_client()
+    return _client
+
+
+def get_sdk():
+    """SDK de Mercado Pago compartido por el proceso, sobre el cliente con pool."""
+    global _sdk
+    if _sdk is None:
+        client = get_client()
+        with _lock:
+            if _sdk is None:
+                _sdk = mercadopago.SDK(settings.MERCADO_PAGO_ACCESS_TOKEN, http_client=client)
+    return _sdk
+
+
+def reset():
+    """Descarta el cliente actual (p. ej. al cambiar settings en tests)."""
+    global _client, _sdk
+    with _lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _sdk = None
+
+
+def metrics_snapshot():
+    client = _client
+    if client is None:
+        return {'breaker': CircuitBreaker.CLOSED, 'operations': {}}
+    return {'breaker': client.breaker.state, 'operations': client.metrics.snapshot()}
@@ -0,0 +1,144 @@
+"""
+Variantes redimensionadas de las fotos de productos.
+
+Las fotos originales (hasta 2048px y ~500KB) se sirven en el menú a celulares.
+Por cada imagen se generan versiones WebP y JPEG a varios anchos y se guardan
+bajo products/variants/ con el hash del contenido original en el nombre: si la
+foto cambia, cambian las URLs y no hay caches viejos que invalidar; si se
+vuelve a procesar la misma foto, los archivos ya existen y no se recalculan.
+
+El resultado queda en Product.image_variants:
+    {'digest': '<sha256>', 'width': 2048, 'webp': [[320, 'products/variants/...'], ...], 'jpeg': [...]}
+
+Las variantes se generan en segundo plano después del commit (ver
+caja.signals); el comando `generate_image_variants` procesa las imágenes que ya
+estaban cargadas.
+"""
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from PIL import Image, ImageOps
+
+from .catalog import bump_catalog_version
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = getattr(settings, 'PRODUCT_IMAGE_WIDTHS', (320, 640, 1024))
+VARIANT_FORMATS = {
+    # formato -> (extensión, opciones de Pillow)
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANTS_DIR = 'products/variants'
+
+_executor = None
+
+
+def _open_source(name):
+    """Abre la imagen original; Product.save puede haber dejado el nombre sin la carpeta products/."""
+    for candidate in (name, os.path.join('products', os.path.basename(name))):
+        if default_storage.exists(candidate):
+            return default_storage.open(candidate, 'rb')
+    return None
+
+
+def variant_name(digest, width, extension):
+    return f'{VARIANTS_DIR}/{digest[:2]}/{digest}-{width}.{extension}'
+
+
+def target_widths(original_width):
+    widths = [w for w in VARIANT_WIDTHS if w < original_width]
+    # Imágenes más chicas que todos los anchos: una sola variante al ancho original (recomprimida)
+    return widths or [original_width]
+
+
+def build_variants(source_bytes):
+    """Genera (o reutiliza) las variantes de una imagen y devuelve el dict para image_variants."""
+    digest = hashlib.sha256(source_bytes).hexdigest()
+    with Image.open(io.BytesIO(source_bytes)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        result = {'digest': digest, 'width': image.width}
+        for fmt, (extension, options) in VARIANT_FORMATS.items():
+            result[fmt] = []
+            for width in target_widths(image.width):
+                name = variant_name(digest, width, extension)
+                if not default_storage.exists(name):
+                    height = round(image.height * width / image.width)
+                    resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+                    if fmt == 'jpeg' and resized.mode == 'RGBA':
+                        resized = resized.convert('RGB')
+                    buffer = io.BytesIO()
+                    resized.save(buffer, format=fmt.upper(), **options)
+                    default_storage.save(name, ContentFile(buffer.getvalue()))
+                result[fmt].append([width, name])
+    return result
+
+
+def generate_product_variants(product_id, force=False):
+    """Procesa la imagen actual del producto. Devuelve True si actualizó image_variants."""
+    product = Product.objects.filter(pk=product_id).only('id', 'image', 'image_variants').first()
+    if product is None or not product.image:
+        if product is not None and product.image_variants:
+            Product.objects.filter(pk=product_id).update(image_variants={})
+            bump_catalog_version()
+        return False
+    source = _open_source(product.image.name)
+    if source is None:
+        logger.warning("No se encontró la imagen %s del producto %s", product.image.name, product_id)
+        return False
+    with source:
+        source_bytes = source.read()
+    if not force and product.image_variants.get('digest') == hashlib.sha256(source_bytes).hexdigest():
+        return False
+
+    variants = build_variants(source_bytes)
+    # update() para no volver a disparar las señales de save; el menú cacheado se invalida a mano
+    Product.objects.filter(pk=product_id, image=product.image.name).update(image_variants=variants)
+    bump_catalog_version()
+    return True
+
+
+def _run_in_background(product_id):
+    try:
+        generate_product_variants(product_id)
+    except Exception:
+        logger.exception("Error generando variantes de imagen del producto %s", product_id)
+    finally:
+        connection.close()
+
+
+def schedule_variants(product_id):
+    """Encola la generación de variantes; con PRODUCT_IMAGE_VARIANTS_ASYNC=False corre en el momento."""
+    global _executor
+    if not getattr(settings, 'PRODUCT_IMAGE_VARIANTS_ASYNC', True):
+        generate_product_variants(product_id)
+        return
+    if _executor is None:
+        # Un solo hilo: el redimensionado es CPU y no hace falta competir con los requests
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='product-images')
+    _executor.submit(_run_in_background, product_id)
+
+
+def media_url(name):
+    return default_storage.url(name)
+
+
+def srcset(variants, fmt):
+    """'url 320w, url 640w' listo para el atributo srcset."""
+    return ', '.join(f'{media_url(name)} {width}w' for width, name in (variants or {}).get(fmt, []))
+
+
+def fallback_url(variants):
+    """La variante JPEG más grande, para el src de <img>."""
+    jpegs = (variants or {}).get('jpeg') or []
+    return media_url(jpegs[-1][1]) if jpegs else ''
@@ -0,0 +1,152 @@
+"""
+Métricas por request: cantidad de consultas, consultas repetidas (N+1),
+tiempo en la base y tiempo total, agrupadas por nombre de URL.
+
+RequestMetricsMiddleware envuelve cada request con un QueryRecorder
+(connection.execute_wrapper), agrega el header Server-Timing a la respuesta y
+guarda la muestra en `request_metrics`, una ventana de las últimas muestras
+por URL en memoria del proceso. Los percentiles se consultan en
+/caja/api/metrics/ (solo staff).
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SIZE = getattr(settings, 'REQUEST_METRICS_WINDOW', 1000)
+# Una misma consulta repetida esta cantidad de veces en un request se reporta como N+1
+DUPLICATE_THRESHOLD = getattr(settings, 'REQUEST_METRICS_DUPLICATE_THRESHOLD', 3)
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Listas IN de largo variable: "IN (%s, %s, %s)" cuenta como la misma consulta
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def normalize_sql(sql):
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    """execute_wrapper que cuenta consultas, tiempo en la base y repeticiones."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[normalize_sql(sql)] += 1
+
+    def duplicates(self, threshold=DUPLICATE_THRESHOLD):
+        return {sql: n for sql, n in self.statements.items() if n >= threshold}
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class RequestMetrics:
+    """Últimas muestras por nombre de URL, en memoria del proceso."""
+
+    def __init__(self, window_size=WINDOW_SIZE):
+        self._lock = threading.Lock()
+        self._window_size = window_size
+        self._samples = {}
+        self._totals = {}
+
+    def record(self, name, total_ms, db_ms, queries, duplicated):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self._window_size)
+                self._totals[name] = {'requests': 0, 'n_plus_one': 0}
+            samples.append((total_ms, db_ms, queries))
+            self._totals[name]['requests'] += 1
+            if duplicated:
+                self._totals[name]['n_plus_one'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            data = {name: (list(samples), dict(self._totals[name])) for name, samples in self._samples.items()}
+        result = {}
+        for name, (samples, totals) in sorted(data.items()):
+            total_ms = sorted(s[0] for s in samples)
+            db_ms = sorted(s[1] for s in samples)
+            queries = sorted(s[2] for s in samples)
+            histogram = Counter()
+            for value in total_ms:
+                bucket = next((f'<={b}' for b in HISTOGRAM_BUCKETS_MS if value <= b), f'>{HISTOGRAM_BUCKETS_MS[-1]}')
+                histogram[bucket] += 1
+            result[name] = {
+                **totals,
+                'window': len(samples),
+                'total_ms': {f'p{int(q * 100)}': round(_percentile(total_ms, q), 2) for q in (0.5, 0.95, 0.99)},
+                'db_ms': {f'p{int(q * 100)}': round(_percentile(db_ms, q), 2) for q in (0.5, 0.95, 0.99)},
+                'queries': {f'p{int(q * 100)}': _percentile(queries, q) for q in (0.5, 0.95, 0.99)},
+                'histogram_ms': dict(histogram),
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+
+request_metrics = RequestMetrics()
+
+
+def _url_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<sin resolver>'
+    return match.view_name or match._func_path
+
+
+def server_timing(total_ms, db_ms, queries):
+    return (
+        f'db;dur={db_ms:.1f};desc="{queries} consultas", '
+        f'app;dur={total_ms - db_ms:.1f}, total;dur={total_ms:.1f}'
+    )
+
+
+class RequestMetricsMiddleware:
+    """
+    Solo sync a propósito: bajo ASGI Django la corre en el mismo hilo que la vista
+    sync, y así el execute_wrapper ve sus consultas. Las vistas async (el stream
+    SSE) se adaptan y quedan medidas solo en tiempo hasta devolver la respuesta.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = recorder.duration * 1000
+        name = _url_name(request)
+
+        duplicates = recorder.duplicates()
+        for sql, times in duplicates.items():
+            logger.warning("Posible N+1 en %s: %d veces %s", name, times, sql[:300])
+
+        request_metrics.record(name, total_ms, db_ms, recorder.count, bool(duplicates))
+        response['Server-Timing'] = server_timing(total_ms, db_ms, recorder.count)
+        return response
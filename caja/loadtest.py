@@ -0,0 +1,258 @@
+"""
+Generador de carga que reproduce el recorrido real de las mesas, la cocina y la caja.
+
+Cada comensal virtual hace lo mismo que el navegador en cliente/: abre el
+index de su mesa, el menú, uno o dos detalles de producto (de los links del
+menú), arma el carrito con los botones del menú, guarda el pedido y pide la
+preferencia de pago. En paralelo, los cocineros virtuales consultan el
+tablero y el delta de fragmentos como el JS de cocina, y los cajeros el
+dashboard, el estado de sesión y el listado de pedidos del día. Todo contra un servidor HTTP real (ver `manage.py load_test`,
+que levanta uno con `run_load_server` y el gateway falso de Mercado Pago).
+
+Las latencias y resultados se guardan por paso con GatewayMetrics; el reporte
+agrega requests/s y tasa de error por paso.
+"""
+import json
+import random
+import re
+import threading
+import time
+
+import requests
+from django.contrib.auth.models import Group
+from django.utils import timezone
+
+from .gateway import GatewayMetrics
+from .models import CustomUser
+
+# Botones "Agregar al Carrito" del menú y links al detalle (solo los productos con foto)
+ADD_TO_CART = re.compile(r'class="agregar-carrito"\s+data-id="(\d+)"')
+PRODUCT_LINK = re.compile(r'/producto/(\d+)/')
+
+# Usuarios que crea run_load_server en su base descartable
+LOAD_PASSWORD = 'carga-Local-1!'
+LOAD_USERS = {
+    'cocina': {'username': 'carga-cocina', 'role': 'cocinero', 'group': 'Cocineros'},
+    'caja': {'username': 'carga-caja', 'role': 'Empleado', 'group': None},
+}
+
+
+def ensure_load_users(password=LOAD_PASSWORD):
+    """Crea (o resetea) los usuarios de cocina y caja que usa el generador."""
+    for data in LOAD_USERS.values():
+        user, _ = CustomUser.objects.get_or_create(username=data['username'], defaults={'role': data['role']})
+        user.role = data['role']
+        user.set_password(password)
+        user.save()
+        if data['group']:
+            user.groups.add(Group.objects.get_or_create(name=data['group'])[0])
+
+
+class LoadClient:
+    """Sesión HTTP de un usuario virtual (cookies propias) que mide cada request por paso."""
+
+    def __init__(self, base_url, metrics, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.metrics = metrics
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def request(self, step, method, path, expect=(200,), check=None, **kwargs):
+        """
+        Devuelve la respuesta si el status es el esperado (y `check(response)` da True);
+        si no, None, y el resultado queda contado como error del paso.
+        """
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            if response.status_code not in expect:
+                outcome = f'http_{response.status_code}'
+            elif check is not None and not check(response):
+                outcome = 'respuesta_invalida'
+            else:
+                outcome = 'ok'
+        except (requests.RequestException, ValueError) as e:
+            response, outcome = None, type(e).__name__
+        self.metrics.record(step, time.perf_counter() - start, outcome)
+        return response if outcome == 'ok' else None
+
+    def login(self, username, password):
+        # La página de login deja la cookie CSRF; el POST va como lo manda login_django.js
+        if self.request('caja.login_page', 'GET', '/caja/login/') is None:
+            return False
+        response = self.request(
+            'caja.login', 'POST', '/caja/login/',
+            data=json.dumps({'username': username, 'password': password}),
+            headers={
+                'Content-Type': 'application/json',
+                'X-Requested-With': 'XMLHttpRequest',
+                'X-CSRFToken': self.session.cookies.get('csrftoken', ''),
+            },
+        )
+        return response is not None
+
+    def close(self):
+        self.session.close()
+
+
+def diner_journey(client, table, rng):
+    """Un pedido completo de una mesa. Devuelve True si llegó hasta la preferencia de pago."""
+    if client.request('cliente.index', 'GET', f'/{table}/') is None:
+        return False
+    menu = client.request('cliente.menu', 'GET', f'/{table}/menu/')
+    if menu is None:
+        return False
+    product_ids = sorted({int(pk) for pk in ADD_TO_CART.findall(menu.text)})
+    if not product_ids:
+        client.metrics.record('cliente.carrito', 0, 'sin_productos')
+        return False
+    with_detail = sorted({int(pk) for pk in PRODUCT_LINK.findall(menu.text)})
+    for product_id in rng.sample(with_detail, min(len(with_detail), rng.randint(1, 2))):
+        client.request('cliente.detalle_producto', 'GET', f'/{table}/producto/{product_id}/')
+    chosen = rng.sample(product_ids, min(len(product_ids), rng.randint(1, 3)))
+    carrito = [{'id': product_id, 'cantidad': rng.randint(1, 2)} for product_id in chosen]
+    saved = client.request(
+        'caja.guardar_pedido', 'POST', '/caja/api/guardar_pedido_cliente/',
+        json={'carrito': carrito, 'nombre': f'Mesa {table}', 'email': f'mesa{table}@example.com', 'table': table},
+        check=lambda response: bool(response.json().get('order_id')),
+    )
+    if saved is None:
+        return False
+    payment = client.request(
+        'caja.crear_pago', 'POST', '/caja/api/payments/create/',
+        json={'order_id': saved.json()['order_id'], 'return_url': f'{client.base_url}/{table}/pedido_pagado/'},
+        check=lambda response: bool(response.json().get('init_point')),
+    )
+    return payment is not None
+
+
+def kitchen_poll(client, since):
+    """Una vuelta del tablero de cocina: pide el delta desde `since` y devuelve el próximo since."""
+    response = client.request('cocina.delta', 'GET', '/cocina/fragments/delta/', params={'since': since})
+    return response.json()['now'] if response is not None else since
+
+
+def cashier_poll(client):
+    """Lo que hace el dashboard de caja al refrescar: estado de sesión y pedidos del día."""
+    client.request('caja.session_status', 'GET', '/caja/api/session_status/')
+    client.request('caja.pedidos', 'GET', '/caja/api/orders/', params={'date': timezone.localdate().isoformat()})
+
+
+class LoadTest:
+    """
+    Corre `diners` mesas, `kitchens` cocineros y `cashiers` cajeros en hilos hasta
+    `duration` segundos (o `iterations` recorridos por mesa, lo que llegue antes).
+    """
+
+    def __init__(self, base_url, diners=10, kitchens=1, cashiers=1, duration=30.0, iterations=None,
+                 think=0.5, poll_interval=2.0, kitchen_user=None, cashier_user=None, password=LOAD_PASSWORD,
+                 seed=None):
+        self.base_url = base_url
+        self.diners = diners
+        self.kitchens = kitchens
+        self.cashiers = cashiers
+        self.duration = duration
+        self.iterations = iterations
+        self.think = think
+        self.poll_interval = poll_interval
+        self.kitchen_user = kitchen_user or LOAD_USERS['cocina']['username']
+        self.cashier_user = cashier_user or LOAD_USERS['caja']['username']
+        self.password = password
+        self.seed = seed
+        self.metrics = GatewayMetrics(sample_size=1_000_000)
+        self._lock = threading.Lock()
+        self._journeys = {'completed': 0, 'failed': 0}
+        self._stop = threading.Event()
+        self._diners_left = 0
+
+    def _pause(self, seconds, rng):
+        # Espera con +-50% de variación para que los usuarios no vayan sincronizados
+        if seconds:
+            self._stop.wait(seconds * rng.uniform(0.5, 1.5))
+
+    def _diner(self, table):
+        rng = random.Random(None if self.seed is None else self.seed + table)
+        client = LoadClient(self.base_url, self.metrics)
+        done = 0
+        try:
+            while not self._stop.is_set() and (self.iterations is None or done < self.iterations):
+                ok = diner_journey(client, table, rng)
+                with self._lock:
+                    self._journeys['completed' if ok else 'failed'] += 1
+                done += 1
+                self._pause(self.think, rng)
+        finally:
+            client.close()
+            with self._lock:
+                self._diners_left -= 1
+                if self._diners_left == 0:
+                    # Terminaron todas las mesas: la cocina y la caja dejan de consultar
+                    self._stop.set()
+
+    def _staff(self, username, poll):
+        rng = random.Random(self.seed)
+        client = LoadClient(self.base_url, self.metrics)
+        try:
+            if not client.login(username, self.password):
+                return
+            poll(client, rng)
+        finally:
+            client.close()
+
+    def _kitchen(self, client, rng):
+        client.request('cocina.dashboard', 'GET', '/cocina/')
+        since = timezone.now().isoformat()
+        while True:
+            since = kitchen_poll(client, since)
+            self._pause(self.poll_interval, rng)
+            if self._stop.is_set():
+                return
+
+    def _cashier(self, client, rng):
+        client.request('caja.dashboard', 'GET', '/caja/dashboard/')
+        while True:
+            cashier_poll(client)
+            self._pause(self.poll_interval, rng)
+            if self._stop.is_set():
+                return
+
+    def run(self):
+        self._diners_left = self.diners
+        threads = [threading.Thread(target=self._diner, args=(table,)) for table in range(1, self.diners + 1)]
+        threads += [
+            threading.Thread(target=self._staff, args=(self.kitchen_user, self._kitchen)) for _ in range(self.kitchens)
+        ]
+        threads += [
+            threading.Thread(target=self._staff, args=(self.cashier_user, self._cashier)) for _ in range(self.cashiers)
+        ]
+        timer = threading.Timer(self.duration, self._stop.set) if self.duration else None
+        start = time.perf_counter()
+        if timer:
+            timer.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if timer:
+            timer.cancel()
+        return self.report(time.perf_counter() - start)
+
+    def report(self, elapsed):
+        steps = {}
+        for step, summary in sorted(self.metrics.snapshot().items()):
+            errors = summary['count'] - summary['outcomes'].get('ok', 0)
+            steps[step] = {
+                **summary,
+                'errors': errors,
+                'error_rate': round(errors / summary['count'], 4) if summary['count'] else 0.0,
+                'rps': round(summary['count'] / elapsed, 2) if elapsed else 0.0,
+            }
+        total = sum(step['count'] for step in steps.values())
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'requests': total,
+            'rps': round(total / elapsed, 2) if elapsed else 0.0,
+            'journeys': dict(self._journeys),
+            'journeys_per_min': round(self._journeys['completed'] * 60 / elapsed, 1) if elapsed else 0.0,
+            'steps': steps,
+        }
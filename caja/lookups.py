@@ -0,0 +1,116 @@
+"""
+Registro en memoria de las tablas de referencia: State, PaymentMethod y PaymentStatus.
+
+Son tablas chicas que casi no cambian y se consultan en cada pago y cada
+cambio de estado. Cada tabla se carga completa una vez por proceso y se
+resuelve por nombre o por id sin consultas; las señales de caja.signals
+vacían el registro cuando alguna fila cambia.
+
+Los nombres válidos están en los enums StateName, PaymentMethodName y
+PaymentStatusName para no repetir strings ni ids mágicos en las vistas.
+"""
+import enum
+import threading
+
+from .models import PaymentMethod, PaymentStatus, State
+
+
+class StateName(str, enum.Enum):
+    PENDIENTE = 'Pendiente'
+    EN_ESPERA = 'En espera'
+    EN_PREPARACION = 'En Preparación'
+    LISTO_PARA_ENTREGAR = 'Listo para Entregar'
+    ENTREGADO = 'Entregado'
+    CANCELADO = 'Cancelado'
+
+
+class PaymentMethodName(str, enum.Enum):
+    EFECTIVO = 'Efectivo'
+    TARJETA_CREDITO = 'Tarjeta de Crédito'
+    TARJETA_DEBITO = 'Tarjeta de Debito'
+    BILLETERA_ELECTRONICA = 'Billetera Electrónica'
+    DIVIDIR_CUENTA = 'Dividir Cuenta'
+
+
+class PaymentStatusName(str, enum.Enum):
+    APROBADO = 'Aprobado'
+    RECHAZADO = 'Rechazado'
+    REEMBOLSADO = 'Reembolsado'
+    PENDIENTE = 'Pendiente'
+
+
+class LookupTable:
+    """Tabla de referencia cacheada por proceso, indexada por nombre y por id."""
+
+    def __init__(self, model):
+        self.model = model
+        self._lock = threading.Lock()
+        self._by_name = None
+        self._by_id = None
+
+    def _load(self):
+        with self._lock:
+            if self._by_id is None:
+                rows = list(self.model.objects.order_by('id'))
+                self._by_name = {row.name: row for row in rows}
+                self._by_id = {row.id: row for row in rows}
+        return self._by_name, self._by_id
+
+    def invalidate(self):
+        with self._lock:
+            self._by_name = None
+            self._by_id = None
+
+    def get(self, name):
+        """Fila por nombre (acepta el enum o el string); lanza Model.DoesNotExist si no existe."""
+        by_name = self._by_name
+        if by_name is None:
+            by_name, _ = self._load()
+        key = name.value if isinstance(name, enum.Enum) else name
+        try:
+            return by_name[key]
+        except KeyError:
+            raise self.model.DoesNotExist(f"{self.model.__name__} '{key}' no existe")
+
+    def get_by_id(self, pk):
+        by_id = self._by_id
+        if by_id is None:
+            _, by_id = self._load()
+        try:
+            return by_id[int(pk)]
+        except (KeyError, TypeError, ValueError):
+            raise self.model.DoesNotExist(f"{self.model.__name__} con id {pk!r} no existe")
+
+    def id_of(self, name):
+        return self.get(name).id
+
+    def all(self):
+        """Todas las filas ordenadas por id."""
+        by_id = self._by_id
+        if by_id is None:
+            _, by_id = self._load()
+        return [by_id[pk] for pk in sorted(by_id)]
+
+    def first(self):
+        """La fila de menor id (p. ej. el estado inicial de una orden)."""
+        by_id = self._by_id
+        if by_id is None:
+            _, by_id = self._load()
+        return by_id[min(by_id)] if by_id else None
+
+
+states = LookupTable(State)
+payment_methods = LookupTable(PaymentMethod)
+payment_statuses = LookupTable(PaymentStatus)
+
+REGISTRY = {
+    State: states,
+    PaymentMethod: payment_methods,
+    PaymentStatus: payment_statuses,
+}
+
+
+def invalidate(model=None):
+    for lookup_model, table in REGISTRY.items():
+        if model is None or model is lookup_model:
+            table.invalidate()
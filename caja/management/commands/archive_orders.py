@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from caja.archive import ARCHIVE_AFTER_DAYS, BATCH_SIZE, archivable_orders, archive_cutoff, archive_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve los pedidos entregados o cancelados más viejos que --days, con sus items y pagos, "
+        "a las tablas de archivo (caja.archive), por lotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS, help="Días que quedan en las tablas calientes.")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Pedidos por transacción.")
+        parser.add_argument('--max-batches', type=int, help="Cortar después de esta cantidad de lotes.")
+        parser.add_argument('--dry-run', action='store_true', help="Solo contar lo que se archivaría.")
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1:
+            raise CommandError("--days no puede ser negativo y --batch-size tiene que ser mayor que cero.")
+        before = archive_cutoff(options['days'])
+        if options['dry_run']:
+            self.stdout.write(f"{archivable_orders(before).count()} pedidos cerrados anteriores a {before}.")
+            return
+        totals = archive_orders(
+            before, batch_size=options['batch_size'], max_batches=options['max_batches'],
+            progress=lambda totals: self.stderr.write(f"  {totals['orders']} pedidos archivados", ending='\r'),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['orders']} pedidos, {totals['items']} items y {totals['payments']} pagos archivados "
+            f"(anteriores a {before})."
+        ))
@@ -0,0 +1,60 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mercadopago
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from caja import gateway
+from caja.fake_gateway import FakeGateway
+
+
+class Command(BaseCommand):
+    help = "Mide la latencia de consultas de pago contra el gateway (falso por defecto), con y sin pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--latency-ms', type=float, default=20, help="Latencia del gateway falso.")
+        parser.add_argument('--base-url', help="Usar un gateway ya levantado en vez del falso en proceso.")
+
+    def handle(self, *args, **options):
+        fake = None
+        base_url = options['base_url']
+        if not base_url:
+            fake = FakeGateway(latency=options['latency_ms'] / 1000).start()
+            fake.add_payment('1', status='approved', external_reference='1')
+            base_url = fake.base_url
+        try:
+            pooled = gateway.PooledHttpClient(base_url=base_url, pool_size=options['concurrency'])
+            sdk = mercadopago.SDK(settings.MERCADO_PAGO_ACCESS_TOKEN, http_client=pooled)
+            self._run("pool compartido", lambda: sdk.payment().get('1'), options)
+            self.stdout.write(json.dumps(pooled.metrics.snapshot(), indent=2))
+            pooled.close()
+
+            def fresh_call():
+                # Lo que hacía el código antes: un cliente (y una conexión) nuevo por llamada
+                client = gateway.PooledHttpClient(base_url=base_url, pool_size=1)
+                try:
+                    return mercadopago.SDK(settings.MERCADO_PAGO_ACCESS_TOKEN, http_client=client).payment().get('1')
+                finally:
+                    client.close()
+
+            self._run("cliente nuevo por llamada", fresh_call, options)
+            if fake:
+                self.stdout.write(f"Conexiones abiertas en el gateway falso: {fake.connections}")
+        finally:
+            if fake:
+                fake.stop()
+
+    def _run(self, label, call, options):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(lambda _: call()['status'], range(options['requests'])))
+        elapsed = time.perf_counter() - start
+        ok = sum(1 for status in results if status == 200)
+        self.stdout.write(
+            f"{label}: {options['requests']} consultas en {elapsed:.2f}s "
+            f"({options['requests'] / elapsed:.0f} req/s, {ok} OK)"
+        )
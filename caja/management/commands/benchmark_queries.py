@@ -0,0 +1,138 @@
+import json
+import os
+import platform
+import sqlite3
+import tempfile
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from caja.benchmarks import BENCHMARKS, run_benchmarks
+from caja.models import Order, OrderItem, Payment, Product
+from caja.scale_data import generate_dataset, use_database_file
+
+
+def _counts():
+    return {
+        'orders': Order.objects.count(),
+        'items': OrderItem.objects.count(),
+        'payments': Payment.objects.count(),
+        'products': Product.objects.count(),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el listado de pedidos, el tablero de cocina, el menú y los changelists del admin a "
+        "distintas escalas de datos sintéticos y emite el resultado en JSON."
+    )
+    # La base se cambia antes de abrir cualquier conexión
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Benchmarks a correr (por defecto todos).")
+        parser.add_argument(
+            '--scales', default='1000,10000',
+            help="Cantidades de pedidos separadas por coma; cada escala se genera en un SQLite temporal.",
+        )
+        parser.add_argument(
+            '--database-file', help="Medir un archivo ya generado con generate_scale_data en vez de generar.",
+        )
+        parser.add_argument('--items-per-order', type=int, default=10)
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--categories', type=int, default=12)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--repeat', type=int, default=5, help="Corridas medidas por benchmark.")
+        parser.add_argument('--warmup', type=int, default=1, help="Corridas previas sin medir.")
+        parser.add_argument('--output', help="Archivo donde guardar el JSON (por defecto stdout).")
+        parser.add_argument('--baseline', help="JSON de una corrida anterior para comparar el p50.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['names']) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(f"Benchmarks desconocidos: {', '.join(sorted(unknown))}")
+        if options['repeat'] < 1:
+            raise CommandError("--repeat tiene que ser mayor que cero.")
+        try:
+            scales = [int(value) for value in options['scales'].split(',') if value.strip()]
+        except ValueError:
+            raise CommandError("--scales espera números separados por coma, p. ej. 1000,10000,100000.")
+
+        if options['database_file']:
+            if not os.path.exists(options['database_file']):
+                raise CommandError(f"No existe {options['database_file']}.")
+            use_database_file(options['database_file'])
+            runs = [self._measure(os.path.basename(options['database_file']), _counts(), None, options)]
+        else:
+            runs = [self._generate_and_measure(orders, options) for orders in scales]
+
+        report = {
+            'generated_at': timezone.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+            },
+            'repeat': options['repeat'],
+            'warmup': options['warmup'],
+            'scales': runs,
+        }
+        if options['baseline']:
+            self._compare(report, options['baseline'])
+
+        failed = [
+            f"{run['label']}:{name}" for run in runs for name, result in run['benchmarks'].items()
+            if result['status'] != 200
+        ]
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+            self.stderr.write(f"Resultados en {options['output']}")
+        else:
+            self.stdout.write(output)
+        if failed:
+            raise CommandError(f"Respuestas distintas de 200: {', '.join(failed)}")
+
+    def _generate_and_measure(self, orders, options):
+        with tempfile.TemporaryDirectory() as tmp:
+            use_database_file(os.path.join(tmp, f'escala-{orders}.sqlite3'))
+            self.stderr.write(f"Generando {orders} pedidos...")
+            start = time.perf_counter()
+            generate_dataset(
+                orders, items_per_order=options['items_per_order'], products=options['products'],
+                categories=options['categories'], days=options['days'], seed=options['seed'],
+            )
+            generate_s = round(time.perf_counter() - start, 2)
+            run = self._measure(str(orders), _counts(), generate_s, options)
+            # Cerrar antes de que se borre el directorio temporal
+            connections.close_all()
+            return run
+
+    def _measure(self, label, counts, generate_s, options):
+        self.stderr.write(f"Midiendo escala {label} ({counts['orders']} pedidos, {counts['items']} items)...")
+        return {
+            'label': label,
+            **counts,
+            'generate_s': generate_s,
+            'benchmarks': run_benchmarks(options['names'], repeat=options['repeat'], warmup=options['warmup']),
+        }
+
+    def _compare(self, report, path):
+        with open(path, encoding='utf-8') as file:
+            baseline = {
+                (run['label'], name): result
+                for run in json.load(file)['scales'] for name, result in run['benchmarks'].items()
+            }
+        for run in report['scales']:
+            for name, result in run['benchmarks'].items():
+                before = baseline.get((run['label'], name))
+                if before is None:
+                    continue
+                result['baseline_p50_ms'] = before['total_ms']['p50']
+                if before['total_ms']['p50']:
+                    result['p50_ratio'] = round(result['total_ms']['p50'] / before['total_ms']['p50'], 3)
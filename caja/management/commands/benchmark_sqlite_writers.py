@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.database import BUSY_TIMEOUT_SECONDS, pragma_statements
+
+SCHEMA = """
+CREATE TABLE product (id INTEGER PRIMARY KEY, stock INTEGER NOT NULL);
+CREATE TABLE orders (id INTEGER PRIMARY KEY, product_id INTEGER, quantity INTEGER, created REAL);
+"""
+
+# Configuración anterior (valores por defecto de Django) contra la de main/database.py
+MODES = {
+    'antes': {'pragmas': [], 'timeout': 5, 'begin': 'BEGIN'},
+    'despues': {'pragmas': pragma_statements(), 'timeout': BUSY_TIMEOUT_SECONDS, 'begin': 'BEGIN IMMEDIATE'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress de escritores concurrentes sobre un SQLite temporal: compara la configuración "
+        "por defecto contra WAL + BEGIN IMMEDIATE (main/database.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help="Hilos que crean pedidos.")
+        parser.add_argument('--readers', type=int, default=4, help="Hilos que leen el listado.")
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duración de cada corrida.")
+        parser.add_argument('--products', type=int, default=20)
+
+    def handle(self, *args, **options):
+        for mode, config in MODES.items():
+            result = self._run(config, options)
+            self.stdout.write(
+                f"{mode}: {result['commits'] / result['elapsed']:.0f} pedidos/s, "
+                f"{result['reads'] / result['elapsed']:.0f} lecturas/s, "
+                f"{result['locked']} 'database is locked'"
+            )
+
+    def _connect(self, path, config):
+        conn = sqlite3.connect(path, timeout=config['timeout'], isolation_level=None, check_same_thread=False)
+        for statement in config['pragmas']:
+            conn.execute(statement)
+        return conn
+
+    def _run(self, config, options):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.sqlite3')
+            setup = self._connect(path, config)
+            setup.executescript(SCHEMA)
+            setup.executemany(
+                "INSERT INTO product (id, stock) VALUES (?, ?)",
+                [(i, 10 ** 9) for i in range(1, options['products'] + 1)],
+            )
+            setup.close()
+
+            counters = {'commits': 0, 'reads': 0, 'locked': 0}
+            lock = threading.Lock()
+            deadline = time.perf_counter() + options['seconds']
+
+            def count(key):
+                with lock:
+                    counters[key] += 1
+
+            def writer(n):
+                conn = self._connect(path, config)
+                product_id = n % options['products'] + 1
+                while time.perf_counter() < deadline:
+                    # Misma forma que crear un pedido: leer stock, descontarlo e insertar la orden
+                    try:
+                        conn.execute(config['begin'])
+                        stock = conn.execute("SELECT stock FROM product WHERE id = ?", (product_id,)).fetchone()[0]
+                        conn.execute("UPDATE product SET stock = ? WHERE id = ?", (stock - 1, product_id))
+                        conn.execute(
+                            "INSERT INTO orders (product_id, quantity, created) VALUES (?, 1, ?)",
+                            (product_id, time.time()),
+                        )
+                        conn.execute("COMMIT")
+                        count('commits')
+                    except sqlite3.OperationalError as e:
+                        if conn.in_transaction:
+                            conn.execute("ROLLBACK")
+                        if 'locked' not in str(e):
+                            raise
+                        count('locked')
+                conn.close()
+
+            def reader():
+                conn = self._connect(path, config)
+                while time.perf_counter() < deadline:
+                    try:
+                        conn.execute("SELECT id, product_id FROM orders ORDER BY id DESC LIMIT 50").fetchall()
+                        count('reads')
+                    except sqlite3.OperationalError as e:
+                        if 'locked' not in str(e):
+                            raise
+                        count('locked')
+                conn.close()
+
+            threads = [threading.Thread(target=writer, args=(n,)) for n in range(options['writers'])]
+            threads += [threading.Thread(target=reader) for _ in range(options['readers'])]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            counters['elapsed'] = time.perf_counter() - start
+            return counters
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from caja.query_plans import HOT_QUERIES, check_plans
+
+
+class Command(BaseCommand):
+    help = "Corre EXPLAIN sobre las consultas calientes y falla si alguna hace un recorrido completo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Consultas a revisar (por defecto todas).")
+        parser.add_argument('--show-plans', action='store_true', help="Imprimir el plan de cada consulta.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['names']) - set(HOT_QUERIES)
+        if unknown:
+            raise CommandError(f"Consultas desconocidas: {', '.join(sorted(unknown))}")
+
+        failed = []
+        for name, plan, problems in check_plans(options['names']):
+            if problems:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: {'; '.join(problems)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: OK"))
+            if options['show_plans'] or problems:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+
+        if failed:
+            raise CommandError(f"{len(failed)} consulta(s) sin índice adecuado: {', '.join(failed)}")
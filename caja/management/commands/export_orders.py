@@ -0,0 +1,52 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from caja.exports import CHUNK_SIZE, FORMATS, export_chunks, iter_all_orders
+from caja.lookups import states
+from caja.models import State
+
+
+class Command(BaseCommand):
+    help = "Exporta pedidos (también los archivados) con items y pagos en CSV o NDJSON, en streaming (memoria constante)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--since', help="Desde este día inclusive (YYYY-MM-DD).")
+        parser.add_argument('--until', help="Hasta este día inclusive (YYYY-MM-DD).")
+        parser.add_argument('--state', type=int, help="Id de estado del pedido.")
+        parser.add_argument('--gzip', action='store_true', help="Comprime la salida en gzip.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Pedidos por lote de consultas.")
+        parser.add_argument('--output', '-o', default='-', help="Archivo de salida (- para stdout).")
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for name in ('since', 'until'):
+            if options[name]:
+                try:
+                    bounds[name] = parse_date(options[name])
+                except ValueError:  # bien formada pero inexistente, p. ej. 2026-02-30
+                    bounds[name] = None
+                if bounds[name] is None:
+                    raise CommandError("Formato de fecha inválido, usar YYYY-MM-DD.")
+        state_id = None
+        if options['state'] is not None:
+            try:
+                state_id = states.get_by_id(options['state']).id
+            except State.DoesNotExist as e:
+                raise CommandError(str(e))
+
+        orders = iter_all_orders(state_id=state_id, chunk_size=options['chunk_size'], **bounds)
+        chunks = export_chunks(orders, options['format'], compress=options['gzip'])
+        if options['output'] == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+        written = 0
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        self.stderr.write(f"{written} bytes escritos en {options['output']}.")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from caja.images import generate_product_variants
+from caja.models import Product
+
+
+class Command(BaseCommand):
+    help = "Genera las variantes WebP/JPEG de las imágenes de productos que todavía no las tienen."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', help="Id de producto (se puede repetir).")
+        parser.add_argument('--force', action='store_true', help="Regenerar aunque la imagen no haya cambiado.")
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).order_by('id')
+        if options['product']:
+            products = products.filter(pk__in=options['product'])
+        updated = 0
+        for product_id in products.values_list('id', flat=True):
+            if generate_product_variants(product_id, force=options['force']):
+                updated += 1
+        self.stdout.write(f"Variantes generadas para {updated} producto(s)")
@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from caja.scale_data import BATCH_SIZE, generate_dataset, use_database_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera pedidos, items, pagos y productos sintéticos con bulk_create para probar las "
+        "consultas con volumen real (p. ej. 100k pedidos y ~1M items)."
+    )
+    # Con --database-file la base se cambia antes de abrir cualquier conexión
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database-file',
+            help="Archivo SQLite donde generar (se crea y migra si no existe). Sin esto usa la base configurada.",
+        )
+        parser.add_argument('--orders', type=int, default=100_000)
+        parser.add_argument('--items-per-order', type=int, default=10, help="Promedio de items por pedido.")
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--categories', type=int, default=12)
+        parser.add_argument('--days', type=int, default=365, help="Días hacia atrás en los que se reparten los pedidos.")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Pedidos por transacción.")
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        for name in ('orders', 'items_per_order', 'products', 'categories', 'days', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} tiene que ser mayor que cero.")
+
+        if options['database_file']:
+            use_database_file(options['database_file'])
+        self.stderr.write(f"Generando en {settings.DATABASES['default']['NAME']}")
+
+        start = time.perf_counter()
+        created = generate_dataset(
+            options['orders'],
+            items_per_order=options['items_per_order'], products=options['products'],
+            categories=options['categories'], days=options['days'], seed=options['seed'],
+            batch_size=options['batch_size'],
+            progress=lambda counts: self.stderr.write(
+                f"  {counts['orders']}/{options['orders']} pedidos, {counts['items']} items", ending='\r',
+            ),
+        )
+        self.stderr.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"{created['orders']} pedidos, {created['items']} items, {created['payments']} pagos y "
+            f"{created['products']} productos en {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from caja.media_store import index_directory
+
+
+class Command(BaseCommand):
+    help = "Registra en el índice de media (MediaBlob) las imágenes de productos que ya están en disco."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default='products', help="Carpeta dentro de MEDIA_ROOT.")
+        parser.add_argument('--dedupe', action='store_true',
+                            help="Apuntar los productos que usan una copia idéntica al archivo indexado.")
+
+    def handle(self, *args, **options):
+        indexed, duplicates = index_directory(options['directory'], dedupe=options['dedupe'])
+        self.stdout.write(f"Archivos indexados: {indexed}")
+        for copy, original in duplicates:
+            self.stdout.write(f"  {copy} tiene el mismo contenido que {original}")
+        if duplicates and not options['dedupe']:
+            self.stdout.write("Usar --dedupe para que los productos usen el archivo indexado.")
@@ -0,0 +1,110 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from caja.loadtest import LOAD_PASSWORD, LoadTest
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga del recorrido de las mesas (index, menú, detalle, pedido y pago) con "
+        "cocina y caja consultando en paralelo. Sin --base-url levanta `run_load_server`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', help="Servidor ya levantado (p. ej. http://localhost:8000).")
+        parser.add_argument('--diners', type=int, default=20, help="Mesas simultáneas.")
+        parser.add_argument('--kitchens', type=int, default=1, help="Tableros de cocina consultando.")
+        parser.add_argument('--cashiers', type=int, default=1, help="Dashboards de caja consultando.")
+        parser.add_argument('--duration', type=float, default=30, help="Segundos de carga.")
+        parser.add_argument('--iterations', type=int, help="Pedidos por mesa (corta antes si se cumple).")
+        parser.add_argument('--think-ms', type=float, default=500, help="Pausa media entre pedidos de una mesa.")
+        parser.add_argument('--poll-ms', type=float, default=2000, help="Intervalo de refresco de cocina y caja.")
+        parser.add_argument('--kitchen-user')
+        parser.add_argument('--cashier-user')
+        parser.add_argument('--password', default=LOAD_PASSWORD)
+        parser.add_argument('--gateway-latency-ms', type=float, default=100, help="Solo con el servidor propio.")
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--json', action='store_true', help="Reporte completo en JSON.")
+
+    def handle(self, *args, **options):
+        if options['duration'] < 0:
+            raise CommandError("--duration no puede ser negativo.")
+        if not options['duration'] and not (options['diners'] and options['iterations']):
+            # Sin duración la corrida termina cuando terminan las mesas: cocina y caja no cortarían nunca
+            raise CommandError("--duration 0 necesita mesas (--diners) con un límite de --iterations.")
+        server = None
+        base_url = options['base_url']
+        if not base_url:
+            port = _free_port()
+            base_url = f'http://127.0.0.1:{port}'
+            server = subprocess.Popen(
+                [
+                    sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'run_load_server',
+                    '--port', str(port), '--gateway-latency-ms', str(options['gateway_latency_ms']),
+                ],
+                # El log de requests del servidor tapa el reporte; con -v 2 se ve
+                stdout=None if options['verbosity'] >= 2 else subprocess.DEVNULL,
+                stderr=None if options['verbosity'] >= 2 else subprocess.DEVNULL,
+            )
+        try:
+            self._wait_ready(base_url, server)
+            report = LoadTest(
+                base_url,
+                diners=options['diners'], kitchens=options['kitchens'], cashiers=options['cashiers'],
+                duration=options['duration'], iterations=options['iterations'],
+                think=options['think_ms'] / 1000, poll_interval=options['poll_ms'] / 1000,
+                kitchen_user=options['kitchen_user'], cashier_user=options['cashier_user'],
+                password=options['password'], seed=options['seed'],
+            ).run()
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self._print(report)
+
+    def _wait_ready(self, base_url, server, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server is not None and server.poll() is not None:
+                raise CommandError("El servidor de carga terminó antes de arrancar.")
+            try:
+                requests.get(base_url + '/caja/login/', timeout=2)
+                return
+            except requests.RequestException:
+                time.sleep(0.25)
+        raise CommandError(f"{base_url} no respondió en {timeout}s.")
+
+    def _print(self, report):
+        self.stdout.write(
+            f"{report['requests']} requests en {report['elapsed_s']}s ({report['rps']} req/s); "
+            f"pedidos completos: {report['journeys']['completed']} "
+            f"({report['journeys_per_min']}/min), fallidos: {report['journeys']['failed']}"
+        )
+        header = f"{'paso':<26}{'req':>7}{'req/s':>9}{'error':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        self.stdout.write(header)
+        for step, data in report['steps'].items():
+            self.stdout.write(
+                f"{step:<26}{data['count']:>7}{data['rps']:>9}{data['error_rate']:>8.1%}"
+                f"{data.get('p50_ms', 0):>10}{data.get('p95_ms', 0):>10}{data.get('p99_ms', 0):>10}{data.get('max_ms', 0):>10}"
+            )
+            failures = {k: v for k, v in data['outcomes'].items() if k != 'ok'}
+            if failures:
+                self.stdout.write(f"    errores: {failures}")
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from caja.webhooks import drain
+
+
+class Command(BaseCommand):
+    help = "Procesa la cola de notificaciones de Mercado Pago en lotes, con reintentos y backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help="Notificaciones por lote.")
+        parser.add_argument('--workers', type=int, default=4, help="Hilos que procesan cada lote.")
+        parser.add_argument('--loop', action='store_true', help="Seguir esperando notificaciones nuevas.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Segundos entre revisiones con --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            totals = drain(batch_size=options['batch_size'], workers=options['workers'])
+            if totals:
+                resumen = ", ".join(f"{result}: {count}" for result, count in sorted(totals.items()))
+                self.stdout.write(f"Notificaciones procesadas ({resumen})")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
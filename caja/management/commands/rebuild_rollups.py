@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from caja.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recalcula los resúmenes diarios de ventas (caja.rollups) desde pedidos, items y pagos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Desde este día inclusive (YYYY-MM-DD).")
+        parser.add_argument('--until', help="Hasta este día inclusive (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for name in ('since', 'until'):
+            if options[name]:
+                try:
+                    bounds[name] = parse_date(options[name])
+                except ValueError:  # bien formada pero inexistente, p. ej. 2026-02-30
+                    bounds[name] = None
+                if bounds[name] is None:
+                    self.stderr.write(self.style.ERROR("Formato de fecha inválido, usar YYYY-MM-DD."))
+                    return
+        written = rebuild_rollups(**bounds)
+        self.stdout.write(self.style.SUCCESS(f"{written} filas de resumen escritas."))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from caja.models import Order
+from caja.totals import find_drifted_orders, reconcile_totals
+
+
+class Command(BaseCommand):
+    help = "Compara Order.amount con la suma de sus items y corrige las órdenes desfasadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Solo órdenes desde esta fecha (YYYY-MM-DD).")
+        parser.add_argument('--order', type=int, action='append', dest='orders', help="Id de orden a revisar (repetible).")
+        parser.add_argument('--dry-run', action='store_true', help="Solo informa, no corrige.")
+
+    def handle(self, *args, **options):
+        queryset = Order.objects.all()
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                self.stderr.write(self.style.ERROR("Formato de fecha inválido, usar YYYY-MM-DD."))
+                return
+            queryset = queryset.filter(order_date__gte=since)
+        if options['orders']:
+            queryset = queryset.filter(pk__in=options['orders'])
+
+        if options['dry_run']:
+            drifted = list(find_drifted_orders(queryset))
+            for order_id, amount, items_total in drifted:
+                self.stdout.write(f"Orden {order_id}: guardado {amount}, items {items_total}")
+            self.stdout.write(self.style.WARNING(f"{len(drifted)} órdenes desfasadas."))
+            return
+
+        fixed = reconcile_totals(queryset)
+        self.stdout.write(self.style.SUCCESS(f"{fixed} órdenes corregidas."))
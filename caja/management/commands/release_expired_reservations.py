@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from caja.stock import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = "Devuelve al stock las reservas de pedidos impagos vencidos y cancela esas órdenes."
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations()
+        self.stdout.write(self.style.SUCCESS(f"{released} reservas liberadas."))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from caja.fake_gateway import FakeGateway
+
+
+class Command(BaseCommand):
+    help = "Levanta un servidor falso de Mercado Pago para pruebas y benchmarks locales."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency-ms', type=float, default=0, help="Demora agregada a cada respuesta.")
+        parser.add_argument('--error-rate', type=float, default=0, help="Proporción de respuestas 503 (0 a 1).")
+
+    def handle(self, *args, **options):
+        gateway = FakeGateway(
+            host=options['host'], port=options['port'],
+            latency=options['latency_ms'] / 1000, error_rate=options['error_rate'],
+        )
+        self.stdout.write(f"Gateway falso escuchando en {gateway.base_url} (Ctrl+C para salir)")
+        self.stdout.write(f"Configurar MERCADO_PAGO_API_BASE_URL = '{gateway.base_url}'")
+        gateway.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            gateway.stop()
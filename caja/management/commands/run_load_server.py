@@ -0,0 +1,67 @@
+import os
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import get_internal_wsgi_application, run
+from django.db import connections
+
+from caja import gateway
+from caja.fake_gateway import FakeGateway
+from caja.loadtest import LOAD_PASSWORD, ensure_load_users
+from caja.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Levanta la aplicación sobre una copia descartable de la base y con el gateway falso de "
+        "Mercado Pago, para correr `load_test` sin tocar datos reales ni salir a internet."
+    )
+    # La base se cambia antes de abrir cualquier conexión
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8000)
+        parser.add_argument('--gateway-latency-ms', type=float, default=100, help="Latencia del gateway falso.")
+        parser.add_argument('--gateway-error-rate', type=float, default=0, help="Proporción de 503 del gateway.")
+        parser.add_argument('--stock', type=int, default=1_000_000, help="Stock de cada producto en la copia.")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            self._use_scratch_database(os.path.join(tmp, 'carga.sqlite3'))
+            call_command('migrate', verbosity=0)
+            Product.objects.update(stock=options['stock'])
+            ensure_load_users()
+
+            fake = FakeGateway(
+                latency=options['gateway_latency_ms'] / 1000, error_rate=options['gateway_error_rate'],
+            ).start()
+            settings.MERCADO_PAGO_API_BASE_URL = fake.base_url
+            gateway.reset()
+            settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, options['host']]
+
+            self.stdout.write(
+                f"Servidor de carga en http://{options['host']}:{options['port']} "
+                f"(gateway falso en {fake.base_url}, usuarios carga-cocina / carga-caja, clave {LOAD_PASSWORD!r})"
+            )
+            self.stdout.flush()
+            try:
+                run(options['host'], options['port'], get_internal_wsgi_application(), threading=True)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                fake.stop()
+                connections.close_all()
+
+    def _use_scratch_database(self, path):
+        database = settings.DATABASES['default']
+        source = str(database['NAME'])
+        connections.close_all()
+        if os.path.exists(source):
+            # Copia consistente aunque la base esté en WAL
+            with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+                src.backup(dst)
+        database['NAME'] = path
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from caja.outbox import drain
+
+
+class Command(BaseCommand):
+    help = "Envía los mails pendientes de la bandeja de salida, reutilizando conexiones SMTP, con reintentos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help="Mails por lote.")
+        parser.add_argument('--workers', type=int, default=2, help="Conexiones SMTP simultáneas por lote.")
+        parser.add_argument('--loop', action='store_true', help="Seguir esperando mails nuevos.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Segundos entre revisiones con --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            totals = drain(batch_size=options['batch_size'], workers=options['workers'])
+            if any(totals.values()):
+                self.stdout.write(f"Mails enviados: {totals['sent']}, a reintentar: {totals['retry']}")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,98 @@
+"""
+Almacén de media direccionado por contenido.
+
+Cada archivo subido se hashea por chunks (sin cargarlo entero en memoria) y se
+busca en el índice MediaBlob: si ese contenido ya existe se reutiliza el
+archivo guardado, aunque venga con otro nombre; si no, se guarda como
+<carpeta>/<sha256><ext> y se registra en el índice. El selector de "imagen
+existente" del admin lee el índice en vez de listar la carpeta.
+
+Los archivos que ya estaban en media/products/ con su nombre original se
+registran con `manage.py index_media`.
+"""
+import hashlib
+import os
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+
+from .models import MediaBlob, Product
+
+CHUNK_SIZE = 64 * 1024
+
+
+def hash_file(file):
+    """sha256 y tamaño del archivo leyéndolo por chunks; deja el archivo al principio."""
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    chunks = file.chunks(CHUNK_SIZE) if hasattr(file, 'chunks') else iter(lambda: file.read(CHUNK_SIZE), b'')
+    for chunk in chunks:
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+
+def register(name, digest, size, original_name=''):
+    """Registra un archivo ya guardado; si el contenido estaba indexado devuelve el blob existente."""
+    try:
+        with transaction.atomic():
+            return MediaBlob.objects.create(digest=digest, name=name, size=size, original_name=original_name), True
+    except IntegrityError:
+        return MediaBlob.objects.get(digest=digest), False
+
+
+def store_upload(file, upload_to):
+    """Guarda `file` una sola vez por contenido y devuelve el nombre en el storage."""
+    digest, size = hash_file(file)
+    existing = MediaBlob.objects.filter(digest=digest).values_list('name', flat=True).first()
+    if existing and default_storage.exists(existing):
+        return existing
+
+    original_name = os.path.basename(getattr(file, 'name', '') or '')
+    extension = os.path.splitext(original_name)[1].lower()
+    name = f'{upload_to}/{digest}{extension}'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, file)
+    if existing:
+        # El índice apuntaba a un archivo que se borró a mano: se actualiza con el nuevo
+        MediaBlob.objects.filter(digest=digest).update(name=name, size=size)
+        return name
+    blob, _ = register(name, digest, size, original_name)
+    return blob.name
+
+
+def index_directory(directory, dedupe=False):
+    """
+    Registra en el índice los archivos de `directory` que no estén indexados.
+    Con `dedupe`, los productos que usan una copia idéntica pasan a usar el archivo indexado.
+    Devuelve (indexados, duplicados) donde duplicados es [(copia, archivo_indexado)].
+    """
+    known = set(MediaBlob.objects.values_list('name', flat=True))
+    indexed = 0
+    duplicates = []
+    _, files = default_storage.listdir(directory)
+    for filename in sorted(files):
+        name = f'{directory}/{filename}'
+        if name in known:
+            continue
+        with default_storage.open(name, 'rb') as file:
+            digest, size = hash_file(file)
+        blob, created = register(name, digest, size, original_name=filename)
+        if created:
+            indexed += 1
+            known.add(name)
+            continue
+        duplicates.append((name, blob.name))
+        if dedupe:
+            Product.objects.filter(image=name).update(image=blob.name)
+    return indexed, duplicates
+
+
+def picker_choices():
+    """Opciones del selector de imagen existente: una consulta al índice."""
+    return [
+        (name, original_name or os.path.basename(name))
+        for name, original_name in MediaBlob.objects.order_by('original_name', 'name').values_list('name', 'original_name')
+    ]
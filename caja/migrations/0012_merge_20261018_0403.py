@@ -0,0 +1,14 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:03
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caja', '0010_load_new_state'),
+        ('caja', '0011_remove_order_payment_status_and_more'),
+    ]
+
+    operations = [
+    ]
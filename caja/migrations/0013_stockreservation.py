@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caja', '0012_merge_20261018_0403'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('reserved', 'Reservado'), ('committed', 'Confirmado'), ('released', 'Liberado')], default='reserved', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservation', to='caja.order')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'reserved')), fields=['expires_at'], name='reservation_active_idx')],
+            },
+        ),
+    ]
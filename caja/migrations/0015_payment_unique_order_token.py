@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:11
+
+from django.db import migrations, models
+
+
+def remove_duplicate_payments(apps, schema_editor):
+    # Se conserva el registro más reciente de cada (orden, token) antes de crear el índice único
+    Payment = apps.get_model('caja', 'Payment')
+    seen = set()
+    duplicates = []
+    for payment_id, order_id, token in Payment.objects.order_by('-id').values_list('id', 'idOrder_id', 'token'):
+        key = (order_id, token)
+        if key in seen:
+            duplicates.append(payment_id)
+        else:
+            seen.add(key)
+    Payment.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caja', '0014_webhooknotification'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_payments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(fields=('idOrder', 'token'), name='unique_payment_per_order_token'),
+        ),
+    ]
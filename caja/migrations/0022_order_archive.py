@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caja', '0021_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('IP', models.GenericIPAddressField(blank=True, null=True)),
+                ('initialTime', models.DateTimeField()),
+                ('endTime', models.DateTimeField()),
+                ('order_date', models.DateField()),
+                ('customer_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('tableNumber', models.DecimalField(decimal_places=0, max_digits=5)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('status', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='caja.state')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('product_name', models.CharField(max_length=100)),
+                ('sugerency', models.TextField(blank=True, max_length=220, null=True)),
+                ('quantity', models.PositiveIntegerField()),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='caja.archivedorder')),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='caja.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedPayment',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('payment_date', models.DateTimeField()),
+                ('motive', models.TextField(blank=True, max_length=220, null=True)),
+                ('token', models.CharField(max_length=255)),
+                ('idOrder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='caja.archivedorder')),
+                ('idPaymentMethod', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='caja.paymentmethod')),
+                ('idPaymentStatus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='caja.paymentstatus')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['order_date', 'id'], name='archived_order_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['status', 'order_date', 'id'], name='archived_order_status_idx'),
+        ),
+    ]
@@ -1,8 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils import timezone
-import os
-from django.conf import settings
 
 
 class CustomUser(AbstractUser):
@@ -42,16 +40,17 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField(default=0)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Versiones redimensionadas de `image` (ver caja.images); las genera un worker después de guardar
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     idCategoria = models.ForeignKey('Category', on_delete=models.CASCADE, related_name='products', blank=True, null=True)
     idPromotion = models.ForeignKey('Promotion', on_delete=models.CASCADE, related_name='products', blank=True, null=True)
     active = models.BooleanField(default=True)  # To mark if the product is active or not
 
     def save(self, *args, **kwargs):
-        if self.image:
-            image_path = os.path.join(settings.MEDIA_ROOT, os.path.basename(self.image.name))
-            if os.path.exists(image_path):
-                # Si la imagen ya existe, usa la existente
-                self.image.name = f'{os.path.basename(self.image.name)}'
+        if self.image and not self.image._committed:
+            # Imagen recién subida: se guarda una sola vez por contenido (ver caja.media_store)
+            from .media_store import store_upload
+            self.image = store_upload(self.image.file, upload_to='products')
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -121,6 +120,19 @@ class Order(models.Model):
     customer_name = models.CharField(max_length=100, blank=True, null=True)
     tableNumber = models.DecimalField(max_digits=5, decimal_places=0, blank=False, null=False)
 
+    class Meta:
+        # Índices de las consultas calientes; `manage.py check_query_plans` verifica que se usen
+        indexes = [
+            # Listado de caja paginado por (order_date, id), con o sin filtro de fecha
+            models.Index(fields=['order_date', 'id'], name='order_date_id_idx'),
+            # Listado filtrado por estado (y fecha) y list_filter del admin
+            models.Index(fields=['status', 'order_date', 'id'], name='order_status_date_idx'),
+            # Cola de cocina: un estado ordenado por mesa y hora de ingreso, sin sort en memoria
+            models.Index(fields=['status', 'tableNumber', 'initialTime'], name='order_status_table_idx'),
+            # Cambios desde un instante (delta del tablero de cocina)
+            models.Index(fields=['endTime'], name='order_end_time_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} - {self.status.name} - {self.order_date}"
 
@@ -128,8 +140,8 @@ class Order(models.Model):
         super().save(*args, **kwargs)
     
     def update_amount(self):
-        total = sum(item.subtotal for item in self.order_items.all())
-        self.amount = total
+        total = self.order_items.aggregate(total=models.Sum('subtotal'))['total']
+        self.amount = total or 0
         self.save(update_fields=['amount'])
 
 
@@ -159,8 +171,228 @@ class Payment(models.Model):
     motive = models.TextField(max_length=220, blank=True, null=True)  # Optional field for payment motive
     token = models.CharField(max_length=255, blank=False, null=False)  # Optional field for payment token
 
+    class Meta:
+        constraints = [
+            # Un pago de la pasarela se registra una sola vez por orden
+            models.UniqueConstraint(fields=['idOrder', 'token'], name='unique_payment_per_order_token'),
+        ]
+
     def __str__(self):
         return f"Payment {self.id} for Order {self.idOrder.id} - {self.idPaymentMethod.name} - {self.amount}"
 
 
 
+
+class StockReservation(models.Model):
+    RESERVED = 'reserved'
+    COMMITTED = 'committed'
+    RELEASED = 'released'
+    STATUS_CHOICES = [
+        (RESERVED, 'Reservado'),
+        (COMMITTED, 'Confirmado'),
+        (RELEASED, 'Liberado'),
+    ]
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='stock_reservation')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=RESERVED)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()  # Las reservas sin pagar se liberan pasado este momento
+
+    class Meta:
+        # Solo las reservas vigentes pueden vencer; las liberadas/confirmadas no entran al índice
+        indexes = [
+            models.Index(fields=['expires_at'], condition=models.Q(status='reserved'), name='reservation_active_idx'),
+        ]
+
+    def __str__(self):
+        return f"Reserva de stock de Order {self.order_id} - {self.status}"
+
+class WebhookNotification(models.Model):
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pendiente'),
+        (PROCESSING, 'Procesando'),
+        (DONE, 'Procesada'),
+        (FAILED, 'Fallida'),
+    ]
+    topic = models.CharField(max_length=50)
+    resource_id = models.CharField(max_length=255)  # Id del recurso notificado (p. ej. el pago)
+    payload = models.JSONField(default=dict)  # Notificación cruda tal como llegó
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=64, blank=True, default='')
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        # Índices parciales: las notificaciones procesadas se acumulan pero no engordan la cola
+        indexes = [
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='pending'), name='webhook_pending_idx'),
+            models.Index(fields=['claimed_at'], condition=models.Q(status='processing'), name='webhook_processing_idx'),
+        ]
+
+    def __str__(self):
+        return f"Webhook {self.topic} {self.resource_id} - {self.status}"
+
+
+class OutboxEmail(models.Model):
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pendiente'),
+        (SENDING, 'Enviando'),
+        (SENT, 'Enviado'),
+        (FAILED, 'Fallido'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True, default='')
+    to = models.JSONField(default=list)
+    reply_to = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=64, blank=True, default='')
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='pending'), name='outbox_pending_idx'),
+            models.Index(fields=['claimed_at'], condition=models.Q(status='sending'), name='outbox_sending_idx'),
+        ]
+
+    def __str__(self):
+        return f"Mail '{self.subject}' a {', '.join(self.to)} - {self.status}"
+
+
+class MediaBlob(models.Model):
+    """Índice de archivos de media por hash de contenido: cada imagen se guarda una sola vez."""
+    digest = models.CharField(max_length=64, unique=True)  # sha256 del contenido
+    name = models.CharField(max_length=255, unique=True)  # ruta en el storage, p. ej. products/<sha256>.jpg
+    original_name = models.CharField(max_length=255, blank=True)
+    size = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.original_name or self.name
+
+
+# Resúmenes diarios para reportes (ver caja.rollups): se mantienen con deltas en
+# cada escritura de pedidos y pagos y se reconstruyen con `manage.py rebuild_rollups`.
+
+class DailyProductSales(models.Model):
+    """Unidades y facturación por día (order_date) y producto; no incluye pedidos cancelados."""
+    day = models.DateField()
+    # Sin constraint en la base: el historial de ventas sobrevive al borrado del producto
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_daily_product_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - producto {self.product_id}: {self.quantity} u. / {self.revenue}"
+
+
+class DailyStateSales(models.Model):
+    """Cantidad de pedidos y total por día (order_date) y estado actual del pedido."""
+    day = models.DateField()
+    state = models.ForeignKey(State, on_delete=models.CASCADE, related_name='+')
+    orders = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'state'], name='unique_daily_state_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - estado {self.state_id}: {self.orders} pedidos / {self.amount}"
+
+
+class DailyPaymentSales(models.Model):
+    """Cantidad y monto de pagos por día (payment_date), medio de pago y estado del pago."""
+    day = models.DateField()
+    payment_method = models.ForeignKey(PaymentMethod, on_delete=models.CASCADE, related_name='+')
+    payment_status = models.ForeignKey(PaymentStatus, on_delete=models.CASCADE, related_name='+')
+    payments = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'payment_method', 'payment_status'], name='unique_daily_payment_sales'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - medio {self.payment_method_id} / estado {self.payment_status_id}: {self.amount}"
+
+
+# Historial archivado (ver caja.archive): pedidos cerrados viejos con sus items y
+# pagos, movidos fuera de las tablas calientes. Conservan el id original y solo se leen.
+
+class ArchivedOrder(models.Model):
+    id = models.IntegerField(primary_key=True)  # Mismo id que tenía en Order
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.ForeignKey(State, on_delete=models.CASCADE, related_name='+')
+    IP = models.GenericIPAddressField(blank=True, null=True)
+    initialTime = models.DateTimeField()
+    endTime = models.DateTimeField()
+    order_date = models.DateField()
+    customer_name = models.CharField(max_length=100, blank=True, null=True)
+    tableNumber = models.DecimalField(max_digits=5, decimal_places=0)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Exportación por rango de fechas y changelist del admin
+            models.Index(fields=['order_date', 'id'], name='archived_order_date_id_idx'),
+            models.Index(fields=['status', 'order_date', 'id'], name='archived_order_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Pedido archivado {self.id} - {self.order_date}"
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.IntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='order_items')
+    # Sin constraint y con el nombre copiado: el historial sobrevive al borrado del producto
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    product_name = models.CharField(max_length=100)
+    sugerency = models.TextField(max_length=220, blank=True, null=True)
+    quantity = models.PositiveIntegerField()
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name}"
+
+
+class ArchivedPayment(models.Model):
+    id = models.IntegerField(primary_key=True)
+    idOrder = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='payments')
+    idPaymentMethod = models.ForeignKey(PaymentMethod, on_delete=models.CASCADE, related_name='+')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    idPaymentStatus = models.ForeignKey(PaymentStatus, on_delete=models.CASCADE, related_name='+')
+    payment_date = models.DateTimeField()
+    motive = models.TextField(max_length=220, blank=True, null=True)
+    token = models.CharField(max_length=255)
+
+    def __str__(self):
+        return f"Pago archivado {self.id} del pedido {self.idOrder_id} - {self.amount}"
@@ -0,0 +1,179 @@
+"""
+Bandeja de salida de mails.
+
+Las vistas no mandan mails: los guardan en OutboxEmail con `enqueue_email` y
+responden enseguida. Un worker los toma en lotes y los envía reutilizando una
+sola conexión SMTP por grupo (get_connection() + send_messages), con un pool
+acotado de hilos y reintentos con backoff exponencial para los que fallan.
+
+El worker corre con `manage.py send_outbox` (con --loop como servicio) y,
+además, cada alta despierta un drenado en segundo plano dentro del proceso
+(EMAIL_OUTBOX_SEND_ON_ENQUEUE); como es un único hilo, una ráfaga de
+formularios no abre más hilos ni conexiones.
+"""
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 6)
+BACKOFF_BASE_SECONDS = getattr(settings, 'EMAIL_OUTBOX_BACKOFF_SECONDS', 30)
+BACKOFF_MAX_SECONDS = 60 * 60
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+_kick_lock = threading.Lock()
+_kick_executor = None
+_kick_pending = False
+
+
+def enqueue_email(subject, body, to, from_email=None, reply_to=None):
+    email = OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        reply_to=list(reply_to or []),
+    )
+    if getattr(settings, 'EMAIL_OUTBOX_SEND_ON_ENQUEUE', True):
+        transaction.on_commit(kick)
+    return email
+
+
+def backoff_delay(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def due_emails(now):
+    due = (
+        OutboxEmail.objects.filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+        | OutboxEmail.objects.filter(status=OutboxEmail.SENDING, claimed_at__lt=now - CLAIM_TIMEOUT)
+    )
+    return due.order_by('next_attempt_at', 'id')
+
+
+def claim_batch(batch_size, now=None):
+    """Toma hasta `batch_size` mails vencidos para este worker sin pisarse con otros."""
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    ids = list(due_emails(now).values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    OutboxEmail.objects.filter(pk__in=ids, status=OutboxEmail.PENDING).update(
+        status=OutboxEmail.SENDING, claimed_by=token, claimed_at=now
+    )
+    OutboxEmail.objects.filter(
+        pk__in=ids, status=OutboxEmail.SENDING, claimed_at__lt=now - CLAIM_TIMEOUT
+    ).update(claimed_by=token, claimed_at=now)
+    return list(OutboxEmail.objects.filter(claimed_by=token, status=OutboxEmail.SENDING).order_by('id'))
+
+
+def _message(email, mail_connection):
+    return EmailMessage(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or None,
+        to=email.to,
+        reply_to=email.reply_to or None,
+        connection=mail_connection,
+    )
+
+
+def _mark_failed(email, error):
+    email.attempts += 1
+    email.last_error = error
+    email.claimed_by = ''
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = OutboxEmail.FAILED
+        logger.error("Mail %s descartado tras %d intentos: %s", email.pk, email.attempts, error)
+    else:
+        email.status = OutboxEmail.PENDING
+        email.next_attempt_at = timezone.now() + backoff_delay(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'claimed_by', 'status', 'next_attempt_at'])
+
+
+def send_group(emails, in_pool=False):
+    """Envía `emails` por una única conexión. Devuelve (enviados, reintentos)."""
+    sent = []
+    retry = 0
+    try:
+        with get_connection(fail_silently=False) as mail_connection:
+            for email in emails:
+                try:
+                    # De a uno por la misma conexión abierta: un rechazo no arrastra al resto del lote
+                    mail_connection.send_messages([_message(email, mail_connection)])
+                    sent.append(email.pk)
+                except Exception as e:
+                    logger.warning("Error enviando mail %s: %s", email.pk, e)
+                    _mark_failed(email, str(e))
+                    retry += 1
+    except Exception as e:
+        # No se pudo abrir (o cerrar) la conexión: todo lo no enviado vuelve a la cola
+        logger.warning("Error de conexión SMTP: %s", e)
+        for email in emails:
+            if email.pk not in sent and email.status == OutboxEmail.SENDING:
+                _mark_failed(email, str(e))
+                retry += 1
+    finally:
+        if sent:
+            OutboxEmail.objects.filter(pk__in=sent).update(
+                status=OutboxEmail.SENT, sent_at=timezone.now(), claimed_by='', last_error=''
+            )
+        if in_pool:
+            connection.close()
+    return len(sent), retry
+
+
+def send_batch(emails, workers=1):
+    """Reparte el lote en hasta `workers` grupos, cada uno con su conexión SMTP."""
+    if workers > 1 and len(emails) > 1:
+        groups = [emails[i::workers] for i in range(workers) if emails[i::workers]]
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            results = list(pool.map(lambda group: send_group(group, in_pool=True), groups))
+    else:
+        results = [send_group(emails)]
+    return {'sent': sum(r[0] for r in results), 'retry': sum(r[1] for r in results)}
+
+
+def drain(batch_size=50, workers=2):
+    """Envía lotes hasta vaciar lo vencido en la bandeja."""
+    totals = {'sent': 0, 'retry': 0}
+    while True:
+        batch = claim_batch(batch_size)
+        if not batch:
+            return totals
+        for key, count in send_batch(batch, workers=workers).items():
+            totals[key] += count
+
+
+def _drain_in_background():
+    global _kick_pending
+    with _kick_lock:
+        _kick_pending = False
+    try:
+        drain(workers=1)
+    except Exception:
+        logger.exception("Error drenando la bandeja de mails")
+    finally:
+        connection.close()
+
+
+def kick():
+    """Pide un drenado en el hilo de fondo; si ya hay uno esperando, no encola otro."""
+    global _kick_executor, _kick_pending
+    with _kick_lock:
+        if _kick_pending:
+            return
+        _kick_pending = True
+        if _kick_executor is None:
+            _kick_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-outbox')
+    _kick_executor.submit(_drain_in_background)
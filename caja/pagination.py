@@ -0,0 +1,75 @@
+"""
+Paginación por keyset (cursor) para listados que crecen con el historial.
+
+El cursor es opaco para el cliente: codifica la última clave vista
+(order_date, id) y la siguiente página arranca estrictamente después de ella,
+sin OFFSET, por lo que el costo no depende de cuán atrás se esté paginando.
+"""
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(order_date, pk):
+    raw = json.dumps({'d': order_date.isoformat(), 'id': pk}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        order_date = parse_date(data['d'])
+        pk = int(data['id'])
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise InvalidCursor("Cursor inválido.")
+    if order_date is None:
+        raise InvalidCursor("Cursor inválido.")
+    return order_date, pk
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    if value in (None, ''):
+        return default
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        raise InvalidCursor("El parámetro 'limit' debe ser un número.")
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_queryset(queryset, cursor=None):
+    """Ordena por (order_date, id) descendente y arranca después del cursor, si hay."""
+    queryset = queryset.order_by('-order_date', '-id')
+    if cursor:
+        order_date, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(order_date__lt=order_date) | Q(order_date=order_date, id__lt=pk))
+    return queryset
+
+
+def keyset_page(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Aplica orden descendente por (order_date, id) y el filtro del cursor.
+    Devuelve (filas, siguiente_cursor); el queryset debe traer 'id' y 'order_date'
+    (puede ser un values()).
+    """
+    rows = list(keyset_queryset(queryset, cursor)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last['order_date'], last['id'])
+        else:
+            next_cursor = encode_cursor(last.order_date, last.id)
+    return rows, next_cursor
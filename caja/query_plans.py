@@ -0,0 +1,151 @@
+"""
+Registro de las consultas calientes y verificación de sus planes de ejecución.
+
+Cada entrada arma el queryset tal como lo ejecuta la vista o el worker
+correspondiente. `manage.py check_query_plans` corre EXPLAIN sobre cada una y
+falla si alguna recorre la tabla completa o tiene que ordenar el resultado en
+memoria, que es lo que pasa cuando se pierde (o deja de aplicar) un índice.
+"""
+import re
+from datetime import timedelta
+
+from django.utils import timezone
+
+from cocina.views import kitchen_queue_rows
+
+from .archive import archivable_orders, archive_cutoff
+from .exports import export_queryset
+from .lookups import StateName, states
+from .models import Order
+from .outbox import due_emails
+from .pagination import DEFAULT_PAGE_SIZE, encode_cursor, keyset_queryset
+from .rollups import payment_rows, product_rows, state_rows
+from .stock import expired_reservations
+from .webhooks import due_notifications
+
+HOT_QUERIES = {}
+
+# "SCAN caja_order" sin "USING ... INDEX" es un recorrido completo de la tabla
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)(?! USING)(?:\s|$)')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR (?:ORDER BY|RIGHT PART OF ORDER BY)')
+
+
+def hot_query(name, allow_sort=False):
+    """Registra una consulta; `allow_sort` acepta un ordenamiento en memoria de un resultado acotado."""
+    def register(builder):
+        builder.allow_sort = allow_sort
+        HOT_QUERIES[name] = builder
+        return builder
+    return register
+
+
+def _orders_page(**filters):
+    # Igual que api_orders_list_create: values() + keyset por (order_date, id)
+    qs = Order.objects.values('id', 'order_date', 'customer_name', 'tableNumber', 'status_id', 'amount')
+    return keyset_queryset(qs.filter(**filters))[:DEFAULT_PAGE_SIZE + 1]
+
+
+@hot_query('caja.orders_list')
+def orders_list():
+    return _orders_page()
+
+
+@hot_query('caja.orders_list.next_page')
+def orders_list_next_page():
+    qs = Order.objects.values('id', 'order_date', 'status_id')
+    return keyset_queryset(qs, encode_cursor(timezone.localdate(), 1000))[:DEFAULT_PAGE_SIZE + 1]
+
+
+@hot_query('caja.orders_list.by_date')
+def orders_list_by_date():
+    return _orders_page(order_date=timezone.localdate())
+
+
+@hot_query('caja.orders_list.by_status')
+def orders_list_by_status():
+    return _orders_page(status_id=states.id_of(StateName.LISTO_PARA_ENTREGAR))
+
+
+@hot_query('caja.orders_list.by_status_and_date')
+def orders_list_by_status_and_date():
+    return _orders_page(status_id=states.id_of(StateName.PENDIENTE), order_date=timezone.localdate())
+
+
+@hot_query('cocina.dashboard')
+def kitchen_queue():
+    return kitchen_queue_rows(states.id_of(StateName.EN_PREPARACION))
+
+
+@hot_query('cocina.fragment_delta')
+def kitchen_delta():
+    return Order.objects.filter(endTime__gte=timezone.now()).values_list('tableNumber', flat=True).distinct()
+
+
+# El OR entre pendientes y tomadas vencidas usa los dos índices parciales y ordena solo lo vencido
+@hot_query('caja.webhooks.claim', allow_sort=True)
+def webhook_claim():
+    return due_notifications(timezone.now()).values_list('id', flat=True)[:50]
+
+
+@hot_query('caja.outbox.claim', allow_sort=True)
+def outbox_claim():
+    return due_emails(timezone.now()).values_list('id', flat=True)[:50]
+
+
+@hot_query('caja.export.orders')
+def export_orders():
+    return export_queryset(since=timezone.localdate() - timedelta(days=365), until=timezone.localdate())
+
+
+@hot_query('caja.export.orders.by_status')
+def export_orders_by_status():
+    return export_queryset(since=timezone.localdate() - timedelta(days=365), state_id=states.id_of(StateName.ENTREGADO))
+
+
+@hot_query('caja.export.archive')
+def export_archive():
+    return export_queryset(since=timezone.localdate() - timedelta(days=365), until=timezone.localdate(), archived=True)
+
+
+@hot_query('caja.archive.candidates')
+def archive_candidates():
+    return archivable_orders(archive_cutoff()).order_by().values_list('id', flat=True)[:500]
+
+
+@hot_query('caja.reports.products')
+def report_products():
+    return product_rows(timezone.localdate() - timedelta(days=6), timezone.localdate())
+
+
+@hot_query('caja.reports.states')
+def report_states():
+    return state_rows(timezone.localdate() - timedelta(days=6), timezone.localdate())
+
+
+@hot_query('caja.reports.payments')
+def report_payments():
+    return payment_rows(timezone.localdate() - timedelta(days=6), timezone.localdate())
+
+
+@hot_query('caja.stock.expired_reservations')
+def stock_expired_reservations():
+    return expired_reservations(timezone.now()).values_list('order_id', flat=True)
+
+
+def plan_problems(plan, allow_sort=False):
+    """Devuelve la lista de problemas (recorridos completos, ordenamientos temporales) del plan."""
+    problems = [f"recorre toda la tabla {table}" for table in FULL_SCAN.findall(plan)]
+    if not allow_sort and TEMP_SORT.search(plan):
+        problems.append("ordena en memoria (USE TEMP B-TREE)")
+    return problems
+
+
+def check_plans(names=None):
+    """Devuelve [(nombre, plan, problemas)] para las consultas registradas."""
+    results = []
+    for name, builder in HOT_QUERIES.items():
+        if names and name not in names:
+            continue
+        plan = builder().explain()
+        results.append((name, plan, plan_problems(plan, builder.allow_sort)))
+    return results
@@ -0,0 +1,323 @@
+"""
+Resúmenes diarios de ventas para reportes.
+
+Tres tablas con una fila por día y dimensión:
+    DailyProductSales  (order_date, producto)          unidades y facturación, sin pedidos cancelados
+    DailyStateSales    (order_date, estado)            cantidad de pedidos y total
+    DailyPaymentSales  (payment_date, medio, estado)   cantidad y monto de pagos
+
+Igual que Order.amount (caja.totals) se mantienen con deltas: cada alta, cambio
+o baja de un pedido, item o pago suma solo su diferencia con un
+INSERT ... ON CONFLICT DO UPDATE por tabla, sin recorrer el historial. Los
+reportes leen estas tablas y cuestan lo mismo con una semana o con años de
+pedidos.
+
+Los caminos que no disparan señales llaman directamente a `add_order_items`
+(bulk_create de items) o a `rebuild_days` (inlines del admin).
+`manage.py rebuild_rollups` recalcula todo o un rango desde los datos crudos,
+incluidos los pedidos archivados (caja.archive).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .lookups import StateName, payment_methods, payment_statuses, states
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, ArchivedPayment, DailyPaymentSales, DailyProductSales, DailyStateSales, Order,
+    OrderItem, Payment, Product,
+)
+
+ZERO = Decimal('0.00')
+
+
+def _upsert(model, key_fields, deltas):
+    """
+    Suma `deltas` ({clave: {campo: delta}}) a las filas de `model`, creándolas si
+    no existen, en una sola sentencia. Las claves sin cambios se omiten.
+    """
+    rows = [(key, values) for key, values in deltas.items() if any(values.values())]
+    if not rows:
+        return
+    value_fields = list(rows[0][1])
+    fields = [model._meta.get_field(name) for name in key_fields + value_fields]
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = [qn(field.column) for field in fields]
+    key_columns = columns[:len(key_fields)]
+    value_columns = columns[len(key_fields):]
+
+    params = []
+    for key, values in rows:
+        for field, value in zip(fields, (*key, *(values[name] for name in value_fields))):
+            params.append(field.get_db_prep_save(value, connection))
+    placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([placeholders] * len(rows))} "
+        f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET "
+        + ', '.join(f"{column} = {table}.{column} + excluded.{column}" for column in value_columns)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _cancelled_id():
+    return states.get(StateName.CANCELADO).id
+
+
+def _amount(value):
+    return ZERO if value is None else Decimal(str(value))
+
+
+# --- Pedidos ---
+
+def order_key(instance):
+    """(día, estado, total) persistidos del pedido, o None si es nuevo o se cargó sin esos campos."""
+    values = instance.__dict__
+    if instance.pk is None or any(values.get(name) is None for name in ('order_date', 'status_id', 'amount')):
+        return None
+    return values['order_date'], values['status_id'], _amount(values['amount'])
+
+
+def order_changed(order_id, before, after):
+    """
+    Aplica el cambio de un pedido de `before` a `after` ((día, estado, total) o
+    None para alta/baja). Si el pedido entra o sale de Cancelado, o cambia de día,
+    sus items se mueven en DailyProductSales.
+    """
+    states_delta = defaultdict(lambda: {'orders': 0, 'amount': ZERO})
+    if before is not None:
+        states_delta[before[:2]]['orders'] -= 1
+        states_delta[before[:2]]['amount'] -= before[2]
+    if after is not None:
+        states_delta[after[:2]]['orders'] += 1
+        states_delta[after[:2]]['amount'] += after[2]
+    _upsert(DailyStateSales, ['day', 'state'], states_delta)
+
+    if before is None:
+        # Pedido nuevo: todavía no tiene items, los suman sus propias altas
+        return
+    cancelled = _cancelled_id()
+    counted_before = before[0] if before[1] != cancelled else None
+    counted_after = after[0] if after is not None and after[1] != cancelled else None
+    if counted_before == counted_after:
+        return
+    products_delta = defaultdict(lambda: {'quantity': 0, 'revenue': ZERO})
+    items = (
+        OrderItem.objects.filter(order_id=order_id)
+        .values('product_id')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('subtotal'))
+    )
+    for item in items:
+        if counted_before is not None:
+            products_delta[(counted_before, item['product_id'])]['quantity'] -= item['quantity']
+            products_delta[(counted_before, item['product_id'])]['revenue'] -= _amount(item['revenue'])
+        if counted_after is not None:
+            products_delta[(counted_after, item['product_id'])]['quantity'] += item['quantity']
+            products_delta[(counted_after, item['product_id'])]['revenue'] += _amount(item['revenue'])
+    _upsert(DailyProductSales, ['day', 'product'], products_delta)
+
+
+def add_order_items(order, items):
+    """Suma los items de un pedido recién creado con bulk_create (que no dispara señales)."""
+    if order.status_id == _cancelled_id():
+        return
+    products_delta = defaultdict(lambda: {'quantity': 0, 'revenue': ZERO})
+    for item in items:
+        products_delta[(order.order_date, item.product_id)]['quantity'] += item.quantity
+        products_delta[(order.order_date, item.product_id)]['revenue'] += _amount(item.subtotal)
+    _upsert(DailyProductSales, ['day', 'product'], products_delta)
+
+
+def item_changed(before, after):
+    """
+    Aplica el cambio de un item de `before` a `after` ((pedido, producto,
+    cantidad, subtotal) o None para alta/baja) al producto y al total del estado.
+    """
+    order_ids = {line[0] for line in (before, after) if line is not None}
+    orders = {
+        pk: (order_date, status_id)
+        for pk, order_date, status_id in Order.objects.filter(pk__in=order_ids).values_list('id', 'order_date', 'status_id')
+    }
+    cancelled = _cancelled_id()
+    states_delta = defaultdict(lambda: {'orders': 0, 'amount': ZERO})
+    products_delta = defaultdict(lambda: {'quantity': 0, 'revenue': ZERO})
+    for line, sign in ((before, -1), (after, 1)):
+        if line is None or line[0] not in orders:
+            continue
+        order_id, product_id, quantity, subtotal = line
+        day, status_id = orders[order_id]
+        states_delta[(day, status_id)]['amount'] += sign * subtotal
+        if status_id != cancelled:
+            products_delta[(day, product_id)]['quantity'] += sign * quantity
+            products_delta[(day, product_id)]['revenue'] += sign * subtotal
+    _upsert(DailyStateSales, ['day', 'state'], states_delta)
+    _upsert(DailyProductSales, ['day', 'product'], products_delta)
+
+
+# --- Pagos ---
+
+def payment_key(instance):
+    """(día, medio, estado, monto) persistidos del pago, o None si es nuevo o se cargó sin esos campos."""
+    values = instance.__dict__
+    names = ('payment_date', 'idPaymentMethod_id', 'idPaymentStatus_id', 'amount')
+    if instance.pk is None or any(values.get(name) is None for name in names):
+        return None
+    return (
+        timezone.localdate(values['payment_date']),
+        values['idPaymentMethod_id'],
+        values['idPaymentStatus_id'],
+        _amount(values['amount']),
+    )
+
+
+def payment_changed(before, after):
+    """Aplica el cambio de un pago de `before` a `after` ((día, medio, estado, monto) o None)."""
+    payments_delta = defaultdict(lambda: {'payments': 0, 'amount': ZERO})
+    if before is not None:
+        payments_delta[before[:3]]['payments'] -= 1
+        payments_delta[before[:3]]['amount'] -= before[3]
+    if after is not None:
+        payments_delta[after[:3]]['payments'] += 1
+        payments_delta[after[:3]]['amount'] += after[3]
+    _upsert(DailyPaymentSales, ['day', 'payment_method', 'payment_status'], payments_delta)
+
+
+# --- Reconstrucción ---
+
+def _grouped(sources, keys, sums, **day_lookup):
+    """Suma por `keys` las filas de cada queryset de `sources` (tablas calientes y archivo)."""
+    totals = defaultdict(lambda: dict.fromkeys(sums, 0))
+    for queryset in sources:
+        for row in queryset.filter(**day_lookup).values(*keys).annotate(**sums):
+            accumulated = totals[tuple(row[key] for key in keys)]
+            for name in sums:
+                accumulated[name] += row[name]
+    return totals.items()
+
+
+def _rebuild(**day_lookup):
+    cancelled = _cancelled_id()
+    product_rows = _grouped(
+        [
+            model.objects.annotate(day=F('order__order_date')).exclude(order__status_id=cancelled)
+            for model in (OrderItem, ArchivedOrderItem)
+        ],
+        ('day', 'product_id'), {'quantity': Sum('quantity'), 'revenue': Sum('subtotal')}, **day_lookup,
+    )
+    state_rows = _grouped(
+        [model.objects.annotate(day=F('order_date')) for model in (Order, ArchivedOrder)],
+        ('day', 'status_id'), {'orders': Count('id'), 'total': Sum('amount')}, **day_lookup,
+    )
+    payment_rows = _grouped(
+        [model.objects.annotate(day=TruncDate('payment_date')) for model in (Payment, ArchivedPayment)],
+        ('day', 'idPaymentMethod_id', 'idPaymentStatus_id'), {'payments': Count('id'), 'total': Sum('amount')},
+        **day_lookup,
+    )
+    with transaction.atomic():
+        DailyProductSales.objects.filter(**day_lookup).delete()
+        DailyStateSales.objects.filter(**day_lookup).delete()
+        DailyPaymentSales.objects.filter(**day_lookup).delete()
+        created = DailyProductSales.objects.bulk_create([
+            DailyProductSales(day=day, product_id=product_id, quantity=row['quantity'], revenue=row['revenue'])
+            for (day, product_id), row in product_rows
+        ])
+        created += DailyStateSales.objects.bulk_create([
+            DailyStateSales(day=day, state_id=state_id, orders=row['orders'], amount=row['total'])
+            for (day, state_id), row in state_rows
+        ])
+        created += DailyPaymentSales.objects.bulk_create([
+            DailyPaymentSales(
+                day=day, payment_method_id=method_id, payment_status_id=status_id,
+                payments=row['payments'], amount=row['total'],
+            )
+            for (day, method_id, status_id), row in payment_rows
+        ])
+    return len(created)
+
+
+def rebuild_days(days):
+    """Recalcula los resúmenes de esos días desde los datos crudos. Devuelve las filas escritas."""
+    days = sorted(set(days) - {None})
+    return _rebuild(day__in=days) if days else 0
+
+
+def rebuild_rollups(since=None, until=None):
+    """Recalcula los resúmenes de un rango de días (o de todo el historial)."""
+    day_lookup = {}
+    if since is not None:
+        day_lookup['day__gte'] = since
+    if until is not None:
+        day_lookup['day__lte'] = until
+    return _rebuild(**day_lookup)
+
+
+# --- Lectura para reportes ---
+
+def product_rows(since, until):
+    return DailyProductSales.objects.filter(day__range=(since, until)).order_by('day', 'product').values_list(
+        'day', 'product_id', 'quantity', 'revenue'
+    )
+
+
+def state_rows(since, until):
+    return DailyStateSales.objects.filter(day__range=(since, until)).order_by('day', 'state').values_list(
+        'day', 'state_id', 'orders', 'amount'
+    )
+
+
+def payment_rows(since, until):
+    return DailyPaymentSales.objects.filter(day__range=(since, until)).order_by(
+        'day', 'payment_method', 'payment_status'
+    ).values_list('day', 'payment_method_id', 'payment_status_id', 'payments', 'amount')
+
+
+def daily_report(since, until):
+    """
+    Ventas por día entre `since` y `until` (inclusive), leídas de los resúmenes:
+    pedidos y total por estado, pagos por medio y estado, y unidades por producto.
+    """
+    cancelled = _cancelled_id()
+    days = {}
+
+    def entry(day):
+        if day not in days:
+            days[day] = {
+                'date': day.isoformat(), 'orders': 0, 'revenue': 0.0,
+                'states': {}, 'payments': {}, 'products': [],
+            }
+        return days[day]
+
+    for day, state_id, orders, amount in state_rows(since, until):
+        if not orders and not amount:
+            continue
+        data = entry(day)
+        data['states'][states.get_by_id(state_id).name] = {'orders': orders, 'amount': float(amount)}
+        if state_id != cancelled:
+            data['orders'] += orders
+            data['revenue'] += float(amount)
+
+    for day, method_id, status_id, payments, amount in payment_rows(since, until):
+        if not payments and not amount:
+            continue
+        by_status = entry(day)['payments'].setdefault(payment_methods.get_by_id(method_id).name, {})
+        by_status[payment_statuses.get_by_id(status_id).name] = {'payments': payments, 'amount': float(amount)}
+
+    products = list(product_rows(since, until))
+    names = dict(Product.objects.filter(pk__in={row[1] for row in products}).values_list('id', 'name'))
+    for day, product_id, quantity, revenue in products:
+        if not quantity and not revenue:
+            continue
+        entry(day)['products'].append({
+            'product_id': product_id,
+            'name': names.get(product_id, f'Producto {product_id}'),
+            'quantity': quantity,
+            'revenue': float(revenue),
+        })
+
+    for data in days.values():
+        data['revenue'] = round(data['revenue'], 2)
+    return [days[day] for day in sorted(days)]
@@ -0,0 +1,166 @@
+"""
+Datos sintéticos a escala para medir las consultas calientes con volumen real.
+
+`generate_dataset` agrega categorías, productos, pedidos con sus items y pagos
+usando bulk_create por lotes (sin señales: los totales se calculan acá y los
+resúmenes diarios se reconstruyen al final). Los pedidos se reparten en los
+últimos `days` días; los anteriores a hoy quedan casi todos entregados y los de
+hoy en los estados activos, como en un día de servicio.
+
+Lo usan `manage.py generate_scale_data` y `manage.py benchmark_queries`, que
+trabajan sobre un archivo SQLite aparte (ver `use_database_file`).
+"""
+import contextlib
+import io
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.db.models import F, Max, OuterRef, Subquery
+from django.utils import timezone
+
+from . import lookups
+from .catalog import bump_catalog_version
+from .lookups import PaymentMethodName, PaymentStatusName, StateName, payment_methods, payment_statuses, states
+from .models import Category, Order, OrderItem, Payment, Product
+from .rollups import rebuild_rollups
+
+BATCH_SIZE = 2000
+TABLES = 30
+
+CUSTOMER_NAMES = (
+    'Ana', 'Bruno', 'Carla', 'Diego', 'Elena', 'Facundo', 'Gabriela', 'Hernán', 'Inés', 'Julián',
+    'Karina', 'Lucas', 'Micaela', 'Nicolás', 'Olga', 'Pablo', 'Romina', 'Santiago', 'Tamara', 'Valentín',
+)
+
+# Pesos relativos de cada estado: historial (días anteriores) y servicio en curso (hoy)
+HISTORY_STATES = {StateName.ENTREGADO: 90, StateName.CANCELADO: 4, StateName.PENDIENTE: 6}
+TODAY_STATES = {
+    StateName.PENDIENTE: 15, StateName.EN_ESPERA: 10, StateName.EN_PREPARACION: 25,
+    StateName.LISTO_PARA_ENTREGAR: 10, StateName.ENTREGADO: 40,
+}
+PAID_STATES = {StateName.EN_PREPARACION, StateName.LISTO_PARA_ENTREGAR, StateName.ENTREGADO}
+PAYMENT_METHODS = {
+    PaymentMethodName.EFECTIVO: 35, PaymentMethodName.TARJETA_CREDITO: 25,
+    PaymentMethodName.TARJETA_DEBITO: 25, PaymentMethodName.BILLETERA_ELECTRONICA: 15,
+}
+
+
+def use_database_file(path, migrate=True):
+    """Apunta la conexión default a `path` (SQLite) y, si se pide, la migra."""
+    connections.close_all()
+    settings.DATABASES['default']['NAME'] = str(path)
+    lookups.invalidate()
+    if migrate:
+        # La migración de datos iniciales imprime el loaddata en stdout, donde va el JSON de los benchmarks
+        with contextlib.redirect_stdout(io.StringIO()):
+            call_command('migrate', verbosity=0)
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def _weighted(rng, weights):
+    choices = list(weights)
+    return rng.choices(choices, weights=[weights[choice] for choice in choices])
+
+
+def ensure_catalog(products, categories, rng):
+    """Crea (si faltan) `categories` categorías y `products` productos sintéticos; devuelve [(id, precio)]."""
+    Category.objects.bulk_create(
+        [Category(name=f'Escala {n:03d}') for n in range(1, categories + 1)], ignore_conflicts=True,
+    )
+    category_ids = list(
+        Category.objects.filter(name__startswith='Escala ').order_by('id').values_list('id', flat=True)[:categories]
+    )
+    Product.objects.bulk_create(
+        [
+            Product(
+                name=f'Producto escala {n:05d}',
+                description=f'Producto sintético {n} para pruebas de volumen',
+                price=Decimal(rng.randrange(10, 300) * 50),
+                stock=10 ** 6,
+                idCategoria_id=category_ids[n % len(category_ids)],
+            )
+            for n in range(1, products + 1)
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return list(
+        Product.objects.filter(name__startswith='Producto escala ').order_by('id').values_list('id', 'price')[:products]
+    )
+
+
+def _order_batch(rng, first_id, count, catalog, items_per_order, end_date, days):
+    state_ids = {name: states.id_of(name) for name in StateName}
+    method_ids = {name: payment_methods.id_of(name) for name in PAYMENT_METHODS}
+    approved = payment_statuses.id_of(PaymentStatusName.APROBADO)
+    rejected = payment_statuses.id_of(PaymentStatusName.RECHAZADO)
+    tz = timezone.get_current_timezone()
+
+    orders, items, payments = [], [], []
+    for order_id in range(first_id, first_id + count):
+        day = end_date - timedelta(days=rng.randrange(days))
+        state = _weighted(rng, TODAY_STATES if day == end_date else HISTORY_STATES)[0]
+        started = datetime.combine(day, time(rng.randrange(11, 24), rng.randrange(60), rng.randrange(60)), tz)
+        lines = rng.sample(catalog, min(len(catalog), rng.randint(1, 2 * items_per_order - 1)))
+        amount = Decimal('0.00')
+        for product_id, price in lines:
+            quantity = rng.randint(1, 3)
+            subtotal = price * quantity
+            amount += subtotal
+            items.append(OrderItem(
+                order_id=order_id, product_id=product_id, quantity=quantity, price=price, subtotal=subtotal,
+            ))
+        orders.append(Order(
+            id=order_id, amount=amount, status_id=state_ids[state], initialTime=started, order_date=day,
+            customer_name=rng.choice(CUSTOMER_NAMES), tableNumber=rng.randint(1, TABLES),
+        ))
+        if state in PAID_STATES or state == StateName.CANCELADO:
+            payments.append(Payment(
+                idOrder_id=order_id,
+                idPaymentMethod_id=method_ids[_weighted(rng, PAYMENT_METHODS)[0]],
+                idPaymentStatus_id=approved if state in PAID_STATES else rejected,
+                amount=amount,
+                token=f'escala-{order_id}',
+            ))
+    return orders, items, payments
+
+
+def generate_dataset(orders, items_per_order=10, products=500, categories=12, days=365, seed=None,
+                     batch_size=BATCH_SIZE, end_date=None, progress=None):
+    """
+    Agrega `orders` pedidos con ~`items_per_order` items cada uno (entre 1 y el doble
+    menos uno) y un pago por pedido pagado o cancelado. Devuelve lo creado por tabla.
+    """
+    rng = random.Random(seed)
+    end_date = end_date or timezone.localdate()
+    catalog = ensure_catalog(products, categories, rng)
+    first_order = _next_id(Order)
+    first_payment = _next_id(Payment)
+    created = {'orders': 0, 'items': 0, 'payments': 0}
+
+    for offset in range(0, orders, batch_size):
+        batch = _order_batch(
+            rng, first_order + offset, min(batch_size, orders - offset), catalog, items_per_order, end_date, days,
+        )
+        with transaction.atomic():
+            for key, model, objects in zip(created, (Order, OrderItem, Payment), batch):
+                model.objects.bulk_create(objects, batch_size=batch_size)
+                created[key] += len(objects)
+        if progress:
+            progress(created)
+
+    # bulk_create completa los auto_now con la hora actual: se llevan a la hora del pedido
+    Order.objects.filter(id__gte=first_order).update(endTime=F('initialTime'))
+    Payment.objects.filter(id__gte=first_payment).update(
+        payment_date=Subquery(Order.objects.filter(id=OuterRef('idOrder_id')).values('initialTime')[:1])
+    )
+    rebuild_rollups(end_date - timedelta(days=days), end_date)
+    bump_catalog_version()
+    return {'categories': categories, 'products': len(catalog), **created}
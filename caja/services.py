@@ -1,20 +1,267 @@
 from django.http import JsonResponse
-import mercadopago
 from django.conf import settings
-from caja.models import Order, Payment, PaymentMethod, PaymentStatus, State
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from caja.models import Order, OrderItem, Product, Payment, PaymentMethod, PaymentStatus, State
+from caja.lookups import PaymentMethodName, PaymentStatusName, StateName, payment_methods, payment_statuses, states
+from caja.rollups import add_order_items
+from caja.stock import InsufficientStock, reserve_stock
+from caja import gateway
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from collections import defaultdict
+from decimal import Decimal
 import json
 
+
+class CartValidationError(ValueError):
+    """El carrito tiene líneas inválidas; `errors` trae el detalle por línea."""
+
+    def __init__(self, errors):
+        super().__init__("El carrito contiene productos inválidos")
+        self.errors = errors
+
+
+class OrderService:
+    @staticmethod
+    def validate_cart(carrito):
+        """
+        Valida las líneas del carrito con una sola consulta de productos.
+        Devuelve (lineas, productos) o lanza CartValidationError con los errores por línea.
+        """
+        errors = []
+        lines = []
+        for index, item in enumerate(carrito):
+            try:
+                product_id = int(item['id'])
+                quantity = int(item.get('cantidad', 1))
+            except (KeyError, TypeError, ValueError, AttributeError):
+                errors.append({'line': index, 'id': None, 'error': 'Línea de carrito inválida'})
+                continue
+            if quantity <= 0:
+                errors.append({'line': index, 'id': product_id, 'error': 'La cantidad debe ser mayor a cero'})
+                continue
+            lines.append((index, product_id, quantity, item.get('sugerency', '') or ''))
+
+        products = Product.objects.in_bulk({product_id for _, product_id, _, _ in lines})
+
+        # El stock se compara contra la cantidad total pedida de cada producto
+        requested = defaultdict(int)
+        for _, product_id, quantity, _ in lines:
+            requested[product_id] += quantity
+
+        for index, product_id, quantity, _ in lines:
+            product = products.get(product_id)
+            if product is None:
+                errors.append({'line': index, 'id': product_id, 'error': 'Producto inexistente'})
+            elif not product.active:
+                errors.append({'line': index, 'id': product_id, 'error': f'{product.name} no está disponible'})
+            elif product.stock < requested[product_id]:
+                errors.append({'line': index, 'id': product_id, 'error': f'{product.name} no tiene stock suficiente'})
+
+        if errors:
+            raise CartValidationError(sorted(errors, key=lambda e: e['line']))
+        return lines, products
+
+    @staticmethod
+    def create_client_order(carrito, customer_name, table_number, ip=''):
+        """
+        Crea la orden y todos sus items en una única transacción:
+        una consulta de productos, un bulk_create de items, un solo cálculo del total
+        y la reserva de stock de todo el pedido en un UPDATE condicional.
+        """
+        if not carrito:
+            raise CartValidationError([{'line': None, 'id': None, 'error': 'El carrito está vacío'}])
+
+        lines, products = OrderService.validate_cart(carrito)
+
+        items = []
+        total = Decimal('0.00')
+        for _, product_id, quantity, sugerency in lines:
+            price = products[product_id].price
+            subtotal = price * quantity
+            total += subtotal
+            items.append(OrderItem(
+                product_id=product_id,
+                quantity=quantity,
+                price=price,
+                subtotal=subtotal,
+                sugerency=sugerency,
+            ))
+
+        quantities = defaultdict(int)
+        for _, product_id, quantity, _ in lines:
+            quantities[product_id] += quantity
+
+        estado = states.first()
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                order = Order.objects.create(
+                    customer_name=customer_name,
+                    amount=total,
+                    status=estado,
+                    IP=ip or None,
+                    initialTime=now,
+                    order_date=now.date(),
+                    tableNumber=table_number,
+                )
+                for item in items:
+                    item.order = order
+                # bulk_create no dispara post_save, el total ya quedó calculado arriba
+                OrderItem.objects.bulk_create(items)
+                add_order_items(order, items)
+                # El descuento condicional es la verificación definitiva frente a pedidos concurrentes
+                reserve_stock(order, quantities)
+        except InsufficientStock as e:
+            raise CartValidationError([
+                {'line': index, 'id': product_id, 'error': f'{products[product_id].name} no tiene stock suficiente'}
+                for index, product_id, _, _ in lines
+                if product_id in e.product_ids
+            ])
+        return order
+
+
 class PaymentService:
+    # Mapeo de estados de Mercado Pago a los PaymentStatus del sistema
+    STATUS_MAPPING = {
+        "approved": PaymentStatusName.APROBADO,
+        "in_process": PaymentStatusName.PENDIENTE,
+        "rejected": PaymentStatusName.RECHAZADO,
+        "cancelled": PaymentStatusName.RECHAZADO,
+    }
+    # Estado de la orden que corresponde a cada estado de Mercado Pago
+    ORDER_STATE_MAPPING = {
+        "approved": StateName.EN_PREPARACION,
+        "in_process": StateName.PENDIENTE,
+        "rejected": StateName.CANCELADO,
+        "cancelled": StateName.CANCELADO,
+    }
+    # Estados de Mercado Pago que ya no cambian: sus notificaciones repetidas se descartan
+    FINAL_STATUSES = ("approved", "rejected", "cancelled")
+    DEDUP_SECONDS = 10 * 60
+    # Una preferencia creada se reutiliza mientras la orden mantenga el mismo total
+    PREFERENCE_TTL = getattr(settings, 'MERCADO_PAGO_PREFERENCE_TTL', 30 * 60)
+
+    @staticmethod
+    def get_sdk():
+        """Cliente de Mercado Pago compartido (ver caja.gateway); los tests lo reemplazan por un stub."""
+        return gateway.get_sdk()
+
+    @staticmethod
+    def fetch_payment(payment_id):
+        """Consulta el pago en Mercado Pago y devuelve el cuerpo de la respuesta."""
+        payment_info = PaymentService.get_sdk().payment().get(payment_id)
+        return payment_info.get("response", {})
+
+    @staticmethod
+    def _dedup_key(payment_id):
+        return f'payment:seen:{payment_id}'
+
+    @staticmethod
+    def known_final_status(payment_id):
+        """(order_id, mp_status) si el pago ya quedó registrado en un estado final, sin consultar nada."""
+        seen = cache.get(PaymentService._dedup_key(payment_id))
+        if seen and seen[1] in PaymentService.FINAL_STATUSES:
+            return seen
+        return None
+
+    @staticmethod
+    def record_payment(order, payment_id, mp_status, method_name=PaymentMethodName.BILLETERA_ELECTRONICA):
+        """
+        Registra el Payment y mueve la orden al estado que corresponde al pago.
+        Es idempotente por (orden, token): repetir la misma notificación no escribe nada.
+        Devuelve True si hubo cambios.
+        """
+        dedup_key = PaymentService._dedup_key(payment_id)
+        if cache.get(dedup_key) == (order.id, mp_status):
+            return False
+
+        mapped_status = PaymentService.STATUS_MAPPING.get(mp_status, PaymentStatusName.PENDIENTE)
+        payment_status = payment_statuses.get(mapped_status)
+        payment = Payment.objects.filter(idOrder=order, token=str(payment_id)).first()
+        if payment is not None and payment.idPaymentStatus_id == payment_status.id:
+            cache.set(dedup_key, (order.id, mp_status), PaymentService.DEDUP_SECONDS)
+            return False
+
+        if payment is None:
+            try:
+                with transaction.atomic():
+                    Payment.objects.create(
+                        idOrder=order,
+                        idPaymentMethod=payment_methods.get(method_name),
+                        amount=order.amount,
+                        idPaymentStatus=payment_status,
+                        token=str(payment_id)
+                    )
+            except IntegrityError:
+                # Otra notificación del mismo pago lo registró primero: se pasa a actualizar
+                payment = Payment.objects.get(idOrder=order, token=str(payment_id))
+        if payment is not None:
+            # save() con update_fields (un solo UPDATE) para que caja.rollups vea el cambio de estado
+            payment.idPaymentStatus = payment_status
+            payment.save(update_fields=['idPaymentStatus'])
+
+        # Actualiza el estado de la orden usando el modelo State
+        new_state = PaymentService.ORDER_STATE_MAPPING.get(mp_status)
+        if new_state is not None:
+            order.status = states.get(new_state)
+        order.save()
+        transaction.on_commit(lambda: cache.set(dedup_key, (order.id, mp_status), PaymentService.DEDUP_SECONDS))
+        if mp_status == "approved":
+            # Una orden pagada no vuelve a ofrecer el checkout
+            transaction.on_commit(lambda: PaymentService.forget_payment_preference(order.id))
+        return True
+
+    @staticmethod
+    def process_webhook_payment(payment_id):
+        """
+        Aplica una notificación de pago del webhook. Lanza Order.DoesNotExist o
+        ValidationError si no tiene arreglo, y cualquier otra excepción si debe reintentarse.
+        """
+        known = PaymentService.known_final_status(payment_id)
+        if known:
+            # Reintento del proveedor sobre un pago ya cerrado: ni pasarela ni base
+            return {"order_id": known[0], "status": known[1]}
+        payment_data = PaymentService.fetch_payment(payment_id)
+        mp_status = payment_data.get("status", "pending")
+        external_reference = payment_data.get("external_reference")
+        if not str(external_reference or '').isdigit():
+            raise ValidationError(f"Referencia externa inválida: {external_reference!r}")
+        with transaction.atomic():
+            order = Order.objects.get(id=external_reference)
+            PaymentService.record_payment(order, payment_id, mp_status)
+        return {"order_id": order.id, "status": mp_status}
+
+    @staticmethod
+    def _preference_key(order_id):
+        return f'payment:preference:{order_id}'
+
+    @staticmethod
+    def forget_payment_preference(order_id):
+        cache.delete(PaymentService._preference_key(order_id))
+
     @staticmethod
     def create_payment_preference(order_id, return_url):
-        """Crea una preferencia de pago en Mercado Pago"""
+        """
+        Crea una preferencia de pago en Mercado Pago, o devuelve la que ya se creó
+        para la misma orden con el mismo total (clics repetidos, recargas de página).
+        """
         try:
             order = Order.objects.get(id=order_id)
-            
+            cache_key = PaymentService._preference_key(order.id)
+            cached = cache.get(cache_key)
+            if cached and cached["amount"] == str(order.amount) and cached["return_url"] == return_url:
+                return {
+                    "success": True,
+                    "init_point": cached["init_point"],
+                    "payment_id": cached["preference_id"]
+                }
+
             # Inicializar SDK
-            sdk = mercadopago.SDK(settings.MERCADO_PAGO_ACCESS_TOKEN)
+            sdk = PaymentService.get_sdk()
             
             # Datos para la preferencia
             preference_data = {
@@ -38,8 +285,7 @@ class PaymentService:
             
             # Crear preferencia
             preference_response = sdk.preference().create(preference_data)
-            print("Mercado Pago response:", preference_response)  
-            preference = preference_response["response"]
+            preference = preference_response.get("response") or {}
 
             if "id" not in preference or "init_point" not in preference:
                 error_message = preference.get("message", "Respuesta inválida de Mercado Pago")
@@ -47,16 +293,14 @@ class PaymentService:
                     "success": False,
                     "error": error_message
                 }
-            
-            # Guardar preference_id en la orden si el campo existe
-            preference = preference_response.get("response", {})
-            if "id" in preference and hasattr(order, 'preference_id'):
-                try:
-                    order.preference_id = preference["id"]
-                    order.save(update_fields=['preference_id'])
-                except Exception:
-                    # no bloquear la creación de la preferencia si el guardado falla
-                    pass
+
+            # Si el total cambia (se agregan o quitan items) la entrada deja de coincidir y se crea otra
+            cache.set(cache_key, {
+                "amount": str(order.amount),
+                "return_url": return_url,
+                "preference_id": preference["id"],
+                "init_point": preference["init_point"],
+            }, PaymentService.PREFERENCE_TTL)
 
             return {
                 "success": True,
@@ -75,40 +319,14 @@ class PaymentService:
         """Procesa el resultado de un pago"""
         try:
             order = Order.objects.get(id=order_id)
-            sdk = mercadopago.SDK(settings.MERCADO_PAGO_ACCESS_TOKEN)
-            payment_info = sdk.payment().get(payment_id)
-            payment_data = payment_info.get("response", {})
-            mp_status = payment_data.get("status", "pending")
-            external_reference = payment_data.get("external_reference")
-
-            # Mapeo de estados de Mercado Pago a tu sistema
-            status_mapping = {
-                "approved": "Aprobado",
-                "in_process": "Pendiente",
-                "rejected": "Rechazado",
-                "cancelled": "Cancelado"
-            }
-            mapped_status = status_mapping.get(mp_status, "Pendiente")
-            payment_method = PaymentMethod.objects.get(name='Billetera Electrónica')
-            payment_status = PaymentStatus.objects.get(name=mapped_status)
-            Payment.objects.create(
-                idOrder=order,
-                idPaymentMethod=payment_method,
-                amount=order.amount,
-                idPaymentStatus=payment_status,
-                token=str(payment_id)
-            )
-            # Actualiza el estado de la orden usando el modelo State
-            if mp_status == "approved":
-                preparado_state = State.objects.get(name="En Preparación")
-                order.status = preparado_state
-            elif mp_status == "in_process":
-                pendiente_state = State.objects.get(name="Pendiente")
-                order.status = pendiente_state
-            elif mp_status in ["rejected", "cancelled"]:
-                cancelado_state = State.objects.get(name="Cancelado")
-                order.status = cancelado_state
-            order.save()
+            known = PaymentService.known_final_status(payment_id)
+            if known and known[0] == order.id:
+                mp_status = known[1]
+            else:
+                payment_data = PaymentService.fetch_payment(payment_id)
+                mp_status = payment_data.get("status", "pending")
+                with transaction.atomic():
+                    PaymentService.record_payment(order, payment_id, mp_status)
 
             return {
                 "success": True,
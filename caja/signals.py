@@ -1,10 +1,202 @@
-from django.db.models.signals import post_save, post_delete
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
-from .models import OrderItem
-
-@receiver([post_save, post_delete], sender=OrderItem)
-def update_order_amount(sender, instance, **kwargs):
-    order = instance.order
-    total = sum(item.subtotal for item in order.order_items.all())
-    order.amount = total
-    order.save()
\ No newline at end of file
+from django.utils import timezone
+from .catalog import bump_catalog_version
+from .images import schedule_variants
+from .events import ORDER_CREATED, STATUS_CHANGED, broker, order_event_data
+from . import lookups, rollups
+from .lookups import states
+from .models import Category, Order, OrderItem, Payment, PaymentMethod, PaymentStatus, Product, Promotion, State
+from .stock import sync_stock_with_status
+from .totals import amount_updates_suppressed, apply_amount_delta, reconcile_totals
+
+
+def _remember_item_state(instance):
+    # Guarda los valores persistidos para calcular el delta en el próximo save.
+    # Se lee __dict__ para no disparar la carga de campos diferidos (.only()).
+    values = instance.__dict__
+    if instance.pk is None:
+        instance._persisted_order_id = None
+        instance._persisted_product_id = None
+        instance._persisted_quantity = 0
+        instance._persisted_subtotal = Decimal('0.00')
+    else:
+        instance._persisted_order_id = values.get('order_id')
+        instance._persisted_product_id = values.get('product_id')
+        instance._persisted_quantity = values.get('quantity')
+        subtotal = values.get('subtotal')
+        instance._persisted_subtotal = None if subtotal is None else Decimal(str(subtotal))
+
+
+def _item_line(order_id, product_id, quantity, subtotal):
+    # (pedido, producto, cantidad, subtotal) para caja.rollups; None si falta algún valor
+    if None in (order_id, product_id, quantity, subtotal):
+        return None
+    return order_id, product_id, quantity, Decimal(str(subtotal))
+
+
+def _rebuild_order_days(order_ids):
+    rollups.rebuild_days(Order.objects.filter(pk__in=order_ids).values_list('order_date', flat=True))
+
+
+@receiver(post_init, sender=OrderItem)
+def track_order_item(sender, instance, **kwargs):
+    _remember_item_state(instance)
+
+
+@receiver(post_save, sender=OrderItem)
+def update_order_amount(sender, instance, created, raw=False, **kwargs):
+    if raw or amount_updates_suppressed():
+        _remember_item_state(instance)
+        return
+    previous_order_id = None if created else instance._persisted_order_id
+    previous_subtotal = Decimal('0.00') if created else instance._persisted_subtotal
+    before = None if created else _item_line(
+        previous_order_id, instance._persisted_product_id, instance._persisted_quantity, previous_subtotal
+    )
+    after = _item_line(instance.order_id, instance.product_id, instance.quantity, instance.subtotal)
+    if previous_subtotal is None or (not created and previous_order_id is None):
+        # No se conoce el valor anterior (instancia cargada parcialmente): se recalcula la orden
+        order_ids = {instance.order_id, previous_order_id} - {None}
+        reconcile_totals(Order.objects.filter(pk__in=order_ids))
+        _rebuild_order_days(order_ids)
+        _remember_item_state(instance)
+        return
+    if previous_order_id and previous_order_id != instance.order_id:
+        # El item cambió de orden: se descuenta de la anterior y se suma completo a la nueva
+        apply_amount_delta(previous_order_id, -previous_subtotal)
+        previous_subtotal = Decimal('0.00')
+    apply_amount_delta(instance.order_id, Decimal(str(instance.subtotal)) - previous_subtotal)
+    if (before is None and not created) or after is None:
+        _rebuild_order_days({instance.order_id, previous_order_id} - {None})
+    elif before != after:
+        rollups.item_changed(before, after)
+    _remember_item_state(instance)
+
+
+@receiver(post_delete, sender=OrderItem)
+def discount_order_amount(sender, instance, **kwargs):
+    order_id = instance._persisted_order_id
+    if amount_updates_suppressed() or order_id is None:
+        return
+    if instance._persisted_subtotal is None:
+        reconcile_totals(Order.objects.filter(pk=order_id))
+        _rebuild_order_days([order_id])
+        return
+    apply_amount_delta(order_id, -instance._persisted_subtotal)
+    before = _item_line(
+        order_id, instance._persisted_product_id, instance._persisted_quantity, instance._persisted_subtotal
+    )
+    if before is None:
+        _rebuild_order_days([order_id])
+    else:
+        rollups.item_changed(before, None)
+
+
+@receiver(post_init, sender=Order)
+def track_order_status(sender, instance, **kwargs):
+    instance._persisted_status_id = instance.__dict__.get('status_id') if instance.pk else None
+
+
+@receiver(post_save, sender=Order)
+def order_status_changed(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_status_id = instance._persisted_status_id
+    instance._persisted_status_id = instance.status_id
+    if created:
+        data = order_event_data(instance)
+        transaction.on_commit(lambda: broker.publish(ORDER_CREATED, data))
+        return
+    if instance.status_id == previous_status_id:
+        return
+    sync_stock_with_status(instance.id, states.get_by_id(instance.status_id).name)
+    data = order_event_data(instance)
+    transaction.on_commit(lambda: broker.publish(STATUS_CHANGED, data))
+
+
+@receiver(post_init, sender=Order)
+def track_order_rollup(sender, instance, **kwargs):
+    instance._rollup_key = rollups.order_key(instance)
+
+
+@receiver(post_save, sender=Order)
+def update_order_rollup(sender, instance, created, raw=False, **kwargs):
+    before = None if created else instance._rollup_key
+    after = instance._rollup_key = rollups.order_key(instance)
+    if raw or before == after:
+        return
+    if after is None or (before is None and not created):
+        # Instancia cargada sin día, estado o total: se recalcula el día desde los datos
+        rollups.rebuild_days([instance.__dict__.get('order_date'), before and before[0]])
+        return
+    rollups.order_changed(instance.pk, before, after)
+
+
+@receiver(post_delete, sender=Order)
+def discount_order_rollup(sender, instance, **kwargs):
+    # Los items y pagos ya se borraron en cascada: el día se recalcula desde lo que queda
+    rollups.rebuild_days([instance.__dict__.get('order_date')])
+
+
+@receiver(post_init, sender=Payment)
+def track_payment_rollup(sender, instance, **kwargs):
+    instance._rollup_key = rollups.payment_key(instance)
+
+
+@receiver(post_save, sender=Payment)
+def update_payment_rollup(sender, instance, created, raw=False, **kwargs):
+    before = None if created else instance._rollup_key
+    after = instance._rollup_key = rollups.payment_key(instance)
+    if raw or before == after:
+        return
+    if after is None or (before is None and not created):
+        payment_date = instance.__dict__.get('payment_date')
+        rollups.rebuild_days([payment_date and timezone.localdate(payment_date), before and before[0]])
+        return
+    rollups.payment_changed(before, after)
+
+
+@receiver(post_delete, sender=Payment)
+def discount_payment_rollup(sender, instance, **kwargs):
+    if instance._rollup_key is not None:
+        rollups.payment_changed(instance._rollup_key, None)
+
+
+@receiver(post_init, sender=Product)
+def track_product_image(sender, instance, **kwargs):
+    # __dict__ para no cargar `image` si el queryset la difirió
+    image = instance.__dict__.get('image')
+    instance._persisted_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Product)
+def schedule_image_variants(sender, instance, raw=False, **kwargs):
+    image = instance.__dict__.get('image')
+    name = getattr(image, 'name', image) or ''
+    changed = name != (instance._persisted_image or '')
+    # Productos con imagen que todavía no tienen variantes (p. ej. si falló el worker)
+    missing = bool(name) and instance.__dict__.get('image_variants') == {}
+    if raw or not (changed or missing):
+        return
+    instance._persisted_image = name
+    product_id = instance.pk
+    transaction.on_commit(lambda: schedule_variants(product_id))
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Promotion)
+def invalidate_catalog(sender, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver([post_save, post_delete], sender=State)
+@receiver([post_save, post_delete], sender=PaymentMethod)
+@receiver([post_save, post_delete], sender=PaymentStatus)
+def invalidate_lookups(sender, **kwargs):
+    lookups.invalidate(sender)
+    transaction.on_commit(lambda: lookups.invalidate(sender))
@@ -0,0 +1,149 @@
+"""
+Reserva y descuento atómico de stock.
+
+Al crear un pedido de cliente se descuenta el stock de todos sus productos con
+un único UPDATE condicional (stock = stock - q WHERE stock >= q). Si algún
+producto no alcanza, el UPDATE afecta menos filas de las esperadas y la
+transacción se revierte completa: no hay lectura previa ni bloqueo por fila,
+la propia base serializa las escrituras y nunca se vende de más.
+
+La reserva queda asociada a la orden (StockReservation) y se confirma cuando
+el pedido avanza, o se devuelve al stock si se cancela o vence sin pagar.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .lookups import StateName, states
+from .models import Order, OrderItem, Product, StockReservation
+
+# Estados en los que el pedido todavía no se pagó: la reserva sigue pudiendo vencer
+UNPAID_STATES = (StateName.PENDIENTE, StateName.EN_ESPERA)
+
+
+class InsufficientStock(ValueError):
+    def __init__(self, product_ids):
+        super().__init__("Stock insuficiente")
+        self.product_ids = product_ids
+
+
+def reservation_ttl():
+    return timedelta(minutes=getattr(settings, 'STOCK_RESERVATION_MINUTES', 30))
+
+
+def _quantity_case(quantities):
+    return Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _apply_stock_delta(quantities, sign):
+    """Suma o resta las cantidades a cada producto en un solo UPDATE; devuelve las filas afectadas."""
+    products = Product.objects.filter(pk__in=quantities.keys())
+    if sign < 0:
+        condition = Q()
+        for product_id, quantity in quantities.items():
+            condition |= Q(pk=product_id, stock__gte=quantity)
+        products = products.filter(condition)
+        return products.update(stock=F('stock') - _quantity_case(quantities))
+    return products.update(stock=F('stock') + _quantity_case(quantities))
+
+
+def _touches_zero(quantities, after_release=False):
+    """Indica si algún producto quedó en cero (o salió de cero) para invalidar el menú."""
+    condition = Q()
+    for product_id, quantity in quantities.items():
+        condition |= Q(pk=product_id, stock=quantity if after_release else 0)
+    return Product.objects.filter(condition).exists()
+
+
+def reserve_stock(order, quantities):
+    """
+    Descuenta `quantities` ({product_id: cantidad}) y registra la reserva de la orden.
+    Debe llamarse dentro de una transacción; lanza InsufficientStock si no alcanza.
+    """
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return None
+    try:
+        with transaction.atomic():
+            if _apply_stock_delta(quantities, -1) != len(quantities):
+                # Se revierte el savepoint para no dejar descontados los productos que sí alcanzaban
+                raise InsufficientStock([])
+    except InsufficientStock:
+        available = dict(Product.objects.filter(pk__in=quantities.keys()).values_list('id', 'stock'))
+        missing = sorted(pid for pid, quantity in quantities.items() if available.get(pid, 0) < quantity)
+        raise InsufficientStock(missing or sorted(quantities))
+    reservation = StockReservation.objects.create(order=order, expires_at=timezone.now() + reservation_ttl())
+    if _touches_zero(quantities):
+        transaction.on_commit(bump_catalog_version)
+    return reservation
+
+
+def _order_quantities(order_id):
+    rows = (
+        OrderItem.objects.filter(order_id=order_id)
+        .values('product_id')
+        .annotate(quantity=Sum('quantity'))
+        .values_list('product_id', 'quantity')
+    )
+    return dict(rows)
+
+
+def release_stock(order_id):
+    """Devuelve al stock lo reservado por la orden. Es idempotente: solo libera una vez."""
+    with transaction.atomic():
+        claimed = StockReservation.objects.filter(
+            order_id=order_id, status=StockReservation.RESERVED
+        ).update(status=StockReservation.RELEASED)
+        if not claimed:
+            return False
+        quantities = _order_quantities(order_id)
+        if quantities:
+            _apply_stock_delta(quantities, +1)
+            if _touches_zero(quantities, after_release=True):
+                transaction.on_commit(bump_catalog_version)
+    return True
+
+
+def commit_stock(order_id):
+    """Confirma la reserva: el stock queda descontado definitivamente y ya no vence."""
+    return StockReservation.objects.filter(
+        order_id=order_id, status=StockReservation.RESERVED
+    ).update(status=StockReservation.COMMITTED) > 0
+
+
+def sync_stock_with_status(order_id, status_name):
+    """Libera la reserva si la orden se canceló o la confirma si avanzó más allá del pago."""
+    if status_name == StateName.CANCELADO:
+        release_stock(order_id)
+    elif status_name not in UNPAID_STATES:
+        commit_stock(order_id)
+
+
+def expired_reservations(now):
+    return StockReservation.objects.filter(status=StockReservation.RESERVED, expires_at__lt=now)
+
+
+def release_expired_reservations(now=None):
+    """Libera las reservas vencidas y cancela sus órdenes impagas. Devuelve cuántas liberó."""
+    now = now or timezone.now()
+    expired_ids = list(expired_reservations(now).values_list('order_id', flat=True))
+    if not expired_ids:
+        return 0
+    cancelled = states.get(StateName.CANCELADO)
+    released = 0
+    for order_id in expired_ids:
+        with transaction.atomic():
+            if release_stock(order_id):
+                released += 1
+                order = Order.objects.get(pk=order_id)
+                order.status = cancelled
+                order.save()
+    return released
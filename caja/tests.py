@@ -1,3 +1,905 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+import io
+import json
+import os
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+import mercadopago
+from PIL import Image
+
+from django.core.cache import cache
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection
+from django.db.models import F, Sum
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import gateway, lookups
+from .benchmarks import BENCHMARKS, run_benchmarks
+from .catalog import get_menu_snapshot
+from .archive import archive_cutoff, archive_orders
+from .exports import export_queryset, iter_all_orders, iter_orders, ndjson_record
+from .events import ORDER_CREATED, STATUS_CHANGED, EventBroker, broker
+from .fake_gateway import FakeGateway
+from .instrumentation import QueryRecorder, request_metrics
+from .loadtest import LoadTest, ensure_load_users
+from .lookups import PaymentMethodName, PaymentStatusName, StateName, payment_methods, payment_statuses, states
+from .admin import ProductAdminForm
+from .models import (
+    ArchivedOrder, ArchivedPayment, Category, CustomUser, DailyPaymentSales, DailyProductSales, DailyStateSales,
+    MediaBlob, Order, OrderItem, OutboxEmail, Payment, Product, State, StockReservation, WebhookNotification,
+)
+from . import outbox
+from .query_plans import plan_problems
+from .rollups import rebuild_rollups
+from .scale_data import generate_dataset
+from .services import CartValidationError, OrderService, PaymentService
+from .stock import release_expired_reservations
+from .totals import reconcile_totals, suppress_amount_updates
+from .webhooks import drain
+
+
+class GuardarPedidoClienteTests(TestCase):
+    def setUp(self):
+        categoria = Category.objects.create(name='Principales')
+        self.pizza = Product.objects.create(name='Pizza', price=Decimal('1000.00'), stock=10, idCategoria=categoria)
+        self.birra = Product.objects.create(name='Porter', price=Decimal('500.00'), stock=2, idCategoria=categoria)
+        self.inactivo = Product.objects.create(name='Ceviche', price=Decimal('800.00'), stock=5, active=False)
+        self.url = reverse('caja:api_guardar_pedido_cliente')
+
+    def post(self, carrito):
+        payload = {'carrito': carrito, 'nombre': 'Ana', 'email': 'ana@example.com', 'table': 4}
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_crea_orden_con_items_y_total(self):
+        carrito = [
+            {'id': self.pizza.id, 'cantidad': 2, 'sugerency': 'sin aceitunas'},
+            {'id': self.birra.id, 'cantidad': 1},
+        ]
+        # Cantidad fija sin importar las líneas: productos, orden, items, descuento de stock
+        # (con su savepoint), reserva, chequeo de stock en cero, savepoints y un upsert
+        # por resumen diario (estado y productos).
+        # El estado inicial sale del registro de caja.lookups, ya cargado.
+        states.first()
+        with self.assertNumQueries(12):
+            response = self.post(carrito)
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(pk=response.json()['order_id'])
+        self.assertEqual(order.amount, Decimal('2500.00'))
+        self.assertEqual(order.order_items.count(), 2)
+        self.assertEqual(order.order_items.get(product=self.pizza).sugerency, 'sin aceitunas')
+        self.pizza.refresh_from_db()
+        self.assertEqual(self.pizza.stock, 8)
+
+    def test_errores_por_linea_sin_escrituras_parciales(self):
+        carrito = [
+            {'id': self.pizza.id, 'cantidad': 1},
+            {'id': 9999, 'cantidad': 1},
+            {'id': self.inactivo.id, 'cantidad': 1},
+            {'id': self.birra.id, 'cantidad': 3},
+        ]
+        response = self.post(carrito)
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual([e['line'] for e in errors], [1, 2, 3])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+
+class OrderTotalsTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Empanada', price=Decimal('300.00'), stock=50)
+        self.order = Order.objects.create(tableNumber=1)
+
+    def test_total_incremental_en_alta_cambio_y_baja(self):
+        item = OrderItem.objects.create(order=self.order, product=self.product, quantity=2)
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.amount, Decimal('900.00'))
+
+        item.quantity = 5
+        # update del item, update F() de la orden, día/estado de la orden y un upsert por resumen
+        with self.assertNumQueries(5):
+            item.save()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.amount, Decimal('1800.00'))
+
+        item.delete()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.amount, Decimal('300.00'))
+
+    def test_suppress_y_reconcile(self):
+        with suppress_amount_updates():
+            OrderItem.objects.create(order=self.order, product=self.product, quantity=3)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.amount, Decimal('0.00'))
+
+        self.assertEqual(reconcile_totals(), 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.amount, Decimal('900.00'))
+        self.assertEqual(reconcile_totals(), 0)
+
+
+class OrdersListPaginationTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(username='cajero', password='x', role='Empleado')
+        self.client.force_login(user)
+        product = Product.objects.create(name='Flan', price=Decimal('200.00'), stock=100)
+        for table in range(1, 6):
+            order = Order.objects.create(tableNumber=table, order_date=date(2025, 10, 1 + table % 2))
+            OrderItem.objects.create(order=order, product=product, quantity=table)
+        self.url = reverse('caja:api_orders_list_create')
+
+    def test_keyset_recorre_todas_las_ordenes_sin_repetir(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(self.url, params).json()
+            seen.extend(order['id'] for order in data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        expected = list(Order.objects.order_by('-order_date', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_fields_omite_items_y_no_consulta_items(self):
+        with self.assertNumQueries(3):  # sesión, usuario y la página de órdenes
+            data = self.client.get(self.url, {'fields': 'id,total'}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'total'})
+
+    def test_cursor_y_campos_invalidos(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'xxx'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'fields': 'id,password'}).status_code, 400)
+
+    def test_dashboard_toma_el_id_de_listo_del_registro(self):
+        response = self.client.get(reverse('caja:dashboard'))
+        self.assertContains(response, f"ready: {states.id_of(StateName.LISTO_PARA_ENTREGAR)}")
+        self.assertContains(response, f'<option value="{states.id_of(StateName.ENTREGADO)}">Entregado</option>')
+
+
+class OrderEventsTests(TestCase):
+    def test_publica_creacion_y_cambio_de_estado_al_commit(self):
+        start = broker.last_id
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(tableNumber=7)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()  # sin cambio de estado no hay evento
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status_id = 3
+            order.save()
+
+        async def collect():
+            subscriber, backlog, reset = broker.subscribe(start)
+            broker.unsubscribe(subscriber)
+            return backlog, reset
+
+        backlog, reset = asyncio.run(collect())
+        self.assertFalse(reset)
+        self.assertEqual([e['event'] for e in backlog], [ORDER_CREATED, STATUS_CHANGED])
+        self.assertEqual(backlog[1]['data']['status_id'], 3)
+
+    def test_last_event_id_desconocido_pide_reset(self):
+        local = EventBroker(buffer_size=2)
+        for n in range(4):
+            local.publish(STATUS_CHANGED, {'n': n})
+
+        async def subscribe(last_id):
+            subscriber, backlog, reset = local.subscribe(last_id)
+            local.unsubscribe(subscriber)
+            return [e['data']['n'] for e in backlog], reset
+
+        self.assertEqual(asyncio.run(subscribe(3)), ([3], False))
+        self.assertEqual(asyncio.run(subscribe(1)), ([], True))
+        self.assertEqual(asyncio.run(subscribe(99)), ([], True))
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Ribs', price=Decimal('4000.00'), stock=3)
+
+    def create_order(self, quantity):
+        return OrderService.create_client_order([{'id': self.product.id, 'cantidad': quantity}], 'Ana', 2)
+
+    def test_cancelar_devuelve_stock_una_sola_vez(self):
+        order = self.create_order(2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 1)
+
+        order.status = State.objects.get(name='Cancelado')
+        order.save()
+        order.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+        self.assertEqual(StockReservation.objects.get(order=order).status, StockReservation.RELEASED)
+
+    def test_reserva_vencida_se_libera_y_cancela_la_orden(self):
+        order = self.create_order(3)
+        self.assertEqual(release_expired_reservations(), 0)
+        self.assertEqual(release_expired_reservations(now=timezone.now() + timedelta(hours=1)), 1)
+        order.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(order.status.name, 'Cancelado')
+        self.assertEqual(self.product.stock, 3)
+
+    def test_pago_confirma_la_reserva(self):
+        order = self.create_order(1)
+        order.status = State.objects.get(name='En Preparación')
+        order.save()
+        self.assertEqual(release_expired_reservations(now=timezone.now() + timedelta(hours=1)), 0)
+        self.assertEqual(StockReservation.objects.get(order=order).status, StockReservation.COMMITTED)
+
+
+class StockOversellTests(TransactionTestCase):
+    """Muchos pedidos en paralelo contra el mismo stock: nunca se vende de más."""
+
+    workers = 8
+    attempts = 24
+    initial_stock = 10
+
+    def setUp(self):
+        call_command('loaddata', 'default_data.json', verbosity=0)
+        self.product = Product.objects.create(name='Cerveza', price=Decimal('1500.00'), stock=self.initial_stock)
+
+    def place_order(self, _):
+        try:
+            for _ in range(20):
+                try:
+                    OrderService.create_client_order([{'id': self.product.id, 'cantidad': 1}], 'Mesa', 1)
+                    return 'ok'
+                except CartValidationError:
+                    return 'sin_stock'
+                except OperationalError:
+                    time.sleep(0.01)  # "database is locked": se reintenta como haría el cliente
+            return 'bloqueado'
+        finally:
+            connection.close()
+
+    def test_no_oversell_con_pedidos_en_paralelo(self):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(self.place_order, range(self.attempts)))
+        self.product.refresh_from_db()
+        sold = results.count('ok')
+        # Ni de más ni de menos: todo el stock se vende y el resto se rechaza por falta de stock
+        self.assertNotIn('bloqueado', results)
+        self.assertEqual(sold, self.initial_stock)
+        self.assertEqual(results.count('sin_stock'), self.attempts - self.initial_stock)
+        self.assertEqual(self.product.stock, 0)
+        self.assertEqual(OrderItem.objects.filter(product=self.product).count(), sold)
+
+
+class StubPaymentAPI:
+    def __init__(self, payments, fail_times=0):
+        self.payments = payments
+        self.fail_times = fail_times
+        self.calls = 0
+
+    def get(self, payment_id):
+        self.calls += 1
+        if self.calls <= self.fail_times:
+            raise ConnectionError("gateway timeout")
+        return {"status": 200, "response": self.payments[str(payment_id)]}
+
+
+class StubSDK:
+    def __init__(self, payment_api):
+        self.payment_api = payment_api
+
+    def payment(self):
+        return self.payment_api
+
+
+class WebhookQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.order = Order.objects.create(tableNumber=3, amount=Decimal('1200.00'))
+        self.api = StubPaymentAPI({'555': {'status': 'approved', 'external_reference': str(self.order.id)}})
+        patcher = mock.patch.object(PaymentService, 'get_sdk', return_value=StubSDK(self.api))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse('caja:mercadopago_webhook')
+
+    def notify(self):
+        payload = {'type': 'payment', 'data': {'id': '555'}}
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_webhook_encola_sin_llamar_a_la_pasarela(self):
+        self.assertEqual(self.notify().status_code, 200)
+        self.assertEqual(self.api.calls, 0)
+        notification = WebhookNotification.objects.get()
+        self.assertEqual((notification.topic, notification.resource_id), ('payment', '555'))
+
+    def test_worker_agrupa_duplicados_del_lote(self):
+        self.notify()
+        self.notify()
+        self.assertEqual(drain(workers=1), {'done': 1})
+        self.assertEqual(self.api.calls, 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status.name, 'En Preparación')
+        self.assertEqual(WebhookNotification.objects.filter(status=WebhookNotification.DONE).count(), 2)
+
+    def test_reintento_con_backoff(self):
+        self.api.fail_times = 1
+        self.notify()
+        with self.assertLogs('caja.webhooks', 'WARNING'):
+            self.assertEqual(drain(workers=1), {'retry': 1})
+        notification = WebhookNotification.objects.get()
+        self.assertEqual(notification.status, WebhookNotification.PENDING)
+        self.assertEqual(notification.attempts, 1)
+        self.assertGreater(notification.next_attempt_at, timezone.now())
+
+        WebhookNotification.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(drain(workers=1), {'done': 1})
+
+    def test_orden_inexistente_falla_sin_reintentos(self):
+        self.api.payments['555']['external_reference'] = '999999'
+        self.notify()
+        with self.assertLogs('caja.webhooks', 'WARNING'):
+            self.assertEqual(drain(workers=1), {'failed': 1})
+        notification = WebhookNotification.objects.get()
+        self.assertEqual(notification.status, WebhookNotification.FAILED)
+        self.assertEqual(notification.attempts, 1)
+
+    def test_notificaciones_repetidas_no_duplican_pagos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = PaymentService.process_payment_result('555', 'success', self.order.id)
+        self.assertTrue(result['success'])
+        self.notify()
+        drain(workers=1)
+        self.notify()
+        with self.assertNumQueries(6):  # solo la cola (tomar, marcar, volver a mirar); nada de Payment ni Order
+            drain(workers=1)
+        self.assertEqual(self.api.calls, 1)
+        self.assertEqual(Payment.objects.filter(idOrder=self.order, token='555').count(), 1)
+
+    def test_cambio_de_estado_actualiza_el_mismo_pago(self):
+        self.api.payments['555']['status'] = 'in_process'
+        PaymentService.process_webhook_payment('555')
+        self.api.payments['555']['status'] = 'approved'
+        PaymentService.process_webhook_payment('555')
+        payment = Payment.objects.get(idOrder=self.order, token='555')
+        self.assertEqual(payment.idPaymentStatus.name, 'Aprobado')
+
+
+class GatewayClientTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.fake = FakeGateway().start()
+        self.addCleanup(self.fake.stop)
+        self.now = [0.0]
+        self.breaker = gateway.CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: self.now[0])
+        self.client_http = gateway.PooledHttpClient(base_url=self.fake.base_url, breaker=self.breaker, max_retries=0)
+        self.addCleanup(self.client_http.close)
+        self.sdk = mercadopago.SDK('TEST-token', http_client=self.client_http)
+
+    def test_reutiliza_la_conexion_y_registra_metricas(self):
+        order = Order.objects.create(tableNumber=1, amount=Decimal('900.00'))
+        self.fake.add_payment('77', status='approved', external_reference=str(order.id))
+        with mock.patch.object(PaymentService, 'get_sdk', return_value=self.sdk):
+            for _ in range(3):
+                self.assertEqual(PaymentService.fetch_payment('77')['status'], 'approved')
+            preference = PaymentService.create_payment_preference(order.id, 'http://testserver/pago/')
+        self.assertTrue(preference['success'])
+        self.assertEqual(self.fake.connections, 1)
+        metrics = self.client_http.metrics.snapshot()
+        self.assertEqual(metrics['payment.get']['count'], 3)
+        self.assertEqual(metrics['preference.create']['outcomes'], {'201': 1})
+
+    def test_preferencia_se_reutiliza_mientras_no_cambie_el_total(self):
+        order = Order.objects.create(tableNumber=1, amount=Decimal('900.00'))
+        with mock.patch.object(PaymentService, 'get_sdk', return_value=self.sdk):
+            first = PaymentService.create_payment_preference(order.id, 'http://testserver/pago/')
+            again = PaymentService.create_payment_preference(order.id, 'http://testserver/pago/')
+            self.assertEqual(first, again)
+            self.assertEqual(len(self.fake.preferences), 1)
+
+            Order.objects.filter(pk=order.pk).update(amount=Decimal('1500.00'))
+            changed = PaymentService.create_payment_preference(order.id, 'http://testserver/pago/')
+        self.assertNotEqual(changed['payment_id'], first['payment_id'])
+        self.assertEqual(self.fake.preferences[changed['payment_id']]['items'][0]['unit_price'], 1500.0)
+
+    def test_circuit_breaker_abre_y_prueba_en_semiabierto(self):
+        self.fake.add_payment('77')
+        self.fake.fail_next = 2
+        for _ in range(2):
+            self.assertEqual(self.sdk.payment().get('77')['status'], 503)
+        self.assertEqual(self.breaker.state, gateway.CircuitBreaker.OPEN)
+        with self.assertRaises(gateway.GatewayUnavailable):
+            self.sdk.payment().get('77')
+        self.assertEqual(self.fake.requests, 2)
+
+        self.now[0] += 31
+        self.assertEqual(self.breaker.state, gateway.CircuitBreaker.HALF_OPEN)
+        self.assertEqual(self.sdk.payment().get('77')['status'], 200)
+        self.assertEqual(self.breaker.state, gateway.CircuitBreaker.CLOSED)
+
+
+class DatabaseTuningTests(TestCase):
+    def test_conexion_aplica_pragmas_y_begin_immediate(self):
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -20000)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        request_metrics.reset()
+        self.staff = CustomUser.objects.create_user(username='admin', password='x', role='Administrador', is_staff=True)
+
+    def test_server_timing_y_percentiles_por_url(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('caja:api_orders_list_create'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ consultas", app;dur=')
+
+        metrics = self.client.get(reverse('caja:api_request_metrics')).json()['requests']
+        listado = metrics['caja:api_orders_list_create']
+        self.assertEqual(listado['requests'], 1)
+        self.assertEqual(set(listado['total_ms']), {'p50', 'p95', 'p99'})
+        self.assertGreater(listado['queries']['p50'], 0)
+
+    def test_endpoint_solo_para_staff(self):
+        cajero = CustomUser.objects.create_user(username='cajero', password='x', role='Empleado')
+        self.client.force_login(cajero)
+        self.assertEqual(self.client.get(reverse('caja:api_request_metrics')).status_code, 403)
+
+    def test_detecta_consultas_repetidas(self):
+        orders = [Order.objects.create(tableNumber=n, amount=Decimal('10.00')) for n in range(4)]
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for order in Order.objects.filter(pk__in=[o.pk for o in orders]):
+                order.status.name
+        self.assertEqual(list(recorder.duplicates().values()), [4])
+
+
+class QueryPlanTests(TestCase):
+    def test_consultas_calientes_usan_indices(self):
+        call_command('check_query_plans', stdout=io.StringIO())
+
+    def test_detecta_recorrido_completo(self):
+        plan = Order.objects.filter(customer_name='Ana').order_by('amount').explain()
+        self.assertEqual(len(plan_problems(plan)), 2)
+
+
+class MediaTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = media_root.name
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, PRODUCT_IMAGE_VARIANTS_ASYNC=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+    def jpeg_upload(self, size=(800, 600), color='red'):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color).save(buffer, format='JPEG')
+        return SimpleUploadedFile('plato.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+class ProductImageVariantsTests(MediaTestCase):
+    def test_genera_variantes_al_guardar_y_las_expone_en_el_menu(self):
+        categoria = Category.objects.create(name='Principales')
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name='Pizza', price=Decimal('10.00'), stock=5,
+                                             idCategoria=categoria, image=self.jpeg_upload())
+        product.refresh_from_db()
+        variants = product.image_variants
+        self.assertEqual([w for w, _ in variants['webp']], [320, 640])
+        for _, name in variants['webp'] + variants['jpeg']:
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, name)))
+        self.assertIn(variants['digest'], variants['jpeg'][0][1])
+
+        _, menu = get_menu_snapshot()
+        producto = menu[0][1][0]
+        self.assertIn('-320.webp 320w', producto['image_srcset_webp'])
+        self.assertTrue(producto['image_url'].endswith('-640.jpg'))
+
+        # Guardar sin cambiar la imagen no vuelve a procesarla
+        with mock.patch('caja.signals.schedule_variants') as schedule, self.captureOnCommitCallbacks(execute=True):
+            product.price = Decimal('12.00')
+            product.save()
+        schedule.assert_not_called()
+
+    def test_backfill_de_imagenes_existentes(self):
+        product = Product.objects.create(name='Flan', price=Decimal('5.00'), image=self.jpeg_upload((200, 150)))
+        self.assertEqual(product.image_variants, {})
+        call_command('generate_image_variants', stdout=io.StringIO())
+        product.refresh_from_db()
+        self.assertEqual([w for w, _ in product.image_variants['jpeg']], [200])
+
+
+class MediaStoreTests(MediaTestCase):
+    def test_mismo_contenido_se_guarda_una_vez(self):
+        a = Product.objects.create(name='Pizza', price=Decimal('10.00'), image=self.jpeg_upload())
+        upload = self.jpeg_upload()
+        upload.name = 'otra_foto.jpg'
+        b = Product.objects.create(name='Fugazza', price=Decimal('10.00'), image=upload)
+        self.assertEqual(a.image.name, b.image.name)
+        blob = MediaBlob.objects.get()
+        self.assertEqual(blob.name, a.image.name)
+        self.assertEqual(blob.original_name, 'plato.jpg')
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'products')), [os.path.basename(blob.name)])
+
+    def test_selector_de_imagenes_usa_el_indice(self):
+        os.makedirs(os.path.join(self.media_root, 'products'))
+        for filename in ('pizza.jpg', 'copia_pizza.jpg'):
+            with open(os.path.join(self.media_root, 'products', filename), 'wb') as f:
+                f.write(self.jpeg_upload().read())
+        copia = Product.objects.create(name='Pizza', price=Decimal('10.00'), image='products/pizza.jpg')
+        call_command('index_media', '--dedupe', stdout=io.StringIO())
+        copia.refresh_from_db()
+        self.assertEqual(copia.image.name, 'products/copia_pizza.jpg')
+
+        with mock.patch('os.listdir', side_effect=AssertionError('no debe listar la carpeta')):
+            with self.assertNumQueries(1):
+                form = ProductAdminForm()
+        self.assertEqual(form.fields['existing_image'].choices, [('', '---'), ('products/copia_pizza.jpg', 'copia_pizza.jpg')])
+
+
+class EmailOutboxTests(TestCase):
+    def contacto(self, nombre):
+        return self.client.post(reverse('cliente:enviar_contacto', args=[3]), {
+            'nombre': nombre, 'email': f'{nombre}@example.com', 'motivo': 'Reserva',
+            'mensaje': 'Hola', 'acepta_politica': 'on',
+        })
+
+    def test_formulario_encola_y_el_worker_envia_por_una_conexion(self):
+        for nombre in ('ana', 'beto', 'caro'):
+            self.assertTrue(self.contacto(nombre).json()['success'])
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.PENDING).count(), 3)
+
+        with mock.patch('caja.outbox.get_connection', wraps=outbox.get_connection) as get_connection:
+            self.assertEqual(outbox.drain(workers=1), {'sent': 3, 'retry': 0})
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual([m.reply_to for m in mail.outbox], [['ana@example.com'], ['beto@example.com'], ['caro@example.com']])
+        self.assertFalse(OutboxEmail.objects.exclude(status=OutboxEmail.SENT).exists())
+
+    def test_reintento_con_backoff(self):
+        outbox.enqueue_email('Hola', 'cuerpo', ['cocina@example.com'])
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('SMTP caído')):
+            with self.assertLogs('caja.outbox', 'WARNING'):
+                self.assertEqual(outbox.drain(workers=1), {'sent': 0, 'retry': 1})
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts, email.last_error), (OutboxEmail.PENDING, 1, 'SMTP caído'))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.drain(workers=2), {'sent': 1, 'retry': 0})
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        self.pizza = Product.objects.create(name='Pizza', price=Decimal('1000.00'), stock=50)
+        self.birra = Product.objects.create(name='Porter', price=Decimal('500.00'), stock=50)
+        self.today = timezone.localdate()
+
+    def snapshot(self):
+        # Filas con algo, como las ve el reporte (los deltas pueden dejar filas en cero)
+        return {
+            'products': sorted(
+                DailyProductSales.objects.exclude(quantity=0, revenue=0).values_list('day', 'product_id', 'quantity', 'revenue')
+            ),
+            'states': sorted(
+                DailyStateSales.objects.exclude(orders=0, amount=0).values_list('day', 'state_id', 'orders', 'amount')
+            ),
+            'payments': sorted(
+                DailyPaymentSales.objects.exclude(payments=0, amount=0).values_list(
+                    'day', 'payment_method_id', 'payment_status_id', 'payments', 'amount'
+                )
+            ),
+        }
+
+    def test_deltas_coinciden_con_la_reconstruccion(self):
+        first = OrderService.create_client_order([
+            {'id': self.pizza.id, 'cantidad': 2}, {'id': self.birra.id, 'cantidad': 1},
+        ], 'Ana', 1)
+        second = OrderService.create_client_order([{'id': self.birra.id, 'cantidad': 3}], 'Beto', 2)
+        pendiente = states.get(StateName.PENDIENTE).id
+        self.assertEqual(
+            DailyStateSales.objects.get(day=first.order_date, state_id=pendiente).amount, Decimal('4000.00')
+        )
+        self.assertEqual(DailyProductSales.objects.get(day=first.order_date, product=self.birra).quantity, 4)
+
+        # Cambio de item, cancelación, pago aprobado y borrado de un item
+        item = first.order_items.get(product=self.pizza)
+        item.quantity = 4
+        item.save()
+        second.status = states.get(StateName.CANCELADO)
+        second.save()
+        payment = Payment.objects.create(
+            idOrder=first, idPaymentMethod=payment_methods.get(PaymentMethodName.EFECTIVO), amount=Decimal('4500.00'),
+            idPaymentStatus=payment_statuses.get(PaymentStatusName.PENDIENTE), token='efectivo-1',
+        )
+        payment.idPaymentStatus = payment_statuses.get(PaymentStatusName.APROBADO)
+        payment.save(update_fields=['idPaymentStatus'])
+        first.order_items.get(product=self.birra).delete()
+
+        incremental = self.snapshot()
+        self.assertEqual(incremental['products'], [(first.order_date, self.pizza.id, 4, Decimal('4000.00'))])
+        self.assertEqual(incremental['payments'], [
+            (self.today, payment.idPaymentMethod_id, payment.idPaymentStatus_id, 1, Decimal('4500.00')),
+        ])
+        rebuild_rollups()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_borrar_pedido_recalcula_el_dia(self):
+        order = OrderService.create_client_order([{'id': self.pizza.id, 'cantidad': 1}], 'Ana', 1)
+        order.delete()
+        self.assertEqual(self.snapshot(), {'products': [], 'states': [], 'payments': []})
+
+    def test_reporte_lee_los_resumenes(self):
+        user = CustomUser.objects.create_user(username='admin', password='x', role='Administrador')
+        self.client.force_login(user)
+        OrderService.create_client_order([{'id': self.pizza.id, 'cantidad': 2}], 'Ana', 1)
+        url = reverse('caja:api_daily_sales_report')
+        states.first(), payment_methods.first(), payment_statuses.first()
+
+        with self.assertNumQueries(6):  # sesión, usuario, tres resúmenes y nombres de productos
+            data = self.client.get(url).json()
+        self.assertEqual(len(data['days']), 1)
+        day = data['days'][0]
+        self.assertEqual((day['orders'], day['revenue']), (1, 2000.0))
+        self.assertEqual(day['products'], [{'product_id': self.pizza.id, 'name': 'Pizza', 'quantity': 2, 'revenue': 2000.0}])
+
+        self.assertEqual(self.client.get(url, {'from': '2025-01-01', 'to': '2026-12-31'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'from': 'ayer'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'from': '2026-02-30'}).status_code, 400)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(username='contador', password='x', role='Administrador')
+        self.client.force_login(user)
+        self.pizza = Product.objects.create(name='Pizza', price=Decimal('1000.00'), stock=100)
+        self.orders = []
+        for n in range(5):
+            order = Order.objects.create(tableNumber=n + 1, customer_name=f'Mesa {n + 1}', order_date=date(2025, 3, 1 + n))
+            OrderItem.objects.create(order=order, product=self.pizza, quantity=n + 1)
+            self.orders.append(order)
+        Payment.objects.create(
+            idOrder=self.orders[0], idPaymentMethod=payment_methods.get(PaymentMethodName.EFECTIVO), amount=Decimal('1000.00'),
+            idPaymentStatus=payment_statuses.get(PaymentStatusName.APROBADO), token='efectivo-1',
+        )
+        self.url = reverse('caja:api_export_orders')
+
+    def test_lotes_de_consultas_sin_n_mas_uno(self):
+        states.first(), payment_methods.first(), payment_statuses.first()
+        with self.assertNumQueries(1 + 2 * 3):  # pedidos + items y pagos por cada lote de 2
+            rows = list(iter_orders(export_queryset(), chunk_size=2))
+        self.assertEqual([row['id'] for row in rows], [order.id for order in self.orders])
+        self.assertEqual(rows[0]['payments'][0]['amount'], Decimal('1000.00'))
+
+    def test_ndjson_en_streaming_con_filtros(self):
+        response = self.client.get(self.url, {'format': 'ndjson', 'from': '2025-03-02', 'to': '2025-03-04'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([r['id'] for r in records], [order.id for order in self.orders[1:4]])
+        self.assertEqual(records[0]['items'], [{
+            'product_id': self.pizza.id, 'product_name': 'Pizza', 'quantity': 2,
+            'price': '1000.00', 'subtotal': '2000.00', 'sugerency': '',
+        }])
+
+        cancelado = states.get(StateName.CANCELADO)
+        self.orders[2].status = cancelado
+        self.orders[2].save()
+        response = self.client.get(self.url, {'format': 'ndjson', 'state': cancelado.id})
+        self.assertEqual([json.loads(line)['id'] for line in b''.join(response.streaming_content).splitlines()], [self.orders[2].id])
+        self.assertEqual(self.client.get(self.url, {'state': 99}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'from': '2026-02-30'}).status_code, 400)
+
+    def test_csv_gzip_y_comando(self):
+        response = self.client.get(self.url, {'format': 'csv', 'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.csv.gz', response['Content-Disposition'])
+        text = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8-sig')
+        rows = list(csv.DictReader(io.StringIO(text)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual((rows[0]['paid_total'], rows[0]['payment_methods']), ('1000.00', 'Efectivo'))
+        self.assertEqual((rows[4]['quantity'], rows[4]['subtotal']), ('5', '5000.00'))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'pedidos.csv.gz')
+            call_command('export_orders', gzip=True, output=path, chunk_size=2, stderr=io.StringIO())
+            with gzip.open(path, 'rt', encoding='utf-8-sig', newline='') as exported:
+                self.assertEqual(exported.read(), text)
+        with self.assertRaises(CommandError):
+            call_command('export_orders', since='2026-02-30')
+
+
+class OrderArchiveTests(TestCase):
+    def setUp(self):
+        self.pizza = Product.objects.create(name='Pizza', price=Decimal('1000.00'), stock=100)
+        self.flan = Product.objects.create(name='Flan', price=Decimal('500.00'), stock=100)
+        old = timezone.localdate() - timedelta(days=200)
+        self.entregado, self.cancelado, self.pendiente, self.reciente = [
+            self.create_order(table, order_date, state)
+            for table, order_date, state in (
+                (1, old, StateName.ENTREGADO), (2, old, StateName.CANCELADO),
+                (3, old, StateName.PENDIENTE), (4, timezone.localdate(), StateName.ENTREGADO),
+            )
+        ]
+        OrderItem.objects.create(order=self.entregado, product=self.flan, quantity=1)
+        Payment.objects.create(
+            idOrder=self.entregado, idPaymentMethod=payment_methods.get(PaymentMethodName.EFECTIVO),
+            amount=Decimal('3500.00'), idPaymentStatus=payment_statuses.get(PaymentStatusName.APROBADO), token='arch-1',
+        )
+
+    def create_order(self, table, order_date, state):
+        order = Order.objects.create(tableNumber=table, customer_name=f'Mesa {table}', order_date=order_date)
+        OrderItem.objects.create(order=order, product=self.pizza, quantity=3)
+        order = Order.objects.get(pk=order.pk)  # con el total ya actualizado por el item
+        order.status = states.get(state)
+        order.save()
+        return order
+
+    def rollups(self):
+        return (
+            sorted(DailyProductSales.objects.exclude(quantity=0).values_list('day', 'product_id', 'quantity', 'revenue')),
+            sorted(DailyStateSales.objects.exclude(orders=0).values_list('day', 'state_id', 'orders', 'amount')),
+            sorted(DailyPaymentSales.objects.exclude(payments=0).values_list(
+                'day', 'payment_method_id', 'payment_status_id', 'payments', 'amount'
+            )),
+        )
+
+    def test_mueve_pedidos_cerrados_sin_cambiar_resumenes(self):
+        before = self.rollups()
+        totals = archive_orders(archive_cutoff(90), batch_size=1)
+        self.assertEqual(totals, {'orders': 2, 'items': 3, 'payments': 1})
+        self.assertEqual(set(Order.objects.values_list('id', flat=True)), {self.pendiente.id, self.reciente.id})
+        self.assertEqual(
+            set(ArchivedOrder.objects.values_list('id', flat=True)), {self.entregado.id, self.cancelado.id}
+        )
+        self.assertFalse(OrderItem.objects.filter(order_id__in=[self.entregado.id, self.cancelado.id]).exists())
+        self.assertEqual(ArchivedOrder.objects.get(id=self.entregado.id).amount, Decimal('3500.00'))
+        self.assertEqual(ArchivedPayment.objects.get().idOrder_id, self.entregado.id)
+
+        # Archivar no cambia los resúmenes, ni al mover ni al reconstruir desde los datos
+        self.assertEqual(self.rollups(), before)
+        rebuild_rollups()
+        self.assertEqual(self.rollups(), before)
+        self.assertEqual(archive_orders(archive_cutoff(90)), {'orders': 0, 'items': 0, 'payments': 0})
+
+    def test_archivo_en_exportacion_y_admin_solo_lectura(self):
+        archive_orders(archive_cutoff(90))
+        self.pizza.delete()
+
+        rows = list(iter_all_orders(chunk_size=1))
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [self.entregado.id, self.cancelado.id, self.pendiente.id, self.reciente.id],
+        )
+        self.assertEqual([item['name'] for item in rows[0]['items']], ['Pizza', 'Flan'])
+        self.assertEqual(ndjson_record(rows[0])['payments'][0]['amount'], '3500.00')
+
+        admin_user = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.client.force_login(admin_user)
+        self.assertEqual(self.client.get(reverse('admin:caja_archivedorder_changelist')).status_code, 200)
+        change_url = reverse('admin:caja_archivedorder_change', args=[self.entregado.id])
+        response = self.client.get(change_url)
+        self.assertContains(response, 'Flan')
+        self.assertNotContains(response, 'name="_save"')
+        self.assertEqual(self.client.get(reverse('admin:caja_archivedorder_add')).status_code, 403)
+
+
+class ScaleDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def generate(self, orders=60):
+        return generate_dataset(orders, items_per_order=3, products=15, categories=3, days=5, seed=2, batch_size=25)
+
+    def test_genera_pedidos_consistentes(self):
+        created = self.generate()
+        self.assertEqual(created['orders'], 60)
+        self.assertEqual(OrderItem.objects.count(), created['items'])
+        self.assertEqual(Payment.objects.count(), created['payments'])
+
+        totals = Order.objects.annotate(items_total=Sum('order_items__subtotal'))
+        self.assertFalse(totals.exclude(amount=F('items_total')).exists())
+        self.assertFalse(Order.objects.exclude(endTime=F('initialTime')).exists())
+        self.assertFalse(Payment.objects.exclude(payment_date=F('idOrder__initialTime')).exists())
+        self.assertEqual(DailyStateSales.objects.aggregate(n=Sum('orders'))['n'], 60)
+
+        # Una segunda tanda reutiliza el catálogo sintético
+        self.generate(orders=10)
+        self.assertEqual(Order.objects.count(), 70)
+        self.assertEqual(Product.objects.filter(name__startswith='Producto escala ').count(), 15)
+
+    def test_benchmarks_responden_con_los_datos_generados(self):
+        self.generate()
+        results = run_benchmarks(repeat=1, warmup=0)
+        self.assertEqual(set(results), set(BENCHMARKS))
+        self.assertEqual({name: r['status'] for name, r in results.items() if r['status'] != 200}, {})
+        self.assertGreater(results['caja.orders_list']['queries'], 0)
+        self.assertEqual(results['cliente.menu.cached']['queries'], 0)
+
+
+class LoadTestHarnessTests(LiveServerTestCase):
+    """El generador de carga contra un live server: recorridos completos sin errores."""
+
+    def setUp(self):
+        call_command('loaddata', 'default_data.json', verbosity=0)
+        cache.clear()
+        categoria = Category.objects.create(name='Principales')
+        for name in ('Pizza', 'Empanada', 'Flan'):
+            Product.objects.create(name=name, price=Decimal('1000.00'), stock=100, idCategoria=categoria)
+        ensure_load_users()
+        self.fake = FakeGateway().start()
+        self.addCleanup(self.fake.stop)
+        settings_override = override_settings(MERCADO_PAGO_API_BASE_URL=self.fake.base_url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        gateway.reset()
+        self.addCleanup(gateway.reset)
+
+    # Con SQLite en memoria el live server comparte una única conexión entre sus hilos,
+    # así que cada corrida usa un solo usuario virtual para no mezclar transacciones.
+    def test_recorrido_de_mesa_sin_errores(self):
+        report = LoadTest(
+            self.live_server_url, diners=1, kitchens=0, cashiers=0, duration=60, iterations=3, think=0, seed=7,
+        ).run()
+        self.assertEqual(report['journeys'], {'completed': 3, 'failed': 0})
+        self.assertEqual({step: data['errors'] for step, data in report['steps'].items() if data['errors']}, {})
+        self.assertEqual(
+            set(report['steps']), {'cliente.index', 'cliente.menu', 'caja.guardar_pedido', 'caja.crear_pago'}
+        )
+        self.assertEqual(report['steps']['caja.crear_pago']['count'], 3)
+        self.assertEqual(len(self.fake.preferences), 3)
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_cocina_y_caja_consultan_hasta_el_final(self):
+        for kitchens, cashiers, steps in (
+            (1, 0, {'cocina.dashboard', 'cocina.delta'}),
+            (0, 1, {'caja.dashboard', 'caja.session_status', 'caja.pedidos'}),
+        ):
+            with self.subTest(kitchens=kitchens, cashiers=cashiers):
+                report = LoadTest(
+                    self.live_server_url, diners=0, kitchens=kitchens, cashiers=cashiers, duration=0.3,
+                    poll_interval=0.05, seed=7,
+                ).run()
+                self.assertEqual({step: data['errors'] for step, data in report['steps'].items() if data['errors']}, {})
+                self.assertEqual(set(report['steps']), {'caja.login_page', 'caja.login'} | steps)
+
+    def test_sin_duracion_exige_mesas_con_iteraciones(self):
+        with self.assertRaises(CommandError):
+            call_command('load_test', diners=0, duration=0, base_url=self.live_server_url)
+
+
+class LookupRegistryTests(TestCase):
+    def setUp(self):
+        # El registro es del proceso y no vuelve atrás con el rollback del test:
+        # sin esto 'Devuelto' quedaría cacheado para los tests siguientes
+        self.addCleanup(lookups.invalidate)
+
+    def test_resuelve_sin_consultas_y_se_invalida_al_guardar(self):
+        lookups.invalidate()
+        states.get(StateName.PENDIENTE)
+        payment_statuses.get(PaymentStatusName.PENDIENTE)
+        with self.assertNumQueries(0):
+            cancelado = states.get(StateName.CANCELADO)
+            self.assertEqual(states.get_by_id(cancelado.id).name, 'Cancelado')
+            self.assertEqual(payment_statuses.get(PaymentStatusName.APROBADO).name, 'Aprobado')
+        with self.assertRaises(State.DoesNotExist):
+            states.get('Inexistente')
+
+        nuevo = State.objects.create(name='Devuelto')
+        self.assertEqual(states.id_of('Devuelto'), nuevo.id)
@@ -0,0 +1,80 @@
+"""
+Mantenimiento incremental de Order.amount.
+
+Cada alta, cambio o baja de un OrderItem aplica solo la diferencia de su
+subtotal con un UPDATE ... SET amount = amount + delta, sin recorrer los
+demás items de la orden. Los caminos masivos pueden suspender el ajuste con
+`suppress_amount_updates()` y recalcular al final con `reconcile_totals()`.
+"""
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Order, OrderItem
+
+_state = threading.local()
+
+ZERO = Decimal('0.00')
+
+
+def amount_updates_suppressed():
+    return getattr(_state, 'suppressed', 0) > 0
+
+
+@contextmanager
+def suppress_amount_updates():
+    """Suspende el ajuste incremental de totales en el hilo actual (admite anidarse)."""
+    _state.suppressed = getattr(_state, 'suppressed', 0) + 1
+    try:
+        yield
+    finally:
+        _state.suppressed -= 1
+
+
+def apply_amount_delta(order_id, delta):
+    """Suma `delta` al total de la orden directamente en la base de datos."""
+    if not order_id or not delta:
+        return
+    Order.objects.filter(pk=order_id).update(amount=F('amount') + delta, endTime=timezone.now())
+
+
+def _items_total_subquery():
+    items_total = (
+        OrderItem.objects.filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(total=Sum('subtotal'))
+        .values('total')
+    )
+    return Coalesce(
+        Subquery(items_total),
+        Value(ZERO),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def find_drifted_orders(queryset=None):
+    """Órdenes cuyo total guardado no coincide con la suma de sus items (una sola consulta)."""
+    if queryset is None:
+        queryset = Order.objects.all()
+    return (
+        queryset.annotate(items_total=_items_total_subquery())
+        .exclude(amount=F('items_total'))
+        .values_list('id', 'amount', 'items_total')
+    )
+
+
+def reconcile_totals(queryset=None):
+    """
+    Recalcula Order.amount a partir de los items con un único UPDATE agregado.
+    Devuelve la cantidad de órdenes que estaban desfasadas.
+    """
+    if queryset is None:
+        queryset = Order.objects.all()
+    drifted_ids = [order_id for order_id, _, _ in find_drifted_orders(queryset)]
+    if drifted_ids:
+        Order.objects.filter(pk__in=drifted_ids).update(amount=_items_total_subquery())
+    return len(drifted_ids)
@@ -2,6 +2,7 @@ from django.urls import path
 from django.conf import settings
 from django.conf.urls.static import static
 from . import views
+from . import events
 
 app_name = 'caja'
 
@@ -19,6 +20,10 @@ urlpatterns = [
     # Orders API
     path('api/orders/', views.api_orders_list_create, name='api_orders_list_create'), # GET para listar, POST para crear (si aplica)
     path('api/orders/<int:order_id>/', views.api_order_detail_update_delete, name='api_order_detail_update_delete'), # GET detalle, PUT update status, DELETE cancel
+    path('api/events/', events.order_events_stream, name='api_order_events'), # Stream SSE de cambios de pedidos (requiere ASGI)
+    path('api/metrics/', views.api_request_metrics, name='api_request_metrics'), # Consultas y latencias por URL (staff)
+    path('api/export/orders/', views.api_export_orders, name='api_export_orders'), # CSV/NDJSON en streaming (admin)
+    path('api/reports/daily/', views.api_daily_sales_report, name='api_daily_sales_report'), # Ventas por día desde los resúmenes
 
     # Products API (Admin/Superuser)
     path('api/admin/products/', views.api_products_list_create, name='api_products_list_create'),
@@ -11,9 +11,17 @@ from django.utils import timezone
 from django.db import IntegrityError
 import json
 import re
+from datetime import timedelta
 from decimal import Decimal
 
-from .services import PaymentService
+from .services import PaymentService, OrderService, CartValidationError
+from .pagination import InvalidCursor, keyset_page, parse_page_size
+from .webhooks import enqueue_notification, parse_notification
+from .lookups import StateName, states
+from .exports import FORMATS, export_chunks, iter_all_orders, streaming_response
+from .instrumentation import request_metrics
+from .rollups import daily_report
+from . import gateway
 import json
 
 from .models import CustomUser, Product, Order, OrderItem, State
@@ -115,10 +123,17 @@ def dashboard_view(request):
         'products': role in ['Administrador', 'Super Usuario'],
         'users': role in ['Super Usuario'],
     }
+    try:
+        ready_state_id = states.id_of(StateName.LISTO_PARA_ENTREGAR)
+    except State.DoesNotExist:
+        ready_state_id = None
     return render(request, 'caja/admin_dashboard.html', {
         'user': request.user,
         'sections': sections,
-        'role': role
+        'role': role,
+        # Los ids salen del registro de estados: el JS no los adivina
+        'order_states': states.all(),
+        'ready_state_id': ready_state_id,
     })
 
 
@@ -133,13 +148,138 @@ def api_session_status(request):
     })
 
 
+@login_required(login_url='caja:login')
+def api_request_metrics(request):
+    """Percentiles de tiempo y consultas por URL de este proceso (solo staff)."""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Forbidden: Insufficient permissions'}, status=403)
+    if request.method == 'DELETE':
+        request_metrics.reset()
+        return JsonResponse({'message': 'Métricas reiniciadas'})
+    return JsonResponse({
+        'requests': request_metrics.snapshot(),
+        'gateway': gateway.metrics_snapshot(),
+    })
+
+
+REPORT_MAX_DAYS = 366
+
+
+@login_required(login_url='caja:login')
+@role_required(allowed_roles=['Administrador', 'Super Usuario'])
+def api_daily_sales_report(request):
+    """Ventas por día desde los resúmenes de caja.rollups. ?from=YYYY-MM-DD&to=YYYY-MM-DD (últimos 7 días por defecto)."""
+    try:
+        # parse_date lanza ValueError con fechas bien formadas que no existen (2026-02-30)
+        until = parse_date(request.GET['to']) if request.GET.get('to') else timezone.localdate()
+        since = parse_date(request.GET['from']) if request.GET.get('from') else until and until - timedelta(days=6)
+    except ValueError:
+        since = until = None
+    if since is None or until is None:
+        return JsonResponse({"error": "Formato de fecha inválido, usar YYYY-MM-DD."}, status=400)
+    if since > until or (until - since).days >= REPORT_MAX_DAYS:
+        return JsonResponse({"error": f"Rango inválido (máximo {REPORT_MAX_DAYS} días)."}, status=400)
+    return JsonResponse({"from": since.isoformat(), "to": until.isoformat(), "days": daily_report(since, until)})
+
+
+@login_required(login_url='caja:login')
+@role_required(allowed_roles=['Administrador', 'Super Usuario'])
+def api_export_orders(request):
+    """
+    Descarga de pedidos con items y pagos, generada a medida que se envía (ver caja.exports).
+    ?format=csv|ndjson&from=YYYY-MM-DD&to=YYYY-MM-DD&state=<id>&gzip=1
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        return JsonResponse({"error": f"Formato inválido, usar {' o '.join(FORMATS)}."}, status=400)
+    bounds = {}
+    for param, name in (('from', 'since'), ('to', 'until')):
+        if request.GET.get(param):
+            try:
+                bounds[name] = parse_date(request.GET[param])
+            except ValueError:  # bien formada pero inexistente, p. ej. 2026-02-30
+                bounds[name] = None
+            if bounds[name] is None:
+                return JsonResponse({"error": "Formato de fecha inválido, usar YYYY-MM-DD."}, status=400)
+    state_id = None
+    if request.GET.get('state'):
+        try:
+            state_id = states.get_by_id(request.GET['state']).id
+        except State.DoesNotExist:
+            return JsonResponse({"error": "Estado inválido."}, status=400)
+    compress = request.GET.get('gzip') in ('1', 'true')
+
+    orders = iter_all_orders(state_id=state_id, **bounds)
+    filename = f"pedidos_{bounds.get('since', 'inicio')}_{bounds.get('until', 'hoy')}.{fmt}"
+    if compress:
+        return streaming_response(request, export_chunks(orders, fmt, compress=True), 'application/gzip', filename + '.gz')
+    return streaming_response(request, export_chunks(orders, fmt), FORMATS[fmt], filename)
+
+
+ORDER_LIST_FIELDS = ('id', 'customer_name', 'date', 'status', 'total', 'table', 'items')
+
+# Campo de la API -> columna que se pide con values()
+ORDER_LIST_COLUMNS = {
+    'customer_name': 'customer_name',
+    'status': 'status__name',
+    'total': 'amount',
+    'table': 'tableNumber',
+}
+
+
+def serialize_order_rows(rows, fields):
+    """Arma el JSON de pedidos desde filas values(); los items se traen en una sola consulta."""
+    items_by_order = {}
+    if 'items' in fields and rows:
+        items = OrderItem.objects.filter(order_id__in=[row['id'] for row in rows]).order_by('id').values(
+            'order_id', 'product__name', 'quantity', 'price', 'sugerency'
+        )
+        for item in items:
+            items_by_order.setdefault(item['order_id'], []).append({
+                "product_name": item['product__name'],
+                "quantity": item['quantity'],
+                "price": float(item['price']),
+                "sugerency": item['sugerency'],
+            })
+
+    data = []
+    for row in rows:
+        order = {}
+        if 'id' in fields:
+            order["id"] = row['id']
+        if 'customer_name' in fields:
+            order["customer_name"] = row['customer_name']
+        if 'date' in fields:
+            order["date"] = row['order_date'].strftime('%Y-%m-%d')
+        if 'status' in fields:
+            order["status"] = row['status__name']
+        if 'total' in fields:
+            order["total"] = float(row['amount'])
+        if 'table' in fields:
+            order["table"] = row['tableNumber']
+        if 'items' in fields:
+            order["items"] = items_by_order.get(row['id'], [])
+        data.append(order)
+    return data
+
+
 @login_required(login_url='caja:login')
 def api_orders_list_create(request):
     if request.method == 'GET':
         status_filter = request.GET.get('status')
         date_filter_str = request.GET.get('date')
-        
-        orders_qs = Order.objects.select_related('status').prefetch_related('order_items__product').order_by('-order_date', 'id', )
+
+        fields_param = request.GET.get('fields')
+        if fields_param:
+            fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+            unknown = [f for f in fields if f not in ORDER_LIST_FIELDS]
+            if unknown:
+                return JsonResponse({"error": f"Campos inválidos: {', '.join(unknown)}"}, status=400)
+        else:
+            fields = list(ORDER_LIST_FIELDS)
+
+        columns = {'id', 'order_date'} | {ORDER_LIST_COLUMNS[f] for f in fields if f in ORDER_LIST_COLUMNS}
+        orders_qs = Order.objects.values(*sorted(columns))
 
         if date_filter_str:
             parsed_date = parse_date(date_filter_str)
@@ -151,24 +291,13 @@ def api_orders_list_create(request):
         if status_filter: 
             orders_qs = orders_qs.filter(status_id=status_filter) 
 
-        orders_data = [{
-            "id": order.id,
-            "customer_name": order.customer_name,
-            "date": order.order_date.strftime('%Y-%m-%d'),
-            "status": order.status.name,  
-            "total": float(order.amount),
-            "table": order.tableNumber,
-            "items": [
-                {
-                    "product_name": item.product.name,
-                    "quantity": item.quantity,
-                    "price": float(item.price),
-                    "sugerency": item.sugerency
-                }
-                for item in order.order_items.all()
-            ]
-        } for order in orders_qs]
-        return JsonResponse(orders_data, safe=False)
+        try:
+            limit = parse_page_size(request.GET.get('limit'))
+            rows, next_cursor = keyset_page(orders_qs, cursor=request.GET.get('cursor'), limit=limit)
+        except InvalidCursor as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        return JsonResponse({"results": serialize_order_rows(rows, fields), "next_cursor": next_cursor})
     
     elif request.method == 'POST':
         try:
@@ -212,7 +341,7 @@ def api_order_detail_update_delete(request, order_id):
             new_status = data.get('status')
             if new_status:
                 try:
-                    new_state = State.objects.get(pk=new_status)
+                    new_state = states.get_by_id(new_status)
                     order.status = new_state
                     order.save()
                     return JsonResponse({'message': f'Pedido {order_id} actualizado a {new_status}', 'status': order.status.name})
@@ -224,7 +353,7 @@ def api_order_detail_update_delete(request, order_id):
 
     elif request.method == 'DELETE': 
         try:
-            cancelled_state = State.objects.get(name='Cancelado') 
+            cancelled_state = states.get(StateName.CANCELADO)
             order.status = cancelled_state
             order.save()
             return JsonResponse({'message': f'Pedido {order_id} cancelado', 'status': order.status.name})
@@ -428,38 +557,13 @@ def api_guardar_pedido_cliente(request):
             if not carrito or not nombre or not email:
                 return JsonResponse({'error': 'Datos incompletos'}, status=400)
 
-            estado = State.objects.first()
-            order = Order.objects.create(
-                customer_name=nombre,
-                amount=0,
-                status=estado,
-                IP=ip,
-                initialTime=timezone.now(),
-                order_date=timezone.now().date(),
-                tableNumber=table_number
-            )
-
-            total = 0
-            for item in carrito:
-                producto = Product.objects.get(pk=item['id'])
-                cantidad = int(item['cantidad'])
-                precio = float(producto.price)
-                subtotal = cantidad * precio
-                sugerency = item.get('sugerency', '')
-                OrderItem.objects.create(
-                    product=producto,
-                    order=order,
-                    quantity=cantidad,
-                    price=precio,
-                    subtotal=subtotal,
-                    sugerency=sugerency
-                )
-                total += subtotal
-
-            order.amount = total
-            order.save()
+            order = OrderService.create_client_order(carrito, nombre, table_number, ip=ip)
 
             return JsonResponse({'success': True, 'order_id': order.id})
+        except CartValidationError as e:
+            return JsonResponse({'error': str(e), 'errors': e.errors}, status=400)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'JSON Inválido'}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
     return JsonResponse({'error': 'Método no permitido'}, status=405)
@@ -499,55 +603,24 @@ def process_payment_result(request):
 
 @csrf_exempt
 def mercadopago_webhook(request):
+    """Encola la notificación y responde enseguida; la procesa el comando process_webhooks."""
     if request.method == 'POST':
-        notification = request.POST or json.loads(request.body)
-        topic = notification.get('topic') or notification.get('type')
-        payment_id = notification.get('data.id') or notification.get('id') or notification.get('payment_id')
+        if request.POST:
+            notification = request.POST.dict()
+        else:
+            try:
+                notification = json.loads(request.body or b'{}')
+            except json.JSONDecodeError:
+                return JsonResponse({"success": False, "error": "JSON Inválido"}, status=400)
+        notification.update(request.GET.dict())
     elif request.method == 'GET':
-        topic = request.GET.get('topic')
-        payment_id = request.GET.get('id')
+        notification = request.GET.dict()
     else:
         return JsonResponse({"success": False, "error": "Method not allowed"}, status=405)
 
-    if topic == 'payment' and payment_id:
-        import mercadopago
-        sdk = mercadopago.SDK(settings.MERCADO_PAGO_ACCESS_TOKEN)
-        payment_info = sdk.payment().get(payment_id)
-        payment_data = payment_info.get("response", {})
-        mp_status = payment_data.get("status", "pending")
-        external_reference = payment_data.get("external_reference")
-
-        # Actualiza el estado de la orden y el pago
-        from caja.models import Order, Payment, PaymentMethod, PaymentStatus
-        try:
-            order = Order.objects.get(id=external_reference)
-            status_mapping = {
-                "approved": "Aprobado",
-                "in_process": "Pendiente",
-                "rejected": "Rechazado",
-                "cancelled": "Cancelado"
-            }
-            mapped_status = status_mapping.get(mp_status, "Pendiente")
-            payment_method = PaymentMethod.objects.get(name='Mercado Pago')
-            payment_status = PaymentStatus.objects.get(name=mapped_status)
-            Payment.objects.create(
-                idOrder=order,
-                idPaymentMethod=payment_method,
-                amount=order.amount,
-                idPaymentStatus=payment_status,
-                token=str(payment_id)
-            )
-            # Actualiza el estado de la orden
-            if mp_status == "approved":
-                order.status_id = 2  # En Preparación
-            elif mp_status == "in_process":
-                order.status_id = 1  # Pendiente
-            elif mp_status in ["rejected", "cancelled"]:
-                order.status_id = 5  # Cancelado
-            order.save()
-        except Exception as e:
-            return JsonResponse({"success": False, "error": str(e)}, status=500)
-
+    topic, resource_id = parse_notification(notification)
+    if topic and resource_id:
+        enqueue_notification(topic, resource_id, notification)
         return JsonResponse({"success": True})
 
-    return JsonResponse({"success": False, "error": "Datos insuficientes"}, status=400)
\ No newline at end of file
+    return JsonResponse({"success": False, "error": "Datos insuficientes"}, status=400)
@@ -0,0 +1,157 @@
+"""
+Cola durable de notificaciones de Mercado Pago.
+
+El webhook solo guarda la notificación cruda (WebhookNotification) y responde
+200 enseguida; nada de la pasarela se consulta dentro del request. El comando
+`process_webhooks` drena la cola en lotes con un pool de hilos, reintentando
+con backoff exponencial las notificaciones que fallan. Los errores permanentes
+(la orden no existe, o ya se archivó, o la referencia es inválida) no se
+reintentan: la notificación queda fallida al primer intento.
+"""
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.utils import timezone
+
+from .models import Order, WebhookNotification
+from .services import PaymentService
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', 8)
+BACKOFF_BASE_SECONDS = getattr(settings, 'WEBHOOK_BACKOFF_SECONDS', 5)
+BACKOFF_MAX_SECONDS = 60 * 60
+# Una notificación tomada por un worker que murió vuelve a la cola pasado este tiempo
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+# Errores que no se arreglan reintentando
+PERMANENT_ERRORS = (Order.DoesNotExist, ValidationError)
+
+# Tópico -> función que procesa el recurso notificado
+HANDLERS = {
+    'payment': PaymentService.process_webhook_payment,
+}
+
+
+def parse_notification(request_data):
+    """Extrae (tópico, id del recurso) de una notificación de Mercado Pago (IPN o webhook)."""
+    data = request_data.get('data') if isinstance(request_data.get('data'), dict) else {}
+    topic = request_data.get('topic') or request_data.get('type')
+    resource_id = (
+        request_data.get('data.id') or data.get('id')
+        or request_data.get('id') or request_data.get('payment_id')
+    )
+    return topic, (str(resource_id) if resource_id else None)
+
+
+def enqueue_notification(topic, resource_id, payload):
+    return WebhookNotification.objects.create(topic=topic, resource_id=resource_id, payload=payload)
+
+
+def backoff_delay(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def due_notifications(now):
+    """Notificaciones vencidas más las tomadas por un worker que no terminó a tiempo."""
+    due = (
+        WebhookNotification.objects.filter(status=WebhookNotification.PENDING, next_attempt_at__lte=now)
+        | WebhookNotification.objects.filter(status=WebhookNotification.PROCESSING, claimed_at__lt=now - CLAIM_TIMEOUT)
+    )
+    return due.order_by('next_attempt_at', 'id')
+
+
+def claim_batch(batch_size, now=None):
+    """Toma hasta `batch_size` notificaciones vencidas para este worker sin pisarse con otros."""
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    ids = list(due_notifications(now).values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    # El UPDATE condicional es el que decide: si otro worker ya las tomó, no se actualizan
+    WebhookNotification.objects.filter(pk__in=ids).filter(
+        status=WebhookNotification.PENDING
+    ).update(status=WebhookNotification.PROCESSING, claimed_by=token, claimed_at=now)
+    WebhookNotification.objects.filter(
+        pk__in=ids, status=WebhookNotification.PROCESSING, claimed_at__lt=now - CLAIM_TIMEOUT
+    ).update(claimed_by=token, claimed_at=now)
+    return list(WebhookNotification.objects.filter(claimed_by=token, status=WebhookNotification.PROCESSING))
+
+
+def _mark_failed(notifications, error, permanent=False):
+    now = timezone.now()
+    for notification in notifications:
+        notification.attempts += 1
+        notification.last_error = error
+        notification.claimed_by = ''
+        if permanent or notification.attempts >= MAX_ATTEMPTS:
+            notification.status = WebhookNotification.FAILED
+        else:
+            notification.status = WebhookNotification.PENDING
+            notification.next_attempt_at = now + backoff_delay(notification.attempts)
+    WebhookNotification.objects.bulk_update(
+        notifications, ['attempts', 'last_error', 'claimed_by', 'status', 'next_attempt_at']
+    )
+
+
+def _process_group(key, notifications, in_pool=False):
+    """Procesa una vez un recurso aunque haya llegado notificado varias veces en el lote."""
+    topic, resource_id = key
+    try:
+        handler = HANDLERS.get(topic)
+        if handler is None:
+            # Tópicos que no nos interesan (merchant_order, etc.): se descartan sin reintento
+            result = 'ignored'
+        else:
+            handler(resource_id)
+            result = 'done'
+        WebhookNotification.objects.filter(pk__in=[n.pk for n in notifications]).update(
+            status=WebhookNotification.DONE, processed_at=timezone.now(), claimed_by='', last_error=''
+        )
+        return result
+    except PERMANENT_ERRORS as e:
+        logger.warning("Webhook %s %s descartado sin reintento: %s", topic, resource_id, e)
+        _mark_failed(notifications, str(e), permanent=True)
+        return 'failed'
+    except Exception as e:
+        logger.warning("Error procesando webhook %s %s: %s", topic, resource_id, e)
+        _mark_failed(notifications, str(e))
+        return 'retry'
+    finally:
+        if in_pool:
+            # Cada hilo del pool abre su propia conexión; se cierra al terminar el grupo
+            connection.close()
+
+
+def process_batch(notifications, workers=1):
+    """Agrupa el lote por recurso y lo procesa con `workers` hilos. Devuelve el conteo por resultado."""
+    groups = {}
+    for notification in notifications:
+        groups.setdefault((notification.topic, notification.resource_id), []).append(notification)
+
+    if workers > 1 and len(groups) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda item: _process_group(*item, in_pool=True), groups.items()))
+    else:
+        results = [_process_group(key, group) for key, group in groups.items()]
+
+    summary = {}
+    for result in results:
+        summary[result] = summary.get(result, 0) + 1
+    return summary
+
+
+def drain(batch_size=50, workers=4):
+    """Procesa lotes hasta vaciar lo que esté vencido en la cola."""
+    totals = {}
+    while True:
+        batch = claim_batch(batch_size)
+        if not batch:
+            return totals
+        for result, count in process_batch(batch, workers=workers).items():
+            totals[result] = totals.get(result, 0) + count
@@ -1,3 +1,79 @@
-from django.test import TestCase
+from decimal import Decimal
+import tempfile
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from caja.catalog import sample_featured
+from caja.models import Category, Product
+
+
+class CatalogTestCase(TestCase):
+    """Variantes de imagen en el momento y MEDIA_ROOT temporal: nada de hilos ni archivos en media/."""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, PRODUCT_IMAGE_VARIANTS_ASYNC=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class MenuCacheTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entradas = Category.objects.create(name='Entradas')
+            self.postres = Category.objects.create(name='Postres')
+            Product.objects.create(name='Provoleta', price=Decimal('900.00'), stock=5, idCategoria=self.entradas)
+            Product.objects.create(name='Tiramisu', price=Decimal('700.00'), stock=5, idCategoria=self.postres)
+            Product.objects.create(name='Helado', price=Decimal('500.00'), stock=0, idCategoria=self.postres)
+        self.url = reverse('cliente:menu', args=[3])
+
+    def test_menu_en_una_consulta_y_luego_desde_cache(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Provoleta')
+        self.assertContains(response, 'Tiramisu')
+        self.assertNotContains(response, 'Helado')
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_etag_304_y_invalidacion_por_cambio_de_producto(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            helado = Product.objects.get(name='Helado')
+            helado.stock = 3
+            helado.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Helado')
+
+
+class FeaturedProductsTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        # Las imágenes no existen (solo importa el nombre): cada variante avisa que falta el archivo
+        with self.assertLogs('caja.images', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            for n in range(12):
+                Product.objects.create(name=f'Plato {n}', price=Decimal('100.00'), stock=1, image=f'products/plato{n}.jpg')
+            Product.objects.create(name='Sin foto', price=Decimal('100.00'), stock=1)
+
+    def test_misma_mesa_mismos_destacados_sin_ordenar_al_azar_en_la_base(self):
+        url = reverse('cliente:index', args=[5])
+        with self.assertNumQueries(1):
+            first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        ids = [p['id'] for p in first.context['destacados']]
+        self.assertEqual(len(ids), 8)
+        self.assertEqual(len(set(ids)), 8)
+        self.assertEqual(ids, [p['id'] for p in second.context['destacados']])
+        self.assertNotIn('Sin foto', first.content.decode())
+
+    def test_sorteo_ponderado_favorece_promociones(self):
+        pool = [{'id': n, 'weight': 1} for n in range(20)] + [{'id': 99, 'weight': 50}]
+        hits = sum(99 in [p['id'] for p in sample_featured(pool, count=2, seed=seed)] for seed in range(200))
+        self.assertGreater(hits, 150)
@@ -1,22 +1,38 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.views.decorators.http import condition
+from django.utils import timezone
+from caja.catalog import MENU_CACHE_TIMEOUT, get_catalog_version, get_featured_pool, get_menu_snapshot, sample_featured
 from caja.models import Product, Category
 from collections import defaultdict
 import random
 
 #--- Vistas para Clientes (Frontend) ---
 
+def featured_seed(table):
+    # Misma selección para una mesa durante el día: la página se puede cachear
+    return f'{table}:{timezone.localdate().isoformat()}'
+
+def index_etag(request, table):
+    return f'index-{get_catalog_version()}-{featured_seed(table)}'
+
+@condition(etag_func=index_etag)
 def index(request, table):
-    destacados = Product.objects.filter(active=True).order_by('?')[:8]
+    _, pool = get_featured_pool()
+    destacados = sample_featured(pool, seed=featured_seed(table))
     return render(request, 'cliente/index.html', {'table': table, 'destacados': destacados})
 
+def menu_etag(request, table):
+    return f'menu-{get_catalog_version()}-{table}'
+
+@condition(etag_func=menu_etag)
 def menu(request, table):
-    categorias = Category.objects.all()
-    categorias_con_productos = []
-    for categoria in categorias:
-        productos = Product.objects.filter(idCategoria=categoria, active=True, stock__gt=0)
-        if productos.exists():
-            categorias_con_productos.append((categoria, productos))
-    return render(request, 'cliente/menu.html', {'table': table, 'categorias_con_productos': categorias_con_productos})
+    version, categorias_con_productos = get_menu_snapshot()
+    return render(request, 'cliente/menu.html', {
+        'table': table,
+        'categorias_con_productos': categorias_con_productos,
+        'menu_version': version,
+        'menu_cache_timeout': MENU_CACHE_TIMEOUT,
+    })
 
 def ayuda(request, table):
     return render(request,'cliente/ayuda.html', {'table': table})
@@ -38,20 +54,9 @@ def detalle_producto(request, table, id):
     producto = get_object_or_404(Product, id=id)
     return render(request, 'cliente/detalle_producto.html', {'table': table, 'producto': producto})
 
-import threading
-from django.core.mail import EmailMessage
 from django.http import JsonResponse
 from django.conf import settings
-
-def enviar_mail_async(mail):
-    """
-    Envía el mail en segundo plano.
-    """
-    try:
-        mail.send(fail_silently=False)
-    except Exception as e:
-        # Aquí podrías loguear el error si querés
-        print("Error al enviar mail en segundo plano:", e)
+from caja.outbox import enqueue_email
 
 def enviar_contacto(request, table):
     if request.method == "POST":
@@ -77,14 +82,14 @@ def enviar_contacto(request, table):
             Acepta novedades: {'Sí' if acepta_novedades else 'No'}
             """
 
-            mail = EmailMessage(
+            # Queda en la bandeja de salida; lo envía el worker de caja.outbox
+            enqueue_email(
                 subject=f"Nuevo contacto: {motivo}",
                 body=cuerpo,
                 from_email=settings.DEFAULT_FROM_EMAIL,
                 to=[settings.EMAIL_TO],   # o lista de destinatarios
-                reply_to=[email],         # permite responder directamente al cliente
+                reply_to=[email] if email else None,  # permite responder directamente al cliente
             )
-            threading.Thread(target=enviar_mail_async, args=(mail,)).start()
             return JsonResponse({"success": True})
         except Exception as e:
             return JsonResponse({"success": False, "error": str(e)})
@@ -0,0 +1,83 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import Group
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from caja.lookups import StateName, states
+from caja.models import CustomUser, Order, OrderItem, Product
+
+
+class KitchenTestCase(TestCase):
+    def setUp(self):
+        self.chef = CustomUser.objects.create_user(username='chef', password='x', role='cocinero')
+        self.chef.groups.add(Group.objects.create(name='Cocineros'))
+        self.client.force_login(self.chef)
+        self.product = Product.objects.create(name='Milanesa', price=Decimal('1000.00'), stock=100)
+        self.url = reverse('cocina:dashboard')
+
+    def add_orders(self, count, table):
+        preparacion = states.get(StateName.EN_PREPARACION)
+        for _ in range(count):
+            order = Order.objects.create(tableNumber=table, status=preparacion)
+            OrderItem.objects.create(order=order, product=self.product, quantity=2, price=self.product.price,
+                                     subtotal=2 * self.product.price, sugerency='sin sal')
+
+
+class KitchenDashboardTests(KitchenTestCase):
+    def queries_for_render(self):
+        self.client.get(self.url)  # primer request: el chequeo de grupo queda en la sesión
+        with self.assertNumQueries(3):  # sesión, usuario y la consulta de pedidos
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_cantidad_de_consultas_constante(self):
+        self.add_orders(1, table=1)
+        self.queries_for_render()
+        self.add_orders(5, table=2)
+        response = self.queries_for_render()
+        self.assertEqual(list(response.context['orders_by_table']), [1, 2])
+        self.assertEqual(len(response.context['orders_by_table'][2]), 5)
+        self.assertContains(response, '2 x Milanesa (sin sal)', count=6)
+
+    def test_solo_cocineros(self):
+        otro = CustomUser.objects.create_user(username='cajero', password='x')
+        self.client.force_login(otro)
+        with self.assertLogs('cocina.views', 'WARNING'):
+            self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class KitchenFragmentTests(KitchenTestCase):
+    def test_marcar_listo_devuelve_la_mesa_cambiada(self):
+        self.add_orders(2, table=3)
+        first, second = Order.objects.order_by('id')
+        response = self.client.post(reverse('cocina:update_order', args=[first.id]),
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response['X-Table'], '3')
+        self.assertContains(response, f'id="pedido-{second.id}"')
+        self.assertNotContains(response, f'id="pedido-{first.id}"')
+
+        response = self.client.post(reverse('cocina:update_order', args=[second.id]),
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.content, b'')  # la mesa quedó vacía
+
+    def test_delta_por_end_time(self):
+        self.add_orders(1, table=1)
+        since = self.client.get(self.url).context['since']
+        Order.objects.filter(tableNumber=1).update(endTime=timezone.now() - timedelta(minutes=5))
+        self.add_orders(1, table=4)
+
+        data = self.client.get(reverse('cocina:fragment_delta'), {'since': since}).json()
+        self.assertEqual(list(data['tables']), ['4'])
+        self.assertIn('Mesa 4', data['tables']['4'])
+        self.assertEqual(self.client.get(reverse('cocina:fragment_delta'), {'since': 'ayer'}).status_code, 400)
+
+    def test_fragmento_de_pedido(self):
+        self.add_orders(1, table=2)
+        order = Order.objects.get()
+        response = self.client.get(reverse('cocina:fragment_order', args=[order.id]))
+        self.assertContains(response, 'Pedido #%d' % order.id)
+        self.assertEqual(response['X-Table'], '2')
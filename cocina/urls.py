@@ -6,4 +6,8 @@ app_name = 'cocina'
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('update/<int:order_id>/', views.update_order_status, name='update_order'),
+    # Fragmentos HTML para actualizar el tablero sin recargarlo
+    path('fragments/table/<int:table_num>/', views.table_fragment, name='fragment_table'),
+    path('fragments/order/<int:order_id>/', views.order_fragment, name='fragment_order'),
+    path('fragments/delta/', views.fragment_delta, name='fragment_delta'),
 ]
\ No newline at end of file
@@ -1,55 +1,176 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponseForbidden
-from caja.models import Order, State
-
-PREPARACION_STATE_ID = 3  # "En Preparación"
-LISTO_STATE_ID = 4  # "Listo para Entregar"
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from caja.lookups import StateName, states
+from caja.models import Order
 
 from django.contrib.auth.models import Group
+from datetime import timedelta
 import logging
 logger = logging.getLogger(__name__)
+
+# Clave de sesión con el resultado del chequeo de grupo: se consulta una vez por login
+CHEF_SESSION_KEY = 'cocina_es_cocinero'
+
+
+def user_is_chef(request):
+    cached = request.session.get(CHEF_SESSION_KEY)
+    if cached is not None and cached[0] == request.user.pk:
+        return cached[1]
+    is_chef = request.user.groups.filter(name='Cocineros').exists()
+    request.session[CHEF_SESSION_KEY] = (request.user.pk, is_chef)
+    return is_chef
+
+
 def chef_required(view_func):
     def wrapper(request, *args, **kwargs):
         if not request.user.is_authenticated:
             logger.warning("User not authenticated")
             return HttpResponseForbidden("No autenticado.")
-        groups = request.user.groups.all()
-        logger.info(f"User {request.user.username} groups: {[g.name for g in groups]}")
-        if not request.user.groups.filter(name='Cocineros').exists():
+        if not user_is_chef(request):
             logger.warning(f"User {request.user.username} not in Cocineros group")
             return HttpResponseForbidden("Acceso denegado. Solo cocineros pueden acceder.")
         return view_func(request, *args, **kwargs)
     return wrapper
 
+
+def kitchen_queue_rows(state_id, **filters):
+    """
+    Órdenes + items + productos de un estado en una sola consulta (LEFT JOIN),
+    ordenados por mesa y hora. También la usa caja.query_plans para revisar su plan.
+    """
+    return (
+        Order.objects.filter(status_id=state_id, **filters)
+        .order_by('tableNumber', 'initialTime', 'id', 'order_items__id')
+        .values(
+            'id', 'customer_name', 'order_date', 'initialTime', 'tableNumber',
+            'order_items__id', 'order_items__quantity', 'order_items__sugerency', 'order_items__product__name',
+        )
+    )
+
+
+def kitchen_queue(state_id, **filters):
+    """
+    Pedidos de un estado con sus items, agrupados por mesa (ver kitchen_queue_rows).
+    Devuelve {mesa: [{'id', 'customer_name', ..., 'items': [...]}, ...]}.
+    """
+    orders_by_table = {}
+    current = None
+    for row in kitchen_queue_rows(state_id, **filters):
+        if current is None or current['id'] != row['id']:
+            current = {
+                'id': row['id'],
+                'customer_name': row['customer_name'],
+                'order_date': row['order_date'],
+                'initialTime': row['initialTime'],
+                'items': [],
+            }
+            orders_by_table.setdefault(int(row['tableNumber']), []).append(current)
+        if row['order_items__id'] is not None:
+            current['items'].append({
+                'quantity': row['order_items__quantity'],
+                'product_name': row['order_items__product__name'],
+                'sugerency': row['order_items__sugerency'],
+            })
+    return orders_by_table
+
+
+# Margen al leer cambios por endTime: una escritura que commitea justo después de
+# la lectura anterior puede tener un endTime apenas menor que el `now` devuelto
+DELTA_OVERLAP = timedelta(seconds=2)
+
+
+def render_table_card(request, table_num, table_orders):
+    """HTML de la tarjeta de una mesa; vacío si la mesa ya no tiene pedidos en preparación."""
+    if not table_orders:
+        return ''
+    return render_to_string(
+        'cocina/_table_card.html', {'table_num': table_num, 'table_orders': table_orders}, request=request
+    )
+
+
+def table_fragment_response(request, table_num):
+    orders_by_table = kitchen_queue(states.id_of(StateName.EN_PREPARACION), tableNumber=table_num)
+    response = HttpResponse(render_table_card(request, table_num, orders_by_table.get(table_num)))
+    response['X-Table'] = str(table_num)
+    return response
+
+
 @login_required
 @chef_required
 def dashboard(request):
-    # Obtener pedidos en preparación y ordenarlos por mesa y tiempo
-    orders = Order.objects.filter(status_id=PREPARACION_STATE_ID).order_by('tableNumber', 'initialTime')
-    
-    # Agrupar pedidos por mesa
-    orders_by_table = {}
-    for order in orders:
-        table_num = int(order.tableNumber)
-        if table_num not in orders_by_table:
-            orders_by_table[table_num] = []
-        orders_by_table[table_num].append(order)
-    
+    # Pedidos en preparación ordenados por mesa y tiempo, con sus items, en una consulta
+    since = timezone.now()
     context = {
-        'orders_by_table': orders_by_table
+        'orders_by_table': kitchen_queue(states.id_of(StateName.EN_PREPARACION)),
+        'since': since.isoformat(),
     }
     return render(request, 'cocina/dashboard.html', context)
 
+
+@login_required
+@chef_required
+def table_fragment(request, table_num):
+    return table_fragment_response(request, table_num)
+
+
+@login_required
+@chef_required
+def order_fragment(request, order_id):
+    orders_by_table = kitchen_queue(states.id_of(StateName.EN_PREPARACION), id=order_id)
+    if not orders_by_table:
+        return HttpResponse(status=204)
+    table_num, table_orders = next(iter(orders_by_table.items()))
+    response = render(request, 'cocina/_order_card.html', {'order': table_orders[0]})
+    response['X-Table'] = str(table_num)
+    return response
+
+
+@login_required
+@chef_required
+def fragment_delta(request):
+    """
+    Tarjetas de las mesas con pedidos modificados (Order.endTime) desde `since`.
+    Devuelve {"now": <próximo since>, "tables": {mesa: html o "" si la mesa quedó vacía}}.
+    """
+    since = parse_datetime(request.GET.get('since', ''))
+    if since is None:
+        return JsonResponse({'error': "Parámetro 'since' inválido, se espera fecha ISO 8601."}, status=400)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    now = timezone.now()
+    changed_tables = sorted({
+        int(table) for table in
+        Order.objects.filter(endTime__gte=since - DELTA_OVERLAP).values_list('tableNumber', flat=True).distinct()
+    })
+    tables = {}
+    if changed_tables:
+        orders_by_table = kitchen_queue(states.id_of(StateName.EN_PREPARACION), tableNumber__in=changed_tables)
+        tables = {
+            table: render_table_card(request, table, orders_by_table.get(table))
+            for table in changed_tables
+        }
+    return JsonResponse({'now': now.isoformat(), 'tables': tables})
+
+
 @login_required
 @chef_required
 def update_order_status(request, order_id):
     order = get_object_or_404(Order, id=order_id)
-    if order.status_id != PREPARACION_STATE_ID:
+    is_fragment = request.headers.get('x-requested-with') == 'XMLHttpRequest'
+    if order.status_id != states.id_of(StateName.EN_PREPARACION):
+        if is_fragment:
+            return HttpResponse('Este pedido no está en preparación.', status=409)
         messages.error(request, 'Este pedido no está en preparación.')
         return redirect('cocina:dashboard')
-    order.status_id = LISTO_STATE_ID
+    order.status = states.get(StateName.LISTO_PARA_ENTREGAR)
     order.save()
+    if is_fragment:
+        # Solo la mesa del pedido cambia: se devuelve su tarjeta (vacía si no quedan pedidos)
+        return table_fragment_response(request, int(order.tableNumber))
     messages.success(request, f'Pedido {order.id} marcado como listo para entregar.')
     return redirect('cocina:dashboard')
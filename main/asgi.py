@@ -3,6 +3,11 @@ ASGI config for Shatalito project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Es el punto de entrada para producción: el stream SSE de pedidos
+(/caja/api/events/, ver caja.events) solo funciona servido por ASGI, p. ej.
+``uvicorn main.asgi:application``. El broker de eventos vive en memoria del
+proceso, así que debe correr un único proceso worker.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
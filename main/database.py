@@ -0,0 +1,42 @@
+"""
+Ajustes de SQLite para varios escritores concurrentes (caja, cocina y clientes).
+
+- WAL: los lectores no bloquean al escritor ni al revés; solo se serializan
+  las escrituras entre sí. El modo queda guardado en el archivo: el db.sqlite3
+  del repo ya está en WAL, así que abrirlo no le cambia la cabecera.
+- synchronous=NORMAL: con WAL sigue siendo seguro ante caídas del proceso y
+  evita un fsync por commit.
+- mmap y cache_size: menos lecturas al disco en las consultas del menú y listados.
+- timeout (busy timeout): un escritor espera el lock en vez de fallar con
+  "database is locked".
+- BEGIN IMMEDIATE en transaction.atomic(): la transacción toma el lock de
+  escritura al empezar. Con BEGIN DEFERRED dos transacciones que leen y después
+  escriben pueden trabarse al querer subir el lock, y SQLite aborta a una sin
+  esperar el busy timeout.
+
+Django aplica `init_command` en cada conexión nueva y usa `transaction_mode`
+en cada atomic().
+"""
+
+BUSY_TIMEOUT_SECONDS = 20
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -20000,  # en KiB: ~20 MB por conexión
+    'temp_store': 'MEMORY',
+}
+
+
+def pragma_statements(pragmas=None):
+    return [f"PRAGMA {name}={value}" for name, value in (pragmas or PRAGMAS).items()]
+
+
+def sqlite_options(pragmas=None, timeout=BUSY_TIMEOUT_SECONDS, transaction_mode='IMMEDIATE'):
+    """OPTIONS para DATABASES['default'] con el backend de SQLite."""
+    return {
+        'timeout': timeout,
+        'transaction_mode': transaction_mode,
+        'init_command': '; '.join(pragma_statements(pragmas)),
+    }
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from main.database import sqlite_options
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = 'django-insecure-=!#tu_clave_secreta_aqui#@!' # ¡CAMBIA ESTO EN PRODUCCIÓN!
@@ -44,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'caja.instrumentation.RequestMetricsMiddleware', # Consultas y tiempos por URL (Server-Timing)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,6 +80,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # WAL, busy timeout y BEGIN IMMEDIATE (ver main/database.py)
+        'OPTIONS': sqlite_options(),
     }
 }
 
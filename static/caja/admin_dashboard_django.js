@@ -11,6 +11,7 @@ document.addEventListener('DOMContentLoaded', async function() {
     const filterDateInput = document.getElementById('filterDate');
     const filterStatusSelect = document.getElementById('filterStatus');
     const applyFiltersButton = document.getElementById('applyFiltersButton');
+    const loadMoreOrdersButton = document.getElementById('loadMoreOrdersButton');
     const listUsersButton = document.getElementById('listUsersButton');
 
     const listProductsButton = document.getElementById('listProductsButton');
@@ -154,33 +155,43 @@ document.addEventListener('DOMContentLoaded', async function() {
 
     // --- Gestión de Pedidos ---
 
+    // Cursor de la siguiente página de pedidos (null cuando no hay más)
+    let ordersNextCursor = null;
+
     // fetchOrders se encarga de obtener los pedidos del backend y renderizarlos
-    async function fetchOrders() {
+    // Si se pasa un cursor, agrega la página siguiente a la tabla en lugar de reemplazarla
+    async function fetchOrders(cursor = null) {
+        if (typeof cursor !== 'string') cursor = null; // Llamado desde un evento click
         showMessage(ordersMessage, 'Cargando pedidos...');
         const date = filterDateInput.value;
         const status = filterStatusSelect.value;
         let url = `${API_URLS.orders_list_create}?date=${date}`;
         if (status) url += `&status=${status}`;
+        if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
         
         try {
             const response = await fetch(url);
-            const orders = await response.json();
-            if (!response.ok) throw new Error(orders.error || 'Error al cargar pedidos');
-            renderOrders(orders);
-            showMessage(ordersMessage, orders.length === 0 ? 'No hay pedidos para los filtros seleccionados.' : '');
+            const data = await response.json();
+            if (!response.ok) throw new Error(data.error || 'Error al cargar pedidos');
+            const orders = data.results;
+            renderOrders(orders, Boolean(cursor));
+            ordersNextCursor = data.next_cursor;
+            if (loadMoreOrdersButton) loadMoreOrdersButton.style.display = ordersNextCursor ? '' : 'none';
+            showMessage(ordersMessage, orders.length === 0 && !cursor ? 'No hay pedidos para los filtros seleccionados.' : '');
         } catch (e) { showMessage(ordersMessage, e.message, true); }
     }
 
     // renderOrders se encarga de renderizar los pedidos en la tabla del dashboard
-    function renderOrders(orders) {
+    function renderOrders(orders, append = false) {
         
-        ordersTableBody.innerHTML = '';
-        if (!orders || orders.length === 0) {
+        if (!append) ordersTableBody.innerHTML = '';
+        if (!append && (!orders || orders.length === 0)) {
             ordersTableBody.innerHTML = '<tr><td colspan="7" style="text-align:center;">No hay pedidos.</td></tr>';
             return;
         }
         orders.forEach(order => {
             const row = ordersTableBody.insertRow();
+            row.dataset.orderId = order.id;
             row.insertCell().textContent = order.id;
             row.insertCell().textContent = order.customer_name || 'N/A';
             row.insertCell().textContent = order.table || 'N/A';
@@ -332,6 +343,7 @@ document.addEventListener('DOMContentLoaded', async function() {
     }
 
     if(applyFiltersButton) applyFiltersButton.addEventListener('click', fetchOrders);
+    if(loadMoreOrdersButton) loadMoreOrdersButton.addEventListener('click', () => fetchOrders(ordersNextCursor));
 
     // --- Gestión de Productos ---
     // fetchProducts se encarga de obtener la lista de productos del backend y renderizarlos
@@ -815,15 +827,20 @@ document.addEventListener('DOMContentLoaded', async function() {
     async function fetchReadyOrders() {
         showMessage(ordersManagementMessage, 'Cargando pedidos...');
         try {
-            //Para agregar el filtrado por fecha, descomentar las siguientes líneas y comentar la línea del URL actual
-            //const date = new Date().toISOString().split('T')[0];
-            //const url = `${API_URLS.orders_list_create}?date=&status=${READY_STATE_ID}`;
-
-            const READY_STATE_ID = 3; // El id de "Listo para Entregar"
-            const url = `${API_URLS.orders_list_create}?status=${READY_STATE_ID}`; // <-- Sin date
-            const response = await fetch(url);
-            const orders = await response.json();
-            if (!response.ok) throw new Error(orders.error || 'Error al cargar pedidos');
+            // El id de "Listo para Entregar" lo pasa el servidor (registro de estados)
+            if (ORDER_STATE_IDS.ready === null) throw new Error('No existe el estado "Listo para Entregar".');
+            const baseUrl = `${API_URLS.orders_list_create}?status=${ORDER_STATE_IDS.ready}`; // Sin date
+            // La API pagina por cursor: se siguen las páginas hasta next_cursor == null
+            const orders = [];
+            let cursor = null;
+            do {
+                const url = cursor ? `${baseUrl}&cursor=${encodeURIComponent(cursor)}` : baseUrl;
+                const response = await fetch(url);
+                const data = await response.json();
+                if (!response.ok) throw new Error(data.error || 'Error al cargar pedidos');
+                orders.push(...data.results);
+                cursor = data.next_cursor;
+            } while (cursor);
             renderReadyOrdersCards(orders);
             showMessage(ordersManagementMessage, orders.length === 0 ? 'No hay pedidos listos para entregar.' : '');
         } catch (e) {
@@ -882,6 +899,29 @@ document.addEventListener('DOMContentLoaded', async function() {
         });
     }
 
+    // --- Stream de cambios de pedidos (SSE) ---
+    // En lugar de volver a pedir el listado completo, se aplican los cambios que publica el servidor.
+    function subscribeOrderEvents() {
+        if (!API_URLS.order_events || typeof EventSource === 'undefined') return;
+        const source = new EventSource(API_URLS.order_events);
+
+        source.addEventListener('status-changed', (e) => {
+            const order = JSON.parse(e.data);
+            const row = ordersTableBody ? ordersTableBody.querySelector(`tr[data-order-id="${order.id}"]`) : null;
+            if (row) row.cells[4].textContent = order.status;
+            if (document.getElementById('ordersManagementSection')?.classList.contains('active')) fetchReadyOrders();
+        });
+
+        source.addEventListener('order-created', (e) => {
+            const order = JSON.parse(e.data);
+            if (filterDateInput && (!filterDateInput.value || filterDateInput.value === order.date)) fetchOrders();
+        });
+
+        // El servidor perdió el historial de eventos (reinicio): se recarga el estado completo
+        source.addEventListener('reset', () => fetchOrders());
+    }
+    subscribeOrderEvents();
+
     // Evento para cargar la sección de manejo de pedidos
     const ordersManagementBtn = document.querySelector('.nav-button[data-target="ordersManagementSection"]');
     if (ordersManagementBtn) {